@@ -0,0 +1,197 @@
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Callable
+from config import config
+from comfy_api import ComfyAPI, comfy_api
+from models import JobResponse
+from metrics import job_execution_duration
+
+class Backend:
+    """One ComfyUI instance and what we know about its load."""
+
+    def __init__(self, name: str, api: ComfyAPI):
+        self.name = name
+        self.api = api
+        self.healthy = True
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.queue_running = 0
+        self.queue_pending = 0
+        # Jobs submitted through this wrapper that have not finished yet
+        self.in_flight = 0
+        # Moving average of seconds from execution start to finish
+        self.execution_time: Optional[float] = None
+        self._started: Dict[str, float] = {}
+        # Set by the job queue to hand a freed slot to the next waiting job
+        self.on_release: Optional[Callable[[], None]] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue_running + self.queue_pending
+
+    def load(self) -> float:
+        """Estimated seconds before a new prompt would finish here."""
+        # Our own submissions count even before the next /queue probe sees them
+        waiting = max(self.queue_depth, self.in_flight)
+        return (waiting + 1) * (self.execution_time or config.BACKEND_DEFAULT_EXECUTION_TIME)
+
+    def update_queue(self, queue: Dict[str, Any]):
+        self.queue_running = len(queue.get("queue_running", []))
+        self.queue_pending = len(queue.get("queue_pending", []))
+        self.healthy = True
+        self.last_error = None
+        self.checked_at = time.monotonic()
+
+    def job_submitted(self):
+        self.in_flight += 1
+        self.queue_pending += 1
+
+    def submit_failed(self):
+        """A submission counted by job_submitted never reached ComfyUI."""
+        self.in_flight = max(self.in_flight - 1, 0)
+        self.queue_pending = max(self.queue_pending - 1, 0)
+        if self.on_release is not None:
+            self.on_release()
+
+    def _left_queue(self, started: Optional[float]):
+        # Keeps the last /queue counts current between checks (one backend is never health-checked)
+        if started is None:
+            self.queue_pending = max(self.queue_pending - 1, 0)
+        else:
+            self.queue_running = max(self.queue_running - 1, 0)
+
+    def job_cancelled(self, prompt_id: str):
+        """A prompt was removed from the queue or interrupted; it gives no execution time."""
+        self._left_queue(self._started.pop(prompt_id, None))
+        self.in_flight = max(self.in_flight - 1, 0)
+        if self.on_release is not None:
+            self.on_release()
+
+    def job_started(self, prompt_id: str):
+        if prompt_id in self._started:
+            return
+        self._started[prompt_id] = time.monotonic()
+        self.queue_pending = max(self.queue_pending - 1, 0)
+        # ComfyUI executes one prompt at a time
+        self.queue_running = 1
+
+    def job_finished(self, prompt_id: str, success: bool):
+        started = self._started.pop(prompt_id, None)
+        self._left_queue(started)
+        self.in_flight = max(self.in_flight - 1, 0)
+        if self.on_release is not None:
+            self.on_release()
+        if started is None:
+            return
+        sample = time.monotonic() - started
+        job_execution_duration.observe(sample, self.name, "completed" if success else "failed")
+        if not success:
+            return
+        if self.execution_time is None:
+            self.execution_time = sample
+        else:
+            alpha = config.BACKEND_EWMA_ALPHA
+            self.execution_time = alpha * sample + (1 - alpha) * self.execution_time
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "url": self.api.url,
+            "healthy": self.healthy,
+            "last_error": self.last_error,
+            "queue_running": self.queue_running,
+            "queue_pending": self.queue_pending,
+            "in_flight": self.in_flight,
+            "execution_time": round(self.execution_time, 3) if self.execution_time is not None else None,
+            "load": round(self.load(), 3),
+            "http": self.api.stats(),
+        }
+
+class BackendPool:
+    """The configured ComfyUI backends, health-checked and picked by estimated load.
+
+    The first backend is the primary: it uses the shared ``comfy_api`` client and
+    owns jobs that do not record a backend.
+    """
+
+    def __init__(self):
+        self.backends: List[Backend] = []
+        for index, spec in enumerate(config.COMFYUI_BACKENDS):
+            if index == 0:
+                api = comfy_api
+                api.name = spec["name"]
+            else:
+                api = ComfyAPI(spec["url"], spec["name"])
+            self.backends.append(Backend(spec["name"], api))
+        self._by_name = {backend.name: backend for backend in self.backends}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def primary(self) -> Backend:
+        return self.backends[0]
+
+    def get(self, name: Optional[str] = None) -> Optional[Backend]:
+        """A backend by name; None means the primary."""
+        if name is None:
+            return self.primary
+        return self._by_name.get(name)
+
+    def for_job(self, job: Optional[JobResponse]) -> Backend:
+        if job is None:
+            return self.primary
+        return self.get(job.backend) or self.primary
+
+    def restore_in_flight(self, jobs: List[JobResponse]):
+        """Count prompts restored from job_history as outstanding on their backends."""
+        prompts: Dict[str, set] = {backend.name: set() for backend in self.backends}
+        for job in jobs:
+            # Coalesced jobs share one prompt, which was submitted once
+            prompts[self.for_job(job).name].add(job.prompt_id or job.job_id)
+        for backend in self.backends:
+            backend.in_flight = len(prompts[backend.name])
+
+    def pick(self, backends: Optional[List[Backend]] = None) -> Backend:
+        """Least-loaded healthy backend of ``backends`` (default: all; any if none is healthy)."""
+        backends = backends or self.backends
+        candidates = [backend for backend in backends if backend.healthy] or backends
+        return min(candidates, key=lambda backend: backend.load())
+
+    async def start(self):
+        for backend in self.backends:
+            await backend.api.start()
+        if len(self.backends) > 1 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for backend in self.backends:
+            await backend.api.close()
+
+    async def check(self, backend: Backend):
+        try:
+            backend.update_queue(await backend.api.get_queue())
+        except Exception as e:
+            if backend.healthy:
+                print(f"Backend {backend.name} is unhealthy: {e}")
+            backend.healthy = False
+            backend.last_error = str(e)
+            backend.checked_at = time.monotonic()
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(backend) for backend in self.backends))
+
+    async def _run(self):
+        while True:
+            await self.check_all()
+            await asyncio.sleep(config.BACKEND_HEALTH_INTERVAL)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [backend.stats() for backend in self.backends]
+
+backend_pool = BackendPool()
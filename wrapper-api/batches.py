@@ -0,0 +1,123 @@
+import asyncio
+import itertools
+import uuid
+from collections import OrderedDict, Counter
+from typing import Dict, Any, List, Optional
+from config import config
+from models import BatchRunRequest, BatchResponse, JobResponse, SeedControl
+from workflow_templates import WorkflowTemplate
+from job_history import job_history, ACTIVE_STATUSES
+from job_queue import job_queue
+from job_runner import resolve_seed, submit
+from prompt_validation import prompt_validator
+
+def expand_runs(request: BatchRunRequest) -> List[Dict[str, Any]]:
+    """Input overrides of every run: (runs x grid) x count, on top of the shared inputs."""
+    if request.count < 1:
+        raise ValueError("count must be at least 1")
+    keys = list(request.grid)
+    combos = list(itertools.product(*(request.grid[key] for key in keys)))
+    total = max(len(request.runs), 1) * len(combos) * request.count
+    if total == 0:
+        raise ValueError("Grid has an empty value list")
+    if total > config.BATCH_MAX_RUNS:
+        raise ValueError(f"Batch expands to {total} runs (limit {config.BATCH_MAX_RUNS})")
+
+    expanded = []
+    for run in request.runs or [{}]:
+        for combo in combos:
+            inputs = {**request.inputs, **run, **dict(zip(keys, combo))}
+            expanded.extend(dict(inputs) for _ in range(request.count))
+    return expanded
+
+def batch_status(jobs: List[JobResponse]) -> str:
+    statuses = {job.status for job in jobs}
+    if statuses & set(ACTIVE_STATUSES):
+        return "queued" if statuses <= {"pending", "queued"} else "running"
+    if statuses == {"completed"}:
+        return "completed"
+    if statuses == {"failed"}:
+        return "failed"
+    if statuses == {"cancelled"}:
+        return "cancelled"
+    return "partial"
+
+class BatchManager:
+    """Expands batch requests and submits their runs with bounded concurrency.
+
+    Job records are shared with job_history, so batch status follows the
+    tracker's updates without any polling of its own.
+    """
+
+    def __init__(self):
+        self._batches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def run(self, template: WorkflowTemplate, request: BatchRunRequest, client: Optional[str] = None) -> BatchResponse:
+        """Submit every run of the batch.
+
+        Raises ValueError for an invalid spec or inputs, and QueueFullError when
+        the runs may not wait in the job queue.
+        """
+        runs = expand_runs(request)
+        batch_id = uuid.uuid4().hex
+        seed_control = request.seed_control
+        if seed_control.mode == "increment" and seed_control.value is None:
+            # One random base for the whole batch
+            seed_control = SeedControl(mode="increment", value=resolve_seed(SeedControl()))
+
+        # All runs are checked before any is queued (raises PromptValidationError)
+        base_seed = seed_control.value if seed_control.mode != "random" else None
+        for inputs in runs:
+            await prompt_validator.validate(template, inputs, base_seed)
+        client = client or request.client_id or "anonymous"
+        job_queue.admit(client, len(runs))
+
+        semaphore = asyncio.Semaphore(max(config.BATCH_CONCURRENCY, 1))
+
+        async def submit_one(index: int, inputs: Dict[str, Any]) -> JobResponse:
+            seed = resolve_seed(seed_control, index)
+            async with semaphore:
+                try:
+                    return await submit(template, request.workflow_name, inputs, seed, seed_control.mode, batch_id, request.client_id, request.no_cache, request.priority, client)
+                except Exception as e:
+                    print(f"Error submitting batch {batch_id} run {index}: {e}")
+                    error = f"ComfyUI error: {str(e)}"
+            # Record the failure so the batch still accounts for every run
+            job = JobResponse(
+                job_id=f"{batch_id}-{index}",
+                workflow_name=request.workflow_name,
+                status="failed",
+                resolved_inputs=inputs,
+                resolved_seed=seed,
+                error=error,
+                batch_id=batch_id,
+                client_id=request.client_id
+            )
+            job_history.add_job(job)
+            return job
+
+        jobs = await asyncio.gather(*(submit_one(index, inputs) for index, inputs in enumerate(runs)))
+
+        self._batches[batch_id] = {"workflow_name": request.workflow_name, "jobs": list(jobs)}
+        while len(self._batches) > config.BATCH_HISTORY:
+            self._batches.popitem(last=False)
+        return self.get(batch_id)
+
+    def get(self, batch_id: str) -> Optional[BatchResponse]:
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            return None
+        jobs = batch["jobs"]
+        return BatchResponse(
+            batch_id=batch_id,
+            workflow_name=batch["workflow_name"],
+            status=batch_status(jobs),
+            job_ids=[job.job_id for job in jobs],
+            counts=dict(Counter(job.status for job in jobs))
+        )
+
+    def jobs(self, batch_id: str) -> List[JobResponse]:
+        batch = self._batches.get(batch_id)
+        return list(batch["jobs"]) if batch else []
+
+batch_manager = BatchManager()
@@ -0,0 +1,330 @@
+"""Stand-in ComfyUI server for load tests.
+
+Implements the parts of ComfyUI's API the wrapper uses (/prompt, /queue,
+/history, /view, /object_info, /embeddings, /interrupt and /ws). Prompts are
+"executed" one at a time by sleeping, with the usual websocket events, so
+the wrapper's queueing, tracking and proxy paths run as they do in production.
+
+    python -m bench.fake_comfy --port 8188 --exec-time 0.5 --models 2000
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import struct
+import time
+import uuid
+from contextlib import asynccontextmanager
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Set
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from PIL import Image
+
+# Node types whose outputs are images
+OUTPUT_NODES = ("SaveImage", "PreviewImage")
+
+@dataclass
+class FakeComfySettings:
+    # Seconds per prompt, +/- jitter (fraction of exec_time)
+    exec_time: float = 0.5
+    exec_jitter: float = 0.2
+    # Progress events per prompt
+    steps: int = 10
+    # Synthetic node classes in /object_info, and entries per model list
+    object_info_nodes: int = 500
+    models: int = 200
+    # Size and format of every output served by /view
+    image_width: int = 1024
+    image_height: int = 1024
+    image_format: str = "PNG"
+    # Send a binary preview frame with every progress event
+    previews: bool = False
+    # Finished prompts kept in /history
+    history_size: int = 10000
+
+def build_object_info(settings: FakeComfySettings) -> Dict[str, Any]:
+    """object_info with realistic loaders plus filler node classes."""
+    def names(prefix: str, ext: str):
+        return [f"{prefix}/{prefix}_{i:05d}.{ext}" for i in range(settings.models)]
+
+    info: Dict[str, Any] = {
+        "CheckpointLoaderSimple": {"input": {"required": {"ckpt_name": [names("checkpoints", "safetensors")]}}, "output": ["MODEL", "CLIP", "VAE"]},
+        "LoraLoader": {"input": {"required": {
+            "model": ["MODEL"],
+            "clip": ["CLIP"],
+            "lora_name": [names("loras", "safetensors")],
+            "strength_model": ["FLOAT", {"default": 1.0, "min": -100.0, "max": 100.0, "step": 0.01}],
+            "strength_clip": ["FLOAT", {"default": 1.0, "min": -100.0, "max": 100.0, "step": 0.01}],
+        }}, "output": ["MODEL", "CLIP"]},
+        "VAELoader": {"input": {"required": {"vae_name": [names("vae", "safetensors")]}}, "output": ["VAE"]},
+        "KSampler": {"input": {"required": {
+            "model": ["MODEL"],
+            "seed": ["INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}],
+            "steps": ["INT", {"default": 20, "min": 1, "max": 10000}],
+            "cfg": ["FLOAT", {"default": 8.0, "min": 0.0, "max": 100.0, "step": 0.1}],
+            "sampler_name": [["euler", "euler_ancestral", "dpmpp_2m", "dpmpp_sde"]],
+            "scheduler": [["normal", "karras", "exponential", "simple"]],
+            "positive": ["CONDITIONING"],
+            "negative": ["CONDITIONING"],
+            "latent_image": ["LATENT"],
+            "denoise": ["FLOAT", {"default": 1.0, "min": 0.0, "max": 1.0, "step": 0.01}],
+        }}, "output": ["LATENT"]},
+        "CLIPTextEncode": {"input": {"required": {"text": ["STRING", {"multiline": True}], "clip": ["CLIP"]}}, "output": ["CONDITIONING"]},
+        "EmptyLatentImage": {"input": {"required": {
+            "width": ["INT", {"default": 512, "min": 16, "max": 16384, "step": 8}],
+            "height": ["INT", {"default": 512, "min": 16, "max": 16384, "step": 8}],
+            "batch_size": ["INT", {"default": 1, "min": 1, "max": 4096}],
+        }}, "output": ["LATENT"]},
+        "VAEDecode": {"input": {"required": {"samples": ["LATENT"], "vae": ["VAE"]}}, "output": ["IMAGE"]},
+        "SaveImage": {"input": {"required": {"images": ["IMAGE"], "filename_prefix": ["STRING", {"default": "ComfyUI"}]}}, "output": [], "output_node": True},
+    }
+    for i in range(max(settings.object_info_nodes - len(info), 0)):
+        info[f"BenchNode{i:05d}"] = {
+            "input": {"required": {
+                "image": ["IMAGE"],
+                "amount": ["FLOAT", {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.01}],
+                "mode": [["a", "b", "c", "d"]],
+                "label": ["STRING", {"default": f"node {i}"}],
+            }},
+            "output": ["IMAGE"],
+            "category": "bench",
+            "description": "Synthetic node for load tests",
+        }
+    return info
+
+def render_image(width: int, height: int, format: str) -> bytes:
+    # Noise compresses poorly, so output sizes resemble real renders
+    img = Image.frombytes("RGB", (width, height), random.randbytes(width * height * 3))
+    out = io.BytesIO()
+    img.save(out, format)
+    return out.getvalue()
+
+class FakeComfy:
+    def __init__(self, settings: FakeComfySettings):
+        self.settings = settings
+        self.object_info = json.dumps(build_object_info(settings)).encode()
+        self.image = render_image(settings.image_width, settings.image_height, settings.image_format)
+        self.preview = render_image(64, 64, "JPEG") if settings.previews else b""
+        self.pending: "deque[list]" = deque()
+        self.running: Optional[list] = None
+        self.history: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.sockets: Dict[str, Set[WebSocket]] = {}
+        self._number = 0
+        self._wake = asyncio.Event()
+        self._interrupted = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def queue_prompt(self, prompt: Dict[str, Any], client_id: Optional[str], prompt_id: Optional[str] = None) -> Dict[str, Any]:
+        prompt_id = prompt_id or str(uuid.uuid4())
+        self._number += 1
+        self.pending.append([self._number, prompt_id, prompt, {"client_id": client_id}, self._output_nodes(prompt)])
+        self._wake.set()
+        return {"prompt_id": prompt_id, "number": self._number, "node_errors": {}}
+
+    def _output_nodes(self, prompt: Dict[str, Any]):
+        nodes = [node_id for node_id, node in prompt.items() if isinstance(node, dict) and node.get("class_type") in OUTPUT_NODES]
+        return nodes or list(prompt)[-1:]
+
+    def delete(self, prompt_ids):
+        self.pending = deque(item for item in self.pending if item[1] not in prompt_ids)
+
+    def interrupt(self, prompt_id: Optional[str] = None):
+        if self.running is not None and prompt_id in (None, self.running[1]):
+            self._interrupted.set()
+
+    async def send(self, client_id: Optional[str], message: Any):
+        for ws in list(self.sockets.get(client_id, ())):
+            try:
+                if isinstance(message, bytes):
+                    await ws.send_bytes(message)
+                else:
+                    await ws.send_text(json.dumps(message))
+            except Exception:
+                self.sockets.get(client_id, set()).discard(ws)
+
+    async def _run(self):
+        while True:
+            if not self.pending:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            self.running = self.pending.popleft()
+            try:
+                await self._execute(*self.running)
+            finally:
+                self.running = None
+
+    async def _execute(self, number, prompt_id, prompt, extra, outputs):
+        client_id = extra.get("client_id")
+        settings = self.settings
+        self._interrupted.clear()
+        await self.send(client_id, {"type": "execution_start", "data": {"prompt_id": prompt_id, "timestamp": int(time.time() * 1000)}})
+
+        duration = settings.exec_time * (1 + random.uniform(-settings.exec_jitter, settings.exec_jitter))
+        steps = max(settings.steps, 1)
+        node = next(iter(prompt), None)
+        await self.send(client_id, {"type": "executing", "data": {"node": node, "prompt_id": prompt_id}})
+        for step in range(1, steps + 1):
+            try:
+                await asyncio.wait_for(self._interrupted.wait(), timeout=duration / steps)
+            except asyncio.TimeoutError:
+                pass
+            if self._interrupted.is_set():
+                await self.send(client_id, {"type": "execution_interrupted", "data": {"prompt_id": prompt_id, "node_id": node}})
+                self._record(prompt_id, prompt, extra, {}, "error", [["execution_interrupted", {"prompt_id": prompt_id}]])
+                return
+            await self.send(client_id, {"type": "progress", "data": {"value": step, "max": steps, "prompt_id": prompt_id, "node": node}})
+            if self.preview:
+                await self.send(client_id, struct.pack(">II", 1, 1) + self.preview)
+
+        results = {}
+        for node_id in outputs:
+            output = {"images": [{"filename": f"bench_{prompt_id}_{node_id}.{settings.image_format.lower()}", "subfolder": "", "type": "output"}]}
+            results[node_id] = output
+            await self.send(client_id, {"type": "executed", "data": {"node": node_id, "output": output, "prompt_id": prompt_id}})
+        self._record(prompt_id, prompt, extra, results, "success", [["execution_success", {"prompt_id": prompt_id}]])
+        await self.send(client_id, {"type": "execution_success", "data": {"prompt_id": prompt_id}})
+        await self.send(client_id, {"type": "executing", "data": {"node": None, "prompt_id": prompt_id}})
+
+    def _record(self, prompt_id, prompt, extra, outputs, status, messages):
+        self.history[prompt_id] = {
+            "prompt": [0, prompt_id, prompt, extra, list(outputs)],
+            "outputs": outputs,
+            "status": {"status_str": status, "completed": status == "success", "messages": messages},
+        }
+        while len(self.history) > self.settings.history_size:
+            self.history.popitem(last=False)
+
+    def queue(self) -> Dict[str, Any]:
+        return {"queue_running": [self.running] if self.running else [], "queue_pending": list(self.pending)}
+
+def create_app(settings: Optional[FakeComfySettings] = None) -> FastAPI:
+    comfy = FakeComfy(settings or FakeComfySettings())
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        comfy.start()
+        yield
+        await comfy.stop()
+
+    app = FastAPI(title="Fake ComfyUI", lifespan=lifespan)
+    app.state.comfy = comfy
+
+    @app.post("/prompt")
+    async def post_prompt(request: Request):
+        body = await request.json()
+        if not isinstance(body.get("prompt"), dict):
+            raise HTTPException(status_code=400, detail="prompt must be an object")
+        # Requests served before startup (e.g. TestClient without a lifespan) still run
+        comfy.start()
+        return comfy.queue_prompt(body["prompt"], body.get("client_id"), body.get("prompt_id"))
+
+    @app.get("/queue")
+    async def get_queue():
+        return comfy.queue()
+
+    @app.post("/queue")
+    async def post_queue(request: Request):
+        body = await request.json()
+        if body.get("clear"):
+            comfy.pending.clear()
+        if body.get("delete"):
+            comfy.delete(set(body["delete"]))
+        return Response()
+
+    @app.post("/interrupt")
+    async def post_interrupt(request: Request):
+        body = await request.body()
+        comfy.interrupt(json.loads(body).get("prompt_id") if body else None)
+        return Response()
+
+    @app.get("/history")
+    async def get_history(max_items: Optional[int] = None):
+        items = list(comfy.history.items())
+        if max_items is not None:
+            items = items[-max_items:] if max_items > 0 else []
+        return dict(items)
+
+    @app.get("/history/{prompt_id}")
+    async def get_prompt_history(prompt_id: str):
+        entry = comfy.history.get(prompt_id)
+        return {prompt_id: entry} if entry else {}
+
+    @app.api_route("/view", methods=["GET", "HEAD"])
+    async def view(filename: str, subfolder: str = "", type: str = "output"):
+        media_type = "image/" + comfy.settings.image_format.lower()
+        return Response(comfy.image, media_type=media_type)
+
+    @app.get("/object_info")
+    async def object_info():
+        return Response(comfy.object_info, media_type="application/json")
+
+    @app.get("/embeddings")
+    async def embeddings():
+        return [f"embedding_{i:04d}" for i in range(min(comfy.settings.models, 100))]
+
+    @app.websocket("/ws")
+    async def websocket(ws: WebSocket, clientId: Optional[str] = None):
+        await ws.accept()
+        client_id = clientId or uuid.uuid4().hex
+        comfy.sockets.setdefault(client_id, set()).add(ws)
+        try:
+            remaining = len(comfy.pending) + (1 if comfy.running else 0)
+            await ws.send_text(json.dumps({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": remaining}}, "sid": client_id}}))
+            while True:
+                await ws.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            comfy.sockets.get(client_id, set()).discard(ws)
+
+    return app
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fake ComfyUI server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    defaults = FakeComfySettings()
+    parser.add_argument("--exec-time", type=float, default=defaults.exec_time, help="Seconds per prompt")
+    parser.add_argument("--exec-jitter", type=float, default=defaults.exec_jitter, help="Random +/- fraction of exec-time")
+    parser.add_argument("--steps", type=int, default=defaults.steps, help="Progress events per prompt")
+    parser.add_argument("--object-info-nodes", type=int, default=defaults.object_info_nodes, help="Node classes in /object_info")
+    parser.add_argument("--models", type=int, default=defaults.models, help="Entries per model list")
+    parser.add_argument("--image-width", type=int, default=defaults.image_width)
+    parser.add_argument("--image-height", type=int, default=defaults.image_height)
+    parser.add_argument("--image-format", default=defaults.image_format, choices=["PNG", "JPEG", "WEBP"])
+    parser.add_argument("--previews", action="store_true", help="Send a preview frame with every progress event")
+    return parser.parse_args(argv)
+
+def settings_from_args(args: argparse.Namespace) -> FakeComfySettings:
+    return FakeComfySettings(
+        exec_time=args.exec_time,
+        exec_jitter=args.exec_jitter,
+        steps=args.steps,
+        object_info_nodes=args.object_info_nodes,
+        models=args.models,
+        image_width=args.image_width,
+        image_height=args.image_height,
+        image_format=args.image_format,
+        previews=args.previews,
+    )
+
+if __name__ == "__main__":
+    import uvicorn
+    args = parse_args()
+    uvicorn.run(create_app(settings_from_args(args)), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,254 @@
+"""Load generator for the wrapper.
+
+Drives /run, /history, /proxy/image and the model lists at a fixed
+concurrency and reports throughput, p50/p99 latency and the wrapper's peak
+RSS. With --spawn it starts a fake ComfyUI and a wrapper pointed at it, so a
+run needs nothing else:
+
+    python -m bench.load --spawn --scenario all --concurrency 32 --duration 20
+
+Results can be saved with --output and compared against a saved baseline
+with --baseline; the exit status is non-zero when throughput drops or p99
+grows by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("run", "history", "image", "models")
+# Distinct output files /proxy/image cycles through (hits after the first round)
+IMAGE_FILES = 64
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+def read_rss(pid: int) -> Optional[int]:
+    """Resident set size of a process in bytes (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+class RssSampler:
+    """Peak RSS of the wrapper process while a scenario runs."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _sample(self):
+        rss = read_rss(self.pid)
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    async def _run(self):
+        while True:
+            self._sample()
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        if self.pid:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        if self._task is not None:
+            self._task.cancel()
+            self._sample()
+
+def request_factory(scenario: str, args: argparse.Namespace) -> Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]:
+    """A coroutine function issuing the n-th request of a scenario."""
+    if scenario == "run":
+        async def run(client, n):
+            body = {"workflow_name": args.workflow, "inputs": {}, "seed_control": {"mode": "random"}}
+            return await client.post("/run", json=body)
+        return run
+    if scenario == "history":
+        async def history(client, n):
+            return await client.get("/history", params={"limit": 50})
+        return history
+    if scenario == "image":
+        async def image(client, n):
+            params = {"filename": f"bench_{n % IMAGE_FILES}.png", "type": "output"}
+            if args.image_width:
+                params["w"] = args.image_width
+            return await client.get("/proxy/image", params=params)
+        return image
+    if scenario == "models":
+        async def models(client, n):
+            kind = ("checkpoints", "loras")[n % 2]
+            return await client.get(f"/models/{kind}", params={"limit": 100, "prefix": kind[:3]})
+        return models
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+async def run_scenario(scenario: str, args: argparse.Namespace, pid: Optional[int]) -> Dict[str, Any]:
+    make_request = request_factory(scenario, args)
+    latencies: List[float] = []
+    errors = 0
+    counter = 0
+    deadline = time.perf_counter() + args.duration
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        async def worker():
+            nonlocal errors, counter
+            while time.perf_counter() < deadline and (not args.requests or counter < args.requests):
+                n = counter
+                counter += 1
+                start = time.perf_counter()
+                try:
+                    response = await make_request(client, n)
+                    await response.aread()
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+        with RssSampler(pid) as rss:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": scenario,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+        "peak_rss_mb": round(rss.peak / 1024 ** 2, 1) if rss.peak else None,
+    }
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Regressions of ``results`` against ``baseline`` beyond ``tolerance``."""
+    previous = {entry["scenario"]: entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        base = previous.get(entry["scenario"])
+        if base is None:
+            continue
+        if base["throughput"] and entry["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{entry['scenario']}: throughput {entry['throughput']} < {base['throughput']}")
+        if base["p99_ms"] and entry["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{entry['scenario']}: p99 {entry['p99_ms']}ms > {base['p99_ms']}ms")
+    return regressions
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def wait_ready(url: str, path: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while True:
+            try:
+                await client.get(path)
+                return
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not start")
+                await asyncio.sleep(0.2)
+
+def spawn(args: argparse.Namespace, workdir: Path) -> List[subprocess.Popen]:
+    """Start a fake ComfyUI and a wrapper using it; sets args.url and args.pid."""
+    comfy_port, wrapper_port = free_port(), free_port()
+    comfy = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_comfy", "--port", str(comfy_port), *args.fake_args],
+        cwd=ROOT,
+    )
+    env = {
+        **os.environ,
+        "COMFYUI_URL": f"http://127.0.0.1:{comfy_port}",
+        "COMFYUI_WORKFLOW_DIR": str(ROOT / "workflows"),
+        "JOB_DB_PATH": str(workdir / "jobs.db"),
+        "OUTPUT_CACHE_DIR": str(workdir / "cache"),
+    }
+    wrapper = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(wrapper_port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    args.url = f"http://127.0.0.1:{wrapper_port}"
+    args.pid = wrapper.pid
+    return [wrapper, comfy]
+
+async def main(args: argparse.Namespace) -> int:
+    processes: List[subprocess.Popen] = []
+    workdir = tempfile.TemporaryDirectory(prefix="comfyui-remote-bench-")
+    try:
+        if args.spawn:
+            processes = spawn(args, Path(workdir.name))
+            await wait_ready(args.url, "/workflows")
+
+        scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+        results = []
+        for scenario in scenarios:
+            result = await run_scenario(scenario, args, args.pid)
+            results.append(result)
+            print(json.dumps(result))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        workdir.cleanup()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load generator for the ComfyUI Remote wrapper")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Wrapper URL (ignored with --spawn)")
+    parser.add_argument("--pid", type=int, help="Wrapper process id, for RSS")
+    parser.add_argument("--spawn", action="store_true", help="Start a fake ComfyUI and a wrapper for this run")
+    parser.add_argument("--scenario", default="all", choices=("all",) + SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--requests", type=int, default=0, help="Stop a scenario after this many requests (0: duration only)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--workflow", default="basic_txt2img", help="Workflow submitted by the run scenario")
+    parser.add_argument("--image-width", type=int, default=0, help="Request preview variants of this width (0: originals)")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput/p99 regression (fraction)")
+    parser.add_argument("fake_args", nargs=argparse.REMAINDER, help="Arguments after -- go to the fake ComfyUI (with --spawn)")
+    args = parser.parse_args(argv)
+    if args.fake_args and args.fake_args[0] == "--":
+        args.fake_args = args.fake_args[1:]
+    return args
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Dict, Awaitable, Callable, Tuple
+from models import JobResponse
+
+class PromptCoalescer:
+    """Shares one ComfyUI execution between identical in-flight submissions.
+
+    Keyed by prompt hash. The first submission queues the prompt; identical
+    ones arriving while it is being queued, waiting in our queue, queued or
+    running get the first job back and attach to its prompt instead of
+    queueing a duplicate.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # prompt_id -> key, to release the key when the prompt finishes
+        self._keys: Dict[str, str] = {}
+        self.coalesced = 0
+
+    async def submit(self, key: str, queue: Callable[[], Awaitable[JobResponse]]) -> Tuple[JobResponse, bool]:
+        """Run ``queue`` unless an identical prompt is in flight.
+
+        Returns the job that owns the execution and whether it was shared.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            job = await queue()
+        except BaseException as e:
+            del self._inflight[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Retrieved by waiters, if any
+                future.exception()
+            raise
+        future.set_result(job)
+        if job.status in ("pending", "queued", "running"):
+            self._keys[job.prompt_id] = key
+        else:
+            # Finished (or was cached) before we got here
+            del self._inflight[key]
+        return job, False
+
+    def move(self, prompt_id: str, new_prompt_id: str):
+        """A pending prompt was queued under another id."""
+        key = self._keys.pop(prompt_id, None)
+        if key is not None:
+            self._keys[new_prompt_id] = key
+
+    def release(self, prompt_id: str):
+        """The prompt finished: later submissions run it again."""
+        key = self._keys.pop(prompt_id, None)
+        if key is not None:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "coalesced": self.coalesced}
+
+prompt_coalescer = PromptCoalescer()
@@ -1,32 +1,165 @@
 import httpx
+import time
 import uuid
-import json
 import random
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, BinaryIO
 from config import config
+from serialization import dumps_str
 from models import RunWorkflowRequest, JobResponse
+from metrics import upstream_request_duration, upstream_endpoint
 
 class ComfyAPI:
-    def __init__(self):
+    def __init__(self, base_url: Optional[str] = None, name: str = "default"):
+        # None follows config.COMFYUI_URL (the primary backend)
+        self.base_url = base_url
+        # Backend name, used as the metrics label
+        self.name = name
         self.client_id = str(uuid.uuid4())
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "connections_opened": 0,
+        }
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            base_url=self.url,
+            limits=limits,
+            timeout=self.timeout_for(""),
+        )
+
+    @property
+    def url(self) -> str:
+        return self.base_url or config.COMFYUI_URL
+
+    async def start(self):
+        """Create the shared connection pool (called from the app lifespan)."""
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily as well, so scripts and tests that skip the lifespan still work
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def timeout_for(self, endpoint: str) -> httpx.Timeout:
+        path = endpoint.split("?", 1)[0]
+        best = ""
+        for prefix in config.HTTP_TIMEOUTS:
+            if path.startswith(prefix) and len(prefix) > len(best):
+                best = prefix
+        return httpx.Timeout(config.HTTP_TIMEOUTS.get(best, 30.0), connect=config.HTTP_CONNECT_TIMEOUT)
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        # httpcore only emits connect_tcp when the pool has no idle connection to reuse
+        if event_name == "connection.connect_tcp.complete":
+            self._stats["connections_opened"] += 1
 
-    async def _request(self, method: str, endpoint: str, json_data: Any = None):
-        url = f"{config.COMFYUI_URL}{endpoint}"
-        async with httpx.AsyncClient() as client:
-            try:
-                if method == "GET":
-                    response = await client.get(url)
-                elif method == "POST":
-                    response = await client.post(url, json=json_data)
-                else:
-                    raise ValueError(f"Unsupported method: {method}")
-                
-                response.raise_for_status()
-                return response
-            except httpx.RequestError as exc:
-                raise Exception(f"ComfyUI unreachable: {exc}")
-            except httpx.HTTPStatusError as exc:
-                raise Exception(f"ComfyUI error: {exc.response.text}")
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        json_data: Any = None,
+        params: Optional[Dict[str, Any]] = None,
+        content: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        data: Optional[Dict[str, Any]] = None,
+        files: Any = None,
+    ) -> httpx.Response:
+        """Send a request over the shared pool without raising on HTTP error status."""
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Unsupported method: {method}")
+
+        self._stats["requests"] += 1
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self.client.request(
+                method,
+                endpoint,
+                json=json_data,
+                params=params,
+                content=content,
+                headers=headers,
+                data=data,
+                files=files,
+                timeout=self.timeout_for(endpoint),
+                extensions={"trace": self._trace},
+            )
+            status = str(response.status_code)
+            return response
+        except httpx.RequestError:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            upstream_request_duration.observe(time.perf_counter() - start, self.name, upstream_endpoint(endpoint), status)
+
+    async def _request(self, method: str, endpoint: str, json_data: Any = None, params: Optional[Dict[str, Any]] = None, content: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None, data: Optional[Dict[str, Any]] = None, files: Any = None):
+        try:
+            response = await self.request(method, endpoint, json_data, params, content, headers, data, files)
+            response.raise_for_status()
+            return response
+        except httpx.RequestError as exc:
+            raise Exception(f"ComfyUI unreachable: {exc}")
+        except httpx.HTTPStatusError as exc:
+            raise Exception(f"ComfyUI error: {exc.response.text}")
+
+    async def open_view(self, method: str, params: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """Open /view as a stream; the caller must aclose() the response."""
+        request = self.client.build_request(
+            method,
+            "/view",
+            params=params,
+            headers=headers,
+            timeout=self.timeout_for("/view"),
+            extensions={"trace": self._trace},
+        )
+        self._stats["requests"] += 1
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self.client.send(request, stream=True)
+            status = str(response.status_code)
+            return response
+        except httpx.RequestError:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            upstream_request_duration.observe(time.perf_counter() - start, self.name, "/view", status)
+
+    def open_connections(self) -> int:
+        """Connections currently held by the pool (active or idle)."""
+        if self._client is None:
+            return 0
+        pool = getattr(self._client._transport, "_pool", None)
+        return len(getattr(pool, "connections", ()))
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection reuse counters for the shared pool."""
+        requests = self._stats["requests"]
+        reused = max(requests - self._stats["errors"] - self._stats["connections_opened"], 0)
+        return {
+            **self._stats,
+            "open_connections": self.open_connections(),
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / requests, 4) if requests else 0.0,
+            "max_connections": config.HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": config.HTTP_KEEPALIVE_EXPIRY,
+        }
 
     async def queue_prompt(self, workflow: Dict[str, Any]) -> str:
         payload = {
@@ -36,20 +169,67 @@ class ComfyAPI:
         response = await self._request("POST", "/prompt", payload)
         return response.json().get("prompt_id")
 
+    async def queue_prompt_json(self, prompt_json: str, prompt_id: Optional[str] = None) -> str:
+        """Queue a prompt that is already serialized (see WorkflowTemplate.render).
+
+        ``prompt_id`` asks ComfyUI to use that id; versions that predate this
+        pick their own, so always use the returned one.
+        """
+        payload = '{"prompt":' + prompt_json + ',"client_id":' + dumps_str(self.client_id)
+        if prompt_id:
+            payload += ',"prompt_id":' + dumps_str(prompt_id)
+        payload += '}'
+        response = await self._request("POST", "/prompt", content=payload.encode(), headers={"Content-Type": "application/json"})
+        return response.json().get("prompt_id")
+
     async def get_history(self, prompt_id: str) -> Optional[Dict[str, Any]]:
         response = await self._request("GET", f"/history/{prompt_id}")
         history = response.json()
         return history.get(prompt_id)
 
+    async def get_history_bulk(self, max_items: int) -> Dict[str, Any]:
+        """Most recent history entries keyed by prompt id, in one request."""
+        response = await self._request("GET", "/history", params={"max_items": max_items})
+        return response.json()
+
     async def get_queue(self):
         response = await self._request("GET", "/queue")
         return response.json()
 
+    async def delete_queued(self, prompt_ids: List[str]):
+        """Remove prompts from ComfyUI's pending queue (ids that are not pending are ignored)."""
+        await self._request("POST", "/queue", {"delete": prompt_ids})
+
+    async def interrupt(self, prompt_id: Optional[str] = None):
+        """Interrupt the running prompt; with ``prompt_id``, ComfyUI versions that
+        support it leave any other prompt alone."""
+        await self._request("POST", "/interrupt", {"prompt_id": prompt_id} if prompt_id else {})
+
+    async def upload_image(self, name: str, file: BinaryIO, content_type: str) -> Dict[str, Any]:
+        """Stream a file into ComfyUI's input directory as ``name``, replacing any file of that name."""
+        response = await self._request("POST", "/upload/image", data={"type": "input", "overwrite": "true"}, files={"image": (name, file, content_type)})
+        return response.json()
+
+    async def has_input(self, name: str) -> bool:
+        """Whether ComfyUI's input directory has ``name`` (HEAD /view, no body transferred)."""
+        response = await self.open_view("HEAD", {"filename": name, "type": "input"})
+        await response.aclose()
+        return response.status_code == 200
+
     async def get_image(self, filename: str, subfolder: str = "", type: str = "output") -> bytes:
-        params = f"?filename={filename}&subfolder={subfolder}&type={type}"
-        response = await self._request("GET", f"/view{params}")
+        params = {"filename": filename, "subfolder": subfolder, "type": type}
+        response = await self._request("GET", "/view", params=params)
         return response.content
 
+    async def get_object_info_raw(self) -> bytes:
+        """Undecoded /object_info body, so callers can parse it off the event loop."""
+        response = await self._request("GET", "/object_info")
+        return response.content
+
+    async def get_embeddings(self) -> List[str]:
+        response = await self._request("GET", "/embeddings")
+        return response.json()
+
     async def get_object_info(self) -> Dict[str, Any]:
         """Get information about all available nodes and their inputs from ComfyUI."""
         response = await self._request("GET", "/object_info")
@@ -0,0 +1,157 @@
+import asyncio
+from typing import Dict, Any, Optional
+import websockets
+from config import config
+from serialization import loads
+from backends import backend_pool, Backend
+from job_tracker import job_tracker
+from previews import preview_relay
+from job_reconciler import JobReconciler, job_reconciler, job_reconcilers
+
+# Binary websocket frame types sent by ComfyUI
+PREVIEW_IMAGE = 1
+PREVIEW_IMAGE_WITH_METADATA = 4
+
+class ComfyEventListener:
+    """One persistent connection to a backend's /ws that drives its in-flight jobs."""
+
+    def __init__(self, backend: Optional[Backend] = None, reconciler: Optional[JobReconciler] = None):
+        self.backend = backend or backend_pool.primary
+        self.reconciler = reconciler or job_reconciler
+        self.connected = False
+        self._task: Optional[asyncio.Task] = None
+        # Outputs reported by "executed" events, per prompt
+        self._outputs: Dict[str, Dict[str, Any]] = {}
+        # Prompts with cached nodes, whose outputs are only available from /history
+        self._partial: set = set()
+        # Prompt currently executing, for previews that do not name one
+        self._current: Optional[str] = None
+
+    def _ws_url(self) -> str:
+        api = self.backend.api
+        base = api.url.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        return f"{base}/ws?clientId={api.client_id}"
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    async def _run(self):
+        delay = config.WS_RECONNECT_MIN_DELAY
+        while True:
+            try:
+                async with websockets.connect(self._ws_url(), max_size=None) as ws:
+                    self.connected = True
+                    delay = config.WS_RECONNECT_MIN_DELAY
+                    # Catch up on anything that finished while we were not listening
+                    self.reconciler.set_push_available(True)
+                    async for message in ws:
+                        if isinstance(message, bytes):
+                            self.handle_binary(message)
+                            continue
+                        await self.handle_message(loads(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ComfyUI event stream error: {e}")
+
+            if self.connected:
+                # Fall back to batched reconciliation while the socket is down
+                self.connected = False
+                self.reconciler.set_push_available(False)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, config.WS_RECONNECT_MAX_DELAY)
+
+    def handle_binary(self, message: bytes):
+        """Relay latent preview frames to clients watching the prompt."""
+        if len(message) < 8:
+            return
+        event_type = int.from_bytes(message[:4], "big")
+        prompt_id = self._current
+        if event_type == PREVIEW_IMAGE:
+            image = message[8:]
+        elif event_type == PREVIEW_IMAGE_WITH_METADATA:
+            length = int.from_bytes(message[4:8], "big")
+            try:
+                metadata = loads(message[8:8 + length])
+            except ValueError:
+                return
+            prompt_id = metadata.get("prompt_id") or prompt_id
+            image = message[8 + length:]
+        else:
+            return
+        if prompt_id and image:
+            preview_relay.publish(prompt_id, image)
+
+    async def handle_message(self, message: Dict[str, Any]):
+        event = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return
+
+        try:
+            if event == "execution_start":
+                self._current = prompt_id
+                job_tracker.mark_running(prompt_id)
+            elif event == "execution_cached":
+                if data.get("nodes"):
+                    self._partial.add(prompt_id)
+            elif event == "executing":
+                if data.get("node") is None:
+                    # Older ComfyUI versions signal completion this way
+                    await self._finish(prompt_id)
+                else:
+                    self._current = prompt_id
+                    job_tracker.update_progress(prompt_id, str(data["node"]))
+            elif event == "progress":
+                node = data.get("node")
+                job_tracker.update_progress(prompt_id, str(node) if node is not None else None, data.get("value", 0), data.get("max", 0))
+            elif event == "executed":
+                if data.get("output"):
+                    self._outputs.setdefault(prompt_id, {})[str(data.get("node"))] = data["output"]
+            elif event == "execution_success":
+                await self._finish(prompt_id)
+            elif event == "execution_error":
+                self._forget(prompt_id)
+                job_tracker.fail_job(prompt_id, data.get("exception_message", "Execution error"))
+            elif event == "execution_interrupted":
+                self._forget(prompt_id)
+                job_tracker.fail_job(prompt_id, "Interrupted")
+        except Exception as e:
+            print(f"Error handling {event} for {prompt_id}: {e}")
+
+    async def _finish(self, prompt_id: str):
+        outputs = self._outputs.get(prompt_id)
+        partial = prompt_id in self._partial
+        self._forget(prompt_id)
+        # Newer ComfyUI sends both execution_success and a final "executing"
+        if job_tracker.is_finished(prompt_id):
+            return
+
+        if outputs and not partial:
+            job_tracker.complete_job(prompt_id, {"outputs": outputs, "status": {"status_str": "success"}})
+        else:
+            await job_tracker.refresh(prompt_id, self.backend)
+
+    def _forget(self, prompt_id: str):
+        if self._current == prompt_id:
+            self._current = None
+        self._outputs.pop(prompt_id, None)
+        self._partial.discard(prompt_id)
+
+# One listener per backend; comfy_events is the primary's
+comfy_event_listeners: Dict[str, ComfyEventListener] = {
+    name: ComfyEventListener(backend_pool.get(name), reconciler) for name, reconciler in job_reconcilers.items()
+}
+comfy_events = comfy_event_listeners[backend_pool.primary.name]
@@ -0,0 +1,180 @@
+import asyncio
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from config import config
+from serialization import dumps
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Content types worth compressing (event and preview streams are left alone)
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html")
+# Bodies compressed on a worker thread rather than on the event loop
+THREAD_MIN_BYTES = 256 * 1024
+
+def encodings():
+    """Supported content codings, preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The coding to answer with for an Accept-Encoding header; None for identity."""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        weight = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding.strip():
+            weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+def compress(data: bytes, coding: str, best: bool = False) -> bytes:
+    """gzip or brotli ``data``; ``best`` trades time for size, for bodies that are compressed once."""
+    if coding == "br":
+        return brotli.compress(data, quality=11 if best else 4)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+async def compress_async(data: bytes, coding: str, best: bool = False) -> bytes:
+    if len(data) >= THREAD_MIN_BYTES:
+        return await asyncio.to_thread(compress, data, coding, best)
+    return compress(data, coding, best)
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON and text responses per Accept-Encoding.
+
+    Only complete bodies of COMPRESSIBLE_TYPES of at least COMPRESS_MIN_BYTES
+    are compressed; responses that already carry a Content-Encoding (e.g. from
+    response_cache) pass through untouched, as do streams of other types.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or config.COMPRESS_MIN_BYTES <= 0:
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Dict[str, Any]] = None
+        body = []
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "").split(";", 1)[0]
+                if content_type in COMPRESSIBLE_TYPES and "content-encoding" not in headers:
+                    start = message
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                body.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                data = b"".join(body)
+                headers = MutableHeaders(raw=start["headers"])
+                if len(data) >= config.COMPRESS_MIN_BYTES:
+                    data = await compress_async(data, coding)
+                    headers["Content-Encoding"] = coding
+                    headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    headers["Content-Length"] = str(len(data))
+                await send(start)
+                await send({"type": "http.response.body", "body": data})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+class ResponseCache:
+    """Encoded JSON responses that stay the same until their source changes.
+
+    Workflow graphs, their introspection and object_info-derived model lists
+    are serialized once per source version, and compressed once per coding at
+    the highest level, instead of on every request. Entries are served with an
+    ETag (If-None-Match answers 304) and evicted least recently used first.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, request: Request, key: Hashable, version: Any) -> Optional[Response]:
+        """The cached response for ``key`` if it was built from ``version`` of its source."""
+        entry = self._entries.get(key)
+        if entry is None or entry["version"] != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return await self._response(request, entry)
+
+    async def put(self, request: Request, key: Hashable, version: Any, content: Any) -> Response:
+        """Cache ``content`` (built from ``version`` of its source) under ``key`` and answer with it.
+
+        ``version`` is kept and compared with ``!=``; the source object itself
+        works when a new one replaces it on every change.
+        """
+        identity = await asyncio.to_thread(dumps, content)
+        entry = {"version": version, "hash": hashlib.sha256(identity).hexdigest()[:16], "identity": identity}
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > config.RESPONSE_CACHE_SIZE:
+            self._entries.popitem(last=False)
+        return await self._response(request, entry)
+
+    async def _response(self, request: Request, entry: Dict[str, Any]) -> Response:
+        coding = None
+        if config.COMPRESS_MIN_BYTES > 0 and len(entry["identity"]) >= config.COMPRESS_MIN_BYTES:
+            coding = negotiate(request.headers.get("accept-encoding", ""))
+        # Each coding is its own representation, with its own tag
+        etag = f'"{entry["hash"]}-{coding}"' if coding else f'"{entry["hash"]}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if etag in tags or "*" in tags:
+                return Response(status_code=304, headers=headers)
+
+        body = entry["identity"]
+        if coding:
+            if coding not in entry:
+                entry[coding] = await asyncio.to_thread(compress, body, coding, True)
+            body = entry[coding]
+            headers["Content-Encoding"] = coding
+        return Response(body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": sum(len(body) for entry in self._entries.values() for name, body in entry.items() if isinstance(body, bytes)),
+            "encodings": list(encodings()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+response_cache = ResponseCache()
@@ -2,7 +2,8 @@ import os
 import argparse
 import yaml
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Dict, Any, List
+from urllib.parse import urlparse
 
 # Defaults
 DEFAULT_COMFYUI_URL = "http://localhost:8188"
@@ -14,12 +15,201 @@ DEFAULT_WORKFLOW_PATHS = [
     "~/pinokio/api/comfy.git/app/user/default/workflows",
 ]
 
+# Backend pool: seconds between /queue health probes, weight of the newest
+# sample in the execution time average, and the assumed time before any sample
+DEFAULT_BACKEND_HEALTH_INTERVAL = 5.0
+DEFAULT_BACKEND_EWMA_ALPHA = 0.3
+DEFAULT_BACKEND_DEFAULT_EXECUTION_TIME = 10.0
+
+# Upstream HTTP client defaults
+DEFAULT_HTTP_MAX_CONNECTIONS = 100
+DEFAULT_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_HTTP_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_HTTP_CONNECT_TIMEOUT = 5.0
+# Read timeouts per ComfyUI endpoint (longest matching prefix wins)
+DEFAULT_HTTP_TIMEOUTS = {
+    "": 30.0,
+    "/prompt": 30.0,
+    "/history": 10.0,
+    "/queue": 10.0,
+    "/interrupt": 10.0,
+    "/view": 120.0,
+    "/upload": 120.0,
+    "/object_info": 60.0,
+}
+
+# ComfyUI websocket event listener
+DEFAULT_WS_RECONNECT_MIN_DELAY = 1.0
+DEFAULT_WS_RECONNECT_MAX_DELAY = 30.0
+
+# Batched job reconciliation (seconds between sweeps)
+DEFAULT_RECONCILE_MIN_INTERVAL = 1.0
+DEFAULT_RECONCILE_MAX_INTERVAL = 30.0
+DEFAULT_RECONCILE_HISTORY_ITEMS = 64
+
+# Streaming media proxy
+DEFAULT_PROXY_CHUNK_SIZE = 64 * 1024
+
+# On-disk output cache
+DEFAULT_OUTPUT_CACHE_DIR = "~/.comfyui-remote/cache"
+DEFAULT_OUTPUT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_OUTPUT_CACHE_MAX_AGE = 86400
+DEFAULT_OUTPUT_CACHE_PREFETCH_CONCURRENCY = 4
+
+# Thumbnail / preview variants
+DEFAULT_VARIANT_WORKERS = 2
+DEFAULT_VARIANT_MAX_WIDTH = 2048
+DEFAULT_VARIANT_QUALITY = 80
+
+# Seconds a fetched /object_info stays fresh
+DEFAULT_OBJECT_INFO_TTL = 300.0
+
+# Workflow catalog: parsed graphs kept in memory, and the polling
+# interval used when no filesystem watcher is available
+DEFAULT_WORKFLOW_CACHE_SIZE = 32
+DEFAULT_WORKFLOW_POLL_INTERVAL = 2.0
+
+# Job history database and its retention (0 disables a limit)
+DEFAULT_JOB_DB_PATH = "~/.comfyui-remote/jobs.db"
+DEFAULT_JOB_RETENTION_DAYS = 30
+DEFAULT_JOB_RETENTION_MAX = 50000
+
+# Job event stream (/events): events kept for Last-Event-ID resume, events
+# queued per subscriber before it is cut off, keepalive and client retry seconds
+DEFAULT_EVENT_BUFFER_SIZE = 1000
+DEFAULT_EVENT_QUEUE_SIZE = 256
+DEFAULT_EVENT_HEARTBEAT = 15.0
+DEFAULT_EVENT_RETRY = 3.0
+
+# Live preview relay: max frames per second per subscriber, frame width, JPEG quality
+DEFAULT_PREVIEW_FPS = 4.0
+DEFAULT_PREVIEW_MAX_WIDTH = 384
+DEFAULT_PREVIEW_QUALITY = 70
+
+# Results of fixed-seed prompts reused for identical runs (size 0 disables)
+DEFAULT_RESULT_CACHE_SIZE = 1024
+DEFAULT_RESULT_CACHE_TTL = 7 * 86400
+
+# Identical submissions while the first is queued or running share its
+# execution; random-seed runs only when COALESCE_RANDOM_SEEDS is set
+DEFAULT_COALESCE_IN_FLIGHT = True
+DEFAULT_COALESCE_RANDOM_SEEDS = False
+
+# Batch runs: prompts submitted to ComfyUI at once, runs per batch,
+# and batches remembered for status lookups
+DEFAULT_BATCH_CONCURRENCY = 4
+DEFAULT_BATCH_MAX_RUNS = 256
+DEFAULT_BATCH_HISTORY = 100
+
+# Check run inputs against the cached object_info before queueing
+DEFAULT_VALIDATE_PROMPTS = True
+
+# Input image uploads: largest accepted upload, and where the map of
+# content hashes to names uploaded to ComfyUI is kept
+DEFAULT_UPLOAD_MAX_BYTES = 50 * 1024 ** 2
+DEFAULT_UPLOAD_INDEX_PATH = "~/.comfyui-remote/uploads.json"
+
+# Admission control: our prompts queued or running on each backend (0: no
+# limit, nothing waits in the wrapper), and jobs allowed to wait here in
+# total and per client before /run answers 429
+DEFAULT_QUEUE_MAX_OUTSTANDING = 2
+DEFAULT_QUEUE_MAX_PENDING = 1000
+DEFAULT_QUEUE_MAX_PENDING_PER_CLIENT = 256
+
+# Response compression: gzip/brotli for JSON bodies of at least this many
+# bytes, and how many precompressed immutable responses to keep
+DEFAULT_COMPRESS_MIN_BYTES = 1024
+DEFAULT_RESPONSE_CACHE_SIZE = 128
+
+def parse_bool(value: Any) -> bool:
+    """Boolean setting from YAML (already a bool) or an environment string."""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
 class Config:
     def __init__(self):
         self.WORKFLOW_DIR: Optional[Path] = None
         self.COMFYUI_URL: str = DEFAULT_COMFYUI_URL
+        # [{"name": ..., "url": ...}]; the first one is the primary backend
+        self.COMFYUI_BACKENDS: List[Dict[str, str]] = []
+        self.BACKEND_HEALTH_INTERVAL: float = DEFAULT_BACKEND_HEALTH_INTERVAL
+        self.BACKEND_EWMA_ALPHA: float = DEFAULT_BACKEND_EWMA_ALPHA
+        self.BACKEND_DEFAULT_EXECUTION_TIME: float = DEFAULT_BACKEND_DEFAULT_EXECUTION_TIME
+        self.HTTP_MAX_CONNECTIONS: int = DEFAULT_HTTP_MAX_CONNECTIONS
+        self.HTTP_MAX_KEEPALIVE_CONNECTIONS: int = DEFAULT_HTTP_MAX_KEEPALIVE_CONNECTIONS
+        self.HTTP_KEEPALIVE_EXPIRY: float = DEFAULT_HTTP_KEEPALIVE_EXPIRY
+        self.HTTP_CONNECT_TIMEOUT: float = DEFAULT_HTTP_CONNECT_TIMEOUT
+        self.HTTP_TIMEOUTS: Dict[str, float] = dict(DEFAULT_HTTP_TIMEOUTS)
+        self.WS_RECONNECT_MIN_DELAY: float = DEFAULT_WS_RECONNECT_MIN_DELAY
+        self.WS_RECONNECT_MAX_DELAY: float = DEFAULT_WS_RECONNECT_MAX_DELAY
+        self.RECONCILE_MIN_INTERVAL: float = DEFAULT_RECONCILE_MIN_INTERVAL
+        self.RECONCILE_MAX_INTERVAL: float = DEFAULT_RECONCILE_MAX_INTERVAL
+        self.RECONCILE_HISTORY_ITEMS: int = DEFAULT_RECONCILE_HISTORY_ITEMS
+        self.PROXY_CHUNK_SIZE: int = DEFAULT_PROXY_CHUNK_SIZE
+        self.OUTPUT_CACHE_DIR: Path = Path(DEFAULT_OUTPUT_CACHE_DIR).expanduser()
+        self.OUTPUT_CACHE_MAX_BYTES: int = DEFAULT_OUTPUT_CACHE_MAX_BYTES
+        self.OUTPUT_CACHE_MAX_AGE: int = DEFAULT_OUTPUT_CACHE_MAX_AGE
+        self.OUTPUT_CACHE_PREFETCH_CONCURRENCY: int = DEFAULT_OUTPUT_CACHE_PREFETCH_CONCURRENCY
+        self.VARIANT_WORKERS: int = DEFAULT_VARIANT_WORKERS
+        self.VARIANT_MAX_WIDTH: int = DEFAULT_VARIANT_MAX_WIDTH
+        self.VARIANT_QUALITY: int = DEFAULT_VARIANT_QUALITY
+        self.OBJECT_INFO_TTL: float = DEFAULT_OBJECT_INFO_TTL
+        self.WORKFLOW_CACHE_SIZE: int = DEFAULT_WORKFLOW_CACHE_SIZE
+        self.WORKFLOW_POLL_INTERVAL: float = DEFAULT_WORKFLOW_POLL_INTERVAL
+        self.JOB_DB_PATH: Path = Path(DEFAULT_JOB_DB_PATH).expanduser()
+        self.JOB_RETENTION_DAYS: float = DEFAULT_JOB_RETENTION_DAYS
+        self.JOB_RETENTION_MAX: int = DEFAULT_JOB_RETENTION_MAX
+        self.EVENT_BUFFER_SIZE: int = DEFAULT_EVENT_BUFFER_SIZE
+        self.EVENT_QUEUE_SIZE: int = DEFAULT_EVENT_QUEUE_SIZE
+        self.EVENT_HEARTBEAT: float = DEFAULT_EVENT_HEARTBEAT
+        self.EVENT_RETRY: float = DEFAULT_EVENT_RETRY
+        self.PREVIEW_FPS: float = DEFAULT_PREVIEW_FPS
+        self.PREVIEW_MAX_WIDTH: int = DEFAULT_PREVIEW_MAX_WIDTH
+        self.PREVIEW_QUALITY: int = DEFAULT_PREVIEW_QUALITY
+        self.RESULT_CACHE_SIZE: int = DEFAULT_RESULT_CACHE_SIZE
+        self.RESULT_CACHE_TTL: float = DEFAULT_RESULT_CACHE_TTL
+        self.COALESCE_IN_FLIGHT: bool = DEFAULT_COALESCE_IN_FLIGHT
+        self.COALESCE_RANDOM_SEEDS: bool = DEFAULT_COALESCE_RANDOM_SEEDS
+        self.BATCH_CONCURRENCY: int = DEFAULT_BATCH_CONCURRENCY
+        self.BATCH_MAX_RUNS: int = DEFAULT_BATCH_MAX_RUNS
+        self.BATCH_HISTORY: int = DEFAULT_BATCH_HISTORY
+        self.VALIDATE_PROMPTS: bool = DEFAULT_VALIDATE_PROMPTS
+        self.UPLOAD_MAX_BYTES: int = DEFAULT_UPLOAD_MAX_BYTES
+        self.UPLOAD_INDEX_PATH: Path = Path(DEFAULT_UPLOAD_INDEX_PATH).expanduser()
+        self.QUEUE_MAX_OUTSTANDING: int = DEFAULT_QUEUE_MAX_OUTSTANDING
+        self.QUEUE_MAX_PENDING: int = DEFAULT_QUEUE_MAX_PENDING
+        self.QUEUE_MAX_PENDING_PER_CLIENT: int = DEFAULT_QUEUE_MAX_PENDING_PER_CLIENT
+        self.COMPRESS_MIN_BYTES: int = DEFAULT_COMPRESS_MIN_BYTES
+        self.RESPONSE_CACHE_SIZE: int = DEFAULT_RESPONSE_CACHE_SIZE
         self._load_config()
 
+    def _get_setting(self, file_config: Dict[str, Any], key: str, default: Any, cast=str) -> Any:
+        """Resolve a tuning value: Env (upper-cased key) > Config file > default."""
+        env_value = os.environ.get(key.upper())
+        if env_value is not None:
+            return cast(env_value)
+        if key in file_config:
+            return cast(file_config[key])
+        return default
+
+    def _parse_backends(self, backends: Any) -> List[Dict[str, str]]:
+        """Backends from a list of URLs / {name, url} mappings, or "name=url,url" text."""
+        if isinstance(backends, str):
+            backends = [item.strip() for item in backends.split(",") if item.strip()]
+        parsed = []
+        for backend in backends or []:
+            if isinstance(backend, dict):
+                name, url = backend.get("name"), backend["url"]
+            else:
+                name, url = "", backend
+                # "name=url"; an "=" after the scheme belongs to the URL
+                if "=" in backend.split("://", 1)[0]:
+                    name, url = backend.split("=", 1)
+            url = url.rstrip("/")
+            parsed.append({"name": name or urlparse(url).netloc or url, "url": url})
+        return parsed
+
     def _load_config(self):
         # 1. Parse CLI args (preliminary, just to check for overrides)
         parser = argparse.ArgumentParser(description="ComfyUI Remote Wrapper Backend")
@@ -50,6 +240,102 @@ class Config:
             self.COMFYUI_URL = env_comfyui_url
         elif "comfyui_url" in file_config:
             self.COMFYUI_URL = file_config["comfyui_url"]
+        self.COMFYUI_URL = self.COMFYUI_URL.rstrip("/")
+
+        # Resolve the backend pool (defaults to COMFYUI_URL alone)
+        self.COMFYUI_BACKENDS = self._parse_backends(self._get_setting(file_config, "comfyui_backends", None, lambda value: value))
+        if self.COMFYUI_BACKENDS:
+            self.COMFYUI_URL = self.COMFYUI_BACKENDS[0]["url"]
+        else:
+            self.COMFYUI_BACKENDS = [{"name": "default", "url": self.COMFYUI_URL}]
+        self.BACKEND_HEALTH_INTERVAL = self._get_setting(file_config, "backend_health_interval", self.BACKEND_HEALTH_INTERVAL, float)
+        self.BACKEND_EWMA_ALPHA = self._get_setting(file_config, "backend_ewma_alpha", self.BACKEND_EWMA_ALPHA, float)
+        self.BACKEND_DEFAULT_EXECUTION_TIME = self._get_setting(file_config, "backend_default_execution_time", self.BACKEND_DEFAULT_EXECUTION_TIME, float)
+
+        # Resolve upstream HTTP client tuning
+        self.HTTP_MAX_CONNECTIONS = self._get_setting(file_config, "http_max_connections", self.HTTP_MAX_CONNECTIONS, int)
+        self.HTTP_MAX_KEEPALIVE_CONNECTIONS = self._get_setting(file_config, "http_max_keepalive_connections", self.HTTP_MAX_KEEPALIVE_CONNECTIONS, int)
+        self.HTTP_KEEPALIVE_EXPIRY = self._get_setting(file_config, "http_keepalive_expiry", self.HTTP_KEEPALIVE_EXPIRY, float)
+        self.HTTP_CONNECT_TIMEOUT = self._get_setting(file_config, "http_connect_timeout", self.HTTP_CONNECT_TIMEOUT, float)
+        for endpoint, seconds in (file_config.get("http_timeouts") or {}).items():
+            self.HTTP_TIMEOUTS[endpoint] = float(seconds)
+
+        # Resolve websocket listener tuning
+        self.WS_RECONNECT_MIN_DELAY = self._get_setting(file_config, "ws_reconnect_min_delay", self.WS_RECONNECT_MIN_DELAY, float)
+        self.WS_RECONNECT_MAX_DELAY = self._get_setting(file_config, "ws_reconnect_max_delay", self.WS_RECONNECT_MAX_DELAY, float)
+
+        # Resolve reconciliation tuning
+        self.RECONCILE_MIN_INTERVAL = self._get_setting(file_config, "reconcile_min_interval", self.RECONCILE_MIN_INTERVAL, float)
+        self.RECONCILE_MAX_INTERVAL = self._get_setting(file_config, "reconcile_max_interval", self.RECONCILE_MAX_INTERVAL, float)
+        self.RECONCILE_HISTORY_ITEMS = self._get_setting(file_config, "reconcile_history_items", self.RECONCILE_HISTORY_ITEMS, int)
+        self.PROXY_CHUNK_SIZE = self._get_setting(file_config, "proxy_chunk_size", self.PROXY_CHUNK_SIZE, int)
+
+        # Resolve output cache (max bytes of 0 disables it)
+        cache_dir = self._get_setting(file_config, "output_cache_dir", None)
+        if cache_dir:
+            self.OUTPUT_CACHE_DIR = Path(cache_dir).expanduser().resolve()
+        self.OUTPUT_CACHE_MAX_BYTES = self._get_setting(file_config, "output_cache_max_bytes", self.OUTPUT_CACHE_MAX_BYTES, int)
+        self.OUTPUT_CACHE_MAX_AGE = self._get_setting(file_config, "output_cache_max_age", self.OUTPUT_CACHE_MAX_AGE, int)
+        self.OUTPUT_CACHE_PREFETCH_CONCURRENCY = self._get_setting(file_config, "output_cache_prefetch_concurrency", self.OUTPUT_CACHE_PREFETCH_CONCURRENCY, int)
+
+        # Resolve preview variant encoding
+        self.VARIANT_WORKERS = self._get_setting(file_config, "variant_workers", self.VARIANT_WORKERS, int)
+        self.VARIANT_MAX_WIDTH = self._get_setting(file_config, "variant_max_width", self.VARIANT_MAX_WIDTH, int)
+        self.VARIANT_QUALITY = self._get_setting(file_config, "variant_quality", self.VARIANT_QUALITY, int)
+
+        # Resolve object_info caching
+        self.OBJECT_INFO_TTL = self._get_setting(file_config, "object_info_ttl", self.OBJECT_INFO_TTL, float)
+
+        # Resolve workflow catalog tuning
+        self.WORKFLOW_CACHE_SIZE = self._get_setting(file_config, "workflow_cache_size", self.WORKFLOW_CACHE_SIZE, int)
+        self.WORKFLOW_POLL_INTERVAL = self._get_setting(file_config, "workflow_poll_interval", self.WORKFLOW_POLL_INTERVAL, float)
+
+        # Resolve job history storage
+        job_db_path = self._get_setting(file_config, "job_db_path", None)
+        if job_db_path:
+            self.JOB_DB_PATH = Path(job_db_path).expanduser().resolve()
+        self.JOB_RETENTION_DAYS = self._get_setting(file_config, "job_retention_days", self.JOB_RETENTION_DAYS, float)
+        self.JOB_RETENTION_MAX = self._get_setting(file_config, "job_retention_max", self.JOB_RETENTION_MAX, int)
+
+        # Resolve job event stream
+        self.EVENT_BUFFER_SIZE = self._get_setting(file_config, "event_buffer_size", self.EVENT_BUFFER_SIZE, int)
+        self.EVENT_QUEUE_SIZE = self._get_setting(file_config, "event_queue_size", self.EVENT_QUEUE_SIZE, int)
+        self.EVENT_HEARTBEAT = self._get_setting(file_config, "event_heartbeat", self.EVENT_HEARTBEAT, float)
+        self.EVENT_RETRY = self._get_setting(file_config, "event_retry", self.EVENT_RETRY, float)
+
+        # Resolve live previews
+        self.PREVIEW_FPS = self._get_setting(file_config, "preview_fps", self.PREVIEW_FPS, float)
+        self.PREVIEW_MAX_WIDTH = self._get_setting(file_config, "preview_max_width", self.PREVIEW_MAX_WIDTH, int)
+        self.PREVIEW_QUALITY = self._get_setting(file_config, "preview_quality", self.PREVIEW_QUALITY, int)
+
+        # Resolve result cache
+        self.RESULT_CACHE_SIZE = self._get_setting(file_config, "result_cache_size", self.RESULT_CACHE_SIZE, int)
+        self.RESULT_CACHE_TTL = self._get_setting(file_config, "result_cache_ttl", self.RESULT_CACHE_TTL, float)
+
+        # Resolve in-flight coalescing
+        self.COALESCE_IN_FLIGHT = self._get_setting(file_config, "coalesce_in_flight", self.COALESCE_IN_FLIGHT, parse_bool)
+        self.COALESCE_RANDOM_SEEDS = self._get_setting(file_config, "coalesce_random_seeds", self.COALESCE_RANDOM_SEEDS, parse_bool)
+
+        # Resolve batch runs
+        self.BATCH_CONCURRENCY = self._get_setting(file_config, "batch_concurrency", self.BATCH_CONCURRENCY, int)
+        self.BATCH_MAX_RUNS = self._get_setting(file_config, "batch_max_runs", self.BATCH_MAX_RUNS, int)
+        self.BATCH_HISTORY = self._get_setting(file_config, "batch_history", self.BATCH_HISTORY, int)
+        self.VALIDATE_PROMPTS = self._get_setting(file_config, "validate_prompts", self.VALIDATE_PROMPTS, parse_bool)
+
+        # Resolve input image uploads
+        self.UPLOAD_MAX_BYTES = self._get_setting(file_config, "upload_max_bytes", self.UPLOAD_MAX_BYTES, int)
+        upload_index_path = self._get_setting(file_config, "upload_index_path", None)
+        if upload_index_path:
+            self.UPLOAD_INDEX_PATH = Path(upload_index_path).expanduser().resolve()
+
+        # Resolve admission control
+        self.QUEUE_MAX_OUTSTANDING = self._get_setting(file_config, "queue_max_outstanding", self.QUEUE_MAX_OUTSTANDING, int)
+        self.QUEUE_MAX_PENDING = self._get_setting(file_config, "queue_max_pending", self.QUEUE_MAX_PENDING, int)
+        self.QUEUE_MAX_PENDING_PER_CLIENT = self._get_setting(file_config, "queue_max_pending_per_client", self.QUEUE_MAX_PENDING_PER_CLIENT, int)
+
+        # Resolve response compression
+        self.COMPRESS_MIN_BYTES = self._get_setting(file_config, "compress_min_bytes", self.COMPRESS_MIN_BYTES, int)
+        self.RESPONSE_CACHE_SIZE = self._get_setting(file_config, "response_cache_size", self.RESPONSE_CACHE_SIZE, int)
         
         # Resolve WORKFLOW_DIR
         workflow_dir_str = None
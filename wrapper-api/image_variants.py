@@ -0,0 +1,134 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
+from PIL import Image
+from config import config
+from output_cache import output_cache
+
+# Variant format -> (Pillow encoder, content type)
+FORMATS = {
+    "avif": ("AVIF", "image/avif"),
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+# Preference order when the format is negotiated from Accept
+NEGOTIATED_FORMATS = ("avif", "webp")
+
+def accepted_types(accept: str) -> Dict[str, float]:
+    """Media type -> q value from an Accept header."""
+    weights: Dict[str, float] = {}
+    for item in accept.split(","):
+        media_type, *params = item.split(";")
+        weight = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if media_type.strip():
+            weights[media_type.strip().lower()] = weight
+    return weights
+
+def encode_variant(src_path: str, dst_path: str, width: int, pil_format: str, quality: int) -> int:
+    """Downscale and re-encode an image. Runs in a worker process."""
+    with Image.open(src_path) as img:
+        # First frame only for animations
+        img.seek(0)
+        img.load()
+        if width and img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA")
+
+        tmp_path = f"{dst_path}.{os.getpid()}.part"
+        img.save(tmp_path, pil_format, quality=quality)
+        os.replace(tmp_path, dst_path)
+    return os.path.getsize(dst_path)
+
+class ImageVariants:
+    """Thumbnail and format variants of cached outputs, encoded in a process pool."""
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._formats: Optional[List[str]] = None
+
+    def supported_formats(self) -> List[str]:
+        if self._formats is None:
+            Image.init()
+            self._formats = [name for name, (pil_format, _) in FORMATS.items() if pil_format in Image.SAVE]
+        return self._formats
+
+    def negotiate(self, format: Optional[str], accept: str) -> str:
+        """Pick the output format: explicit ``format`` first, then Accept, then JPEG."""
+        if format:
+            format = format.lower()
+            if format == "jpg":
+                format = "jpeg"
+            if format not in self.supported_formats():
+                raise ValueError(f"Unsupported format: {format}")
+            return format
+        weights = accepted_types(accept)
+        for candidate in NEGOTIATED_FORMATS:
+            # Named explicitly (image/* is sent by clients that cannot decode them); q=0 refuses it
+            if weights.get(f"image/{candidate}", 0.0) > 0 and candidate in self.supported_formats():
+                return candidate
+        return "jpeg"
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=config.VARIANT_WORKERS)
+        return self._pool
+
+    async def get_variant(self, entry: Dict[str, Any], width: Optional[int], format: str) -> Tuple[Dict[str, Any], bytes]:
+        """Return a cache entry and the content of the variant of a cached original, encoding it once.
+
+        The caller pins the original (output_cache.pin) so that storing the new
+        variant cannot evict it, or the variant, before it has been read.
+        """
+        width = min(max(width or 0, 0), config.VARIANT_MAX_WIDTH)
+        name = f"w{width}.{format}" if width else format
+        digest = entry["hash"]
+        path = output_cache.variant_path(digest, name)
+        variant = {"hash": f"{digest}.{name}", "content_type": FORMATS[format][1]}
+
+        if not path.exists():
+            future = self._inflight.get(variant["hash"])
+            if future is None:
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(
+                    self._get_pool(),
+                    encode_variant,
+                    str(output_cache.blob_path(digest)),
+                    str(path),
+                    width,
+                    FORMATS[format][0],
+                    config.VARIANT_QUALITY,
+                )
+                self._inflight[variant["hash"]] = future
+                future.add_done_callback(lambda f: self._encoded(variant["hash"], digest, f))
+            # Shielded so a disconnecting client doesn't cancel an encode others wait on
+            await asyncio.shield(future)
+
+        body = await asyncio.to_thread(path.read_bytes)
+        variant["size"] = len(body)
+        return variant, body
+
+    def _encoded(self, key: str, digest: str, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            output_cache.add_variant(digest, future.result())
+
+image_variants = ImageVariants()
@@ -0,0 +1,76 @@
+from typing import Dict, List, Optional
+from models import JobResponse
+from backends import backend_pool, Backend
+from job_history import job_history, ACTIVE_STATUSES
+from job_queue import job_queue
+from job_tracker import job_tracker
+
+class JobCanceller:
+    """Cancels jobs by id without touching anyone else's work.
+
+    Jobs still waiting in the wrapper leave job_queue; prompts pending in
+    ComfyUI are removed through its queue delete API; a prompt is only
+    interrupted while ComfyUI reports it running. A job sharing its prompt
+    with other unfinished jobs (coalesced) just lets go of it. Either way the
+    jobs end as "cancelled".
+    """
+
+    async def cancel(self, jobs: List[JobResponse]) -> List[JobResponse]:
+        """Cancel the unfinished ``jobs``; returns those that were cancelled.
+
+        Raises whatever ComfyAPI raises when a backend cannot be reached; jobs
+        of that backend are then left as they were.
+        """
+        targets = [job for job in jobs if job.status in ACTIVE_STATUSES]
+        target_ids = {job.job_id for job in targets}
+        by_prompt: Dict[str, List[JobResponse]] = {}
+        for job in targets:
+            by_prompt.setdefault(job.prompt_id or job.job_id, []).append(job)
+
+        # backend name -> prompts to remove from its queue or interrupt
+        upstream: Dict[str, List[str]] = {}
+        for prompt_id, prompt_jobs in by_prompt.items():
+            if any(job.job_id not in target_ids for job in job_history.jobs_for_prompt(prompt_id)):
+                # Other jobs still wait for its outputs
+                for job in prompt_jobs:
+                    job_history.update_job_status(job.job_id, "cancelled")
+            elif prompt_jobs[0].status == "pending":
+                # Not in ComfyUI yet; one being sent right now is withdrawn by job_queue
+                job_queue.remove(prompt_id)
+                job_tracker.cancel(prompt_id)
+            else:
+                upstream.setdefault(backend_pool.for_job(prompt_jobs[0]).name, []).append(prompt_id)
+
+        for name, prompt_ids in upstream.items():
+            await self.cancel_upstream(backend_pool.get(name), prompt_ids)
+            for prompt_id in prompt_ids:
+                job_tracker.cancel(prompt_id)
+        return targets
+
+    async def cancel_upstream(self, backend: Backend, prompt_ids: List[str]) -> List[str]:
+        """Remove prompts from a backend's queue and interrupt those running; returns the interrupted ones."""
+        await backend.api.delete_queued(prompt_ids)
+        # Checked after the delete: a prompt that started meanwhile is running now
+        queue = await backend.api.get_queue()
+        backend.update_queue(queue)
+        running = {item[1] for item in queue.get("queue_running", [])}
+        interrupted = [prompt_id for prompt_id in prompt_ids if prompt_id in running]
+        for prompt_id in interrupted:
+            await backend.api.interrupt(prompt_id)
+        return interrupted
+
+    async def cancel_prompt(self, prompt_id: str, backend: Optional[Backend] = None) -> bool:
+        """Cancel a prompt the wrapper does not track (e.g. queued with /jobs/start).
+
+        Returns False when ``backend`` (default: the primary) neither has it
+        pending nor running.
+        """
+        backend = backend or backend_pool.primary
+        queue = await backend.api.get_queue()
+        queued = {item[1] for key in ("queue_running", "queue_pending") for item in queue.get(key, [])}
+        if prompt_id not in queued:
+            return False
+        await self.cancel_upstream(backend, [prompt_id])
+        return True
+
+job_canceller = JobCanceller()
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List, Set, AsyncIterator, Tuple
+from config import config
+
+# Events superseded by the next one of the same job: only the latest is kept for resuming
+LATEST_ONLY_EVENTS = ("progress",)
+
+class Subscription:
+    def __init__(self, job_ids: Optional[Set[str]], client_id: Optional[str]):
+        self.job_ids = job_ids
+        self.client_id = client_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.EVENT_QUEUE_SIZE)
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if self.job_ids is not None and event["job_id"] not in self.job_ids:
+            return False
+        if self.client_id is not None and event["client_id"] != self.client_id:
+            return False
+        return True
+
+class JobEventBus:
+    """Fan-out of job state changes to streaming clients.
+
+    Every change gets an id "<epoch>-<seq>"; the last ``EVENT_BUFFER_SIZE`` events
+    are kept so a client reconnecting with Last-Event-ID gets what it missed.
+    The epoch changes on restart, which tells a client that its id is from a
+    previous run and it should resync from /history instead. Progress events
+    (one per sampler step) stay out of that buffer, which holds state changes
+    only; just the latest one of each unfinished job is kept for a resume.
+    """
+
+    def __init__(self):
+        self.epoch = str(int(time.time()))
+        self._seq = 0
+        self._buffer: deque = deque(maxlen=config.EVENT_BUFFER_SIZE)
+        # Seq of the newest event pushed out of the buffer
+        self._evicted = 0
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: Set[Subscription] = set()
+
+    def publish(self, job_id: str, client_id: Optional[str], data: str, event: str = "job"):
+        """Record an event; ``data`` is the serialized payload, shared by every subscriber."""
+        self._seq += 1
+        record = {"id": f"{self.epoch}-{self._seq}", "seq": self._seq, "event": event, "job_id": job_id, "client_id": client_id, "data": data}
+        if event in LATEST_ONLY_EVENTS:
+            self._latest[job_id] = record
+        else:
+            # A state change supersedes the job's progress
+            self._latest.pop(job_id, None)
+            if len(self._buffer) == self._buffer.maxlen:
+                self._evicted = self._buffer[0]["seq"]
+            self._buffer.append(record)
+        for subscription in list(self._subscribers):
+            if subscription.matches(record):
+                self._deliver(subscription, record)
+
+    def _deliver(self, subscription: Subscription, record: Dict[str, Any]):
+        try:
+            subscription.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            # Too slow to keep up: end its stream; it resumes from its Last-Event-ID
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(None)
+            self._subscribers.discard(subscription)
+
+    def _replay(self, subscription: Subscription, last_event_id: Optional[str]) -> Tuple[List[Dict[str, Any]], bool]:
+        """Buffered events after ``last_event_id``, and whether some were lost."""
+        if not last_event_id:
+            return [], False
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq:
+            return [], True
+        seq = int(seq)
+        if self._evicted > seq:
+            return [], True
+        records = [record for record in self._buffer if record["seq"] > seq and subscription.matches(record)]
+        records += [record for record in self._latest.values() if record["seq"] > seq and subscription.matches(record)]
+        return sorted(records, key=lambda record: record["seq"]), False
+
+    def subscribe(self, job_ids: Optional[List[str]] = None, client_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(set(job_ids) if job_ids else None, client_id)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def format(self, record: Dict[str, Any]) -> str:
+        return f"id: {record['id']}\nevent: {record['event']}\ndata: {record['data']}\n\n"
+
+    async def stream(
+        self,
+        job_ids: Optional[List[str]] = None,
+        client_id: Optional[str] = None,
+        last_event_id: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Server-Sent Events for matching jobs, starting after ``last_event_id``."""
+        subscription = self.subscribe(job_ids, client_id)
+        try:
+            # Subscribed before replaying, so nothing published in between is lost
+            missed, lost = self._replay(subscription, last_event_id)
+            if lost:
+                yield f"id: {self.epoch}-{self._seq}\nevent: resync\ndata: {{}}\n\n"
+            last_seq = self._seq if lost else 0
+            for record in missed:
+                last_seq = record["seq"]
+                yield self.format(record)
+            yield f"retry: {int(config.EVENT_RETRY * 1000)}\n\n"
+
+            while True:
+                try:
+                    record = await asyncio.wait_for(subscription.queue.get(), timeout=config.EVENT_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if record is None:
+                    return
+                if record["seq"] <= last_seq:
+                    continue  # Already sent during replay
+                yield self.format(record)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"subscribers": len(self._subscribers), "buffered": len(self._buffer), "progress": len(self._latest), "last_event_id": f"{self.epoch}-{self._seq}"}
+
+job_events = JobEventBus()
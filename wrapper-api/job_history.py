@@ -1,33 +1,263 @@
-from typing import List, Optional, Dict
-from datetime import datetime
-from models import JobResponse
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import List, Optional, Dict, Tuple
+from datetime import datetime, timezone
+from config import config
+from models import JobResponse, JobProgress, JobOutput
+from job_events import job_events
+
+# Statuses of jobs that ComfyUI has not finished yet
+IN_FLIGHT_STATUSES = ("queued", "running")
+# ...and of jobs that are not finished at all, including those still waiting in our queue
+ACTIVE_STATUSES = ("pending",) + IN_FLIGHT_STATUSES
+
+# Finished jobs kept as live objects after their last update
+RECENT_JOBS = 256
+# Inserts between retention sweeps
+PRUNE_EVERY = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL UNIQUE,
+    workflow_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    batch_id TEXT,
+    backend TEXT,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_workflow ON jobs (workflow_name, id);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id, id);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at);
+"""
 
 class JobHistory:
-    def __init__(self, max_size: int = 50):
-        self.max_size = max_size
-        self._jobs: List[JobResponse] = []
-        self._jobs_map: Dict[str, JobResponse] = {}
+    """Job records in SQLite (WAL mode), with in-flight jobs kept as live objects.
+
+    Jobs that are still queued or running stay in memory for the tracker and
+    are restored from the database on startup; finished jobs are read back on
+    demand. Records handed out for the same job are the same object while it
+    is live or recent, so in-place updates are visible to every holder.
+    """
+
+    def __init__(self):
+        self._db: Optional[sqlite3.Connection] = None
+        self._live: Dict[str, JobResponse] = {}
+        # prompt_id -> live jobs sharing that ComfyUI prompt
+        self._by_prompt: Dict[str, Dict[str, JobResponse]] = {}
+        self._recent: "OrderedDict[str, JobResponse]" = OrderedDict()
+        self._inserts = 0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Opened lazily as well, so scripts and tests that skip the lifespan still work
+        if self._db is None:
+            self.open()
+        return self._db
+
+    def open(self):
+        """Open the database, apply retention and restore in-flight jobs."""
+        if self._db is not None:
+            return
+        config.JOB_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(config.JOB_DB_PATH, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commits are durable against crashes of this process without an fsync each
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        self._db = db
+
+        # The wrapper's own queue does not survive a restart
+        for (data,) in db.execute("SELECT data FROM jobs WHERE status = 'pending'").fetchall():
+            job = JobResponse.model_validate_json(data)
+            job.status = "failed"
+            job.error = "Wrapper restarted before the job was sent to ComfyUI"
+            self._save(job)
+        self.prune()
+
+        placeholders = ", ".join("?" for _ in IN_FLIGHT_STATUSES)
+        rows = db.execute(f"SELECT data FROM jobs WHERE status IN ({placeholders})", IN_FLIGHT_STATUSES)
+        for (data,) in rows:
+            self._remember(JobResponse.model_validate_json(data))
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        self._live.clear()
+        self._by_prompt.clear()
+        self._recent.clear()
+
+    def _save(self, job: JobResponse, insert: bool = False):
+        """Write a job and publish the new state to /events subscribers."""
+        created_at = job.created_at.timestamp() if job.created_at else time.time()
+        data = job.model_dump_json()
+        values = (job.workflow_name, job.status, job.batch_id, job.backend, data)
+        if insert:
+            self.db.execute(
+                "INSERT OR REPLACE INTO jobs (workflow_name, status, batch_id, backend, data, job_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                values + (job.job_id, created_at),
+            )
+        else:
+            self.db.execute(
+                "UPDATE jobs SET workflow_name = ?, status = ?, batch_id = ?, backend = ?, data = ? WHERE job_id = ?",
+                values + (job.job_id,),
+            )
+        job_events.publish(job.job_id, job.client_id, data)
+
+    def _remember(self, job: JobResponse):
+        prompt_id = job.prompt_id or job.job_id
+        if job.status in ACTIVE_STATUSES:
+            self._recent.pop(job.job_id, None)
+            self._live[job.job_id] = job
+            self._by_prompt.setdefault(prompt_id, {})[job.job_id] = job
+            return
+        self._live.pop(job.job_id, None)
+        sharing = self._by_prompt.get(prompt_id)
+        if sharing is not None:
+            sharing.pop(job.job_id, None)
+            if not sharing:
+                del self._by_prompt[prompt_id]
+        self._recent[job.job_id] = job
+        self._recent.move_to_end(job.job_id)
+        while len(self._recent) > RECENT_JOBS:
+            self._recent.popitem(last=False)
 
     def add_job(self, job: JobResponse):
-        self._jobs.insert(0, job)
-        self._jobs_map[job.job_id] = job
-        
-        if len(self._jobs) > self.max_size:
-            removed = self._jobs.pop()
-            if removed.job_id in self._jobs_map:
-                del self._jobs_map[removed.job_id]
+        if job.created_at is None:
+            job.created_at = datetime.now(timezone.utc)
+        self._save(job, insert=True)
+        self._remember(job)
+
+        self._inserts += 1
+        if self._inserts % PRUNE_EVERY == 0:
+            self.prune()
 
     def get_job(self, job_id: str) -> Optional[JobResponse]:
-        return self._jobs_map.get(job_id)
+        job = self._live.get(job_id) or self._recent.get(job_id)
+        if job is not None:
+            return job
+        row = self.db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = JobResponse.model_validate_json(row[0])
+        self._remember(job)
+        return job
+
+    def list_jobs(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        workflow_name: Optional[str] = None,
+        batch_id: Optional[str] = None,
+        backend: Optional[str] = None,
+        since: Optional[datetime] = None,
+    ) -> Tuple[List[JobResponse], Optional[str]]:
+        """Newest jobs first, filtered; returns the page and the cursor of the next one."""
+        clauses, params = [], []
+        if cursor:
+            clauses.append("id < ?")
+            params.append(int(cursor))
+        for column, value in (("status", status), ("workflow_name", workflow_name), ("batch_id", batch_id), ("backend", backend)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since.timestamp())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.execute(
+            f"SELECT id, job_id, data FROM jobs {where} ORDER BY id DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+
+        jobs = []
+        for _, job_id, data in rows[:limit]:
+            job = self._live.get(job_id) or self._recent.get(job_id)
+            jobs.append(job if job is not None else JobResponse.model_validate_json(data))
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return jobs, next_cursor
+
+    def list_in_flight(self) -> List[JobResponse]:
+        return [job for job in self._live.values() if job.status in IN_FLIGHT_STATUSES]
+
+    def list_active(self, batch_id: Optional[str] = None, client_id: Optional[str] = None) -> List[JobResponse]:
+        """Unfinished jobs (waiting, queued or running), optionally of one batch and/or client."""
+        return [
+            job for job in self._live.values()
+            if job.status in ACTIVE_STATUSES
+            and (batch_id is None or job.batch_id == batch_id)
+            and (client_id is None or job.client_id == client_id)
+        ]
+
+    def list_pending(self) -> List[JobResponse]:
+        """Jobs waiting in the wrapper's queue for a free ComfyUI slot."""
+        return [job for job in self._live.values() if job.status == "pending"]
 
-    def list_jobs(self, limit: int = 20) -> List[JobResponse]:
-        return self._jobs[:limit]
+    def jobs_for_prompt(self, prompt_id: str) -> List[JobResponse]:
+        """Unfinished jobs attached to a ComfyUI prompt (several when coalesced)."""
+        return list(self._by_prompt.get(prompt_id, {}).values())
 
-    def update_job_status(self, job_id: str, status: str, image_url: Optional[str] = None):
+    def move_prompt(self, prompt_id: str, new_prompt_id: str):
+        """ComfyUI queued a pending prompt under an id of its own choosing."""
+        sharing = self._by_prompt.pop(prompt_id, {})
+        for job in sharing.values():
+            job.prompt_id = new_prompt_id
+        if sharing:
+            self._by_prompt.setdefault(new_prompt_id, {}).update(sharing)
+
+    def update_job_status(self, job_id: str, status: str, image_url: Optional[str] = None, error: Optional[str] = None, outputs: Optional[List[JobOutput]] = None):
         job = self.get_job(job_id)
         if job:
             job.status = status
             if image_url:
                 job.image_url = image_url
+            if outputs:
+                job.outputs = outputs
+            if error:
+                job.error = error
+            self._save(job)
+            self._remember(job)
+
+    def update_progress(self, job_id: str, node: Optional[str], value: int = 0, max: int = 0):
+        """Record progress of an in-flight job.
+
+        Progress is published to /events but not written to the database on every
+        step; the next status change persists the latest value.
+        """
+        job = self._live.get(job_id)
+        if job is None:
+            return
+        job.progress = JobProgress(node=node, value=value, max=max)
+        job_events.publish(job.job_id, job.client_id, job.model_dump_json(), event="progress")
+
+    def prune(self) -> int:
+        """Apply the retention policy (age, then count); unfinished jobs are kept."""
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        finished = f"status NOT IN ({placeholders})"
+        removed = 0
+        if config.JOB_RETENTION_DAYS > 0:
+            cutoff = time.time() - config.JOB_RETENTION_DAYS * 86400
+            removed += self.db.execute(
+                f"DELETE FROM jobs WHERE created_at < ? AND {finished}",
+                (cutoff,) + ACTIVE_STATUSES,
+            ).rowcount
+        if config.JOB_RETENTION_MAX > 0:
+            removed += self.db.execute(
+                f"DELETE FROM jobs WHERE id <= (SELECT id FROM jobs ORDER BY id DESC LIMIT 1 OFFSET ?) AND {finished}",
+                (config.JOB_RETENTION_MAX,) + ACTIVE_STATUSES,
+            ).rowcount
+        if removed:
+            # Don't serve pruned jobs from memory
+            self._recent.clear()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        total = self.db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return {"jobs": total, "in_flight": len(self.list_in_flight()), "pending": len(self.list_pending()), "recent": len(self._recent)}
 
 job_history = JobHistory()
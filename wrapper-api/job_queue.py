@@ -0,0 +1,220 @@
+import asyncio
+import math
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional, Deque
+from config import config
+from models import JobResponse
+from backends import backend_pool, Backend
+from job_history import job_history
+from job_tracker import job_tracker
+from job_reconciler import job_reconcilers
+from result_cache import result_cache
+
+class QueueFullError(Exception):
+    """No room for more waiting jobs; ``retry_after`` is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+class PendingPrompt:
+    """A rendered prompt waiting for a free slot on a backend."""
+
+    __slots__ = ("job", "prompt_json", "key", "client", "priority")
+
+    def __init__(self, job: JobResponse, prompt_json: str, key: Optional[str], client: str, priority: int):
+        self.job = job
+        self.prompt_json = prompt_json
+        self.key = key
+        self.client = client
+        self.priority = priority
+
+class JobQueue:
+    """Admission control and fair scheduling in front of ComfyUI.
+
+    At most ``QUEUE_MAX_OUTSTANDING`` of our prompts are queued or running on
+    each backend; further jobs wait here with status "pending" and are sent as
+    backends finish prompts. A freed slot goes to the highest priority waiting,
+    and round-robin between clients within a priority, so one client's long
+    batch cannot starve another's single run. Arrivals beyond
+    ``QUEUE_MAX_PENDING`` (or a client's ``QUEUE_MAX_PENDING_PER_CLIENT``) are
+    turned away with QueueFullError.
+    """
+
+    def __init__(self):
+        # priority -> client -> that client's prompts, oldest first; clients rotate on each send
+        self._levels: Dict[int, "OrderedDict[str, Deque[PendingPrompt]]"] = {}
+        self._per_client: Dict[str, int] = {}
+        self.pending = 0
+        self.sent = 0
+        self.rejected = 0
+        self._tasks = set()
+        for backend in backend_pool.backends:
+            backend.on_release = self.pump
+
+    def _open_backends(self) -> List[Backend]:
+        limit = config.QUEUE_MAX_OUTSTANDING
+        if limit <= 0:
+            return backend_pool.backends
+        return [backend for backend in backend_pool.backends if backend.in_flight < limit]
+
+    def retry_after(self, prompts: int = 1) -> int:
+        """Seconds until the backends have worked through ``prompts`` more prompts."""
+        backends = backend_pool.backends
+        times = [backend.execution_time or config.BACKEND_DEFAULT_EXECUTION_TIME for backend in backends]
+        return max(1, math.ceil(prompts * sum(times) / len(times) / len(backends)))
+
+    def admit(self, client: str, count: int = 1):
+        """Raise QueueFullError unless ``count`` more jobs of ``client`` may wait here."""
+        if self.pending + count > config.QUEUE_MAX_PENDING:
+            message = f"Queue is full ({self.pending} jobs waiting)"
+            # Any client's job frees a place
+            retry_after = self.retry_after(self.pending + count - config.QUEUE_MAX_PENDING)
+        elif self._per_client.get(client, 0) + count > config.QUEUE_MAX_PENDING_PER_CLIENT:
+            waiting = self._per_client.get(client, 0)
+            message = f"Too many jobs waiting for this client ({waiting})"
+            # Its jobs are sent in turn with every other waiting client's
+            clients = sum(1 for level in self._levels.values() for _ in level) or 1
+            retry_after = self.retry_after((waiting + count - config.QUEUE_MAX_PENDING_PER_CLIENT) * clients)
+        else:
+            return
+        self.rejected += 1
+        raise QueueFullError(message, retry_after)
+
+    async def submit(self, job: JobResponse, prompt_json: str, key: Optional[str], client: str, priority: int = 0) -> JobResponse:
+        """Send a rendered prompt to ComfyUI now if a backend has room, else queue it here.
+
+        ``job`` is the record to track it under, with ``job_id`` and ``prompt_id``
+        set to the id to ask ComfyUI for. Returns it "queued" when it was sent
+        right away (raising whatever ComfyAPI raises), else "pending".
+        """
+        backends = self._open_backends() if not self.pending else []
+        if backends:
+            backend = backend_pool.pick(backends)
+            backend.job_submitted()
+            prompt_id = await self._send(backend, job.prompt_id, prompt_json, key)
+            job.job_id = job.prompt_id = prompt_id
+            job.status = "queued"
+            job.backend = backend.name
+            job_history.add_job(job)
+            await self._track(backend, prompt_id)
+            return job
+
+        job.status = "pending"
+        job_history.add_job(job)
+        level = self._levels.setdefault(priority, OrderedDict())
+        level.setdefault(client, deque()).append(PendingPrompt(job, prompt_json, key, client, priority))
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+        self.pending += 1
+        self.pump()
+        return job
+
+    def pump(self):
+        """Send waiting prompts to backends with free slots."""
+        while self.pending:
+            backends = self._open_backends()
+            if not backends:
+                return
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Slots freed outside the event loop are filled by the next submission
+                return
+            pending = self._pop()
+            backend = backend_pool.pick(backends)
+            backend.job_submitted()
+            task = loop.create_task(self._dispatch(backend, pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _pop(self) -> PendingPrompt:
+        priority = max(self._levels)
+        level = self._levels[priority]
+        client, prompts = next(iter(level.items()))
+        pending = prompts.popleft()
+        if prompts:
+            level.move_to_end(client)
+        self._forget(pending)
+        return pending
+
+    def remove(self, prompt_id: str) -> bool:
+        """Take a waiting prompt out of the queue; False if it is not waiting (any more)."""
+        for level in self._levels.values():
+            for prompts in level.values():
+                for pending in prompts:
+                    if pending.job.prompt_id == prompt_id:
+                        prompts.remove(pending)
+                        self._forget(pending)
+                        return True
+        return False
+
+    def _forget(self, pending: PendingPrompt):
+        level = self._levels[pending.priority]
+        if not level[pending.client]:
+            del level[pending.client]
+            if not level:
+                del self._levels[pending.priority]
+        self._per_client[pending.client] -= 1
+        if not self._per_client[pending.client]:
+            del self._per_client[pending.client]
+        self.pending -= 1
+
+    async def _dispatch(self, backend: Backend, pending: PendingPrompt):
+        job = pending.job
+        try:
+            prompt_id = await self._send(backend, job.prompt_id, pending.prompt_json, pending.key)
+        except Exception as e:
+            print(f"Error submitting queued job {job.job_id} to ComfyUI backend {backend.name}: {e}")
+            job_tracker.fail_job(job.prompt_id, f"ComfyUI error: {str(e)}")
+            return
+        if not job_history.jobs_for_prompt(job.prompt_id):
+            # Cancelled while it was being sent
+            try:
+                await backend.api.delete_queued([prompt_id])
+            except Exception as e:
+                print(f"Error removing cancelled prompt {prompt_id} from ComfyUI backend {backend.name}: {e}")
+            backend.job_cancelled(prompt_id)
+            return
+        job_tracker.mark_queued(job.prompt_id, prompt_id, backend)
+        await self._track(backend, prompt_id)
+
+    async def _send(self, backend: Backend, prompt_id: str, prompt_json: str, key: Optional[str]) -> str:
+        """Queue a prompt on a backend whose slot was already taken with job_submitted."""
+        try:
+            prompt_id = await backend.api.queue_prompt_json(prompt_json, prompt_id)
+        except BaseException:
+            backend.submit_failed()
+            raise
+        self.sent += 1
+        if key:
+            result_cache.expect(prompt_id, key)
+        return prompt_id
+
+    async def _track(self, backend: Backend, prompt_id: str):
+        # Completion arrives through the ComfyUI event listener
+        await job_tracker.track(prompt_id)
+        reconciler = job_reconcilers[backend.name]
+        if not reconciler.push_available:
+            reconciler.wake()
+
+    async def drain(self):
+        """Wait for the submissions started so far (tests and shutdown)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def counts(self) -> Dict[int, int]:
+        """Waiting jobs per priority."""
+        return {priority: sum(len(prompts) for prompts in level.values()) for priority, level in self._levels.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "by_priority": self.counts(),
+            "clients": len(self._per_client),
+            "max_outstanding": config.QUEUE_MAX_OUTSTANDING,
+            "outstanding": {backend.name: backend.in_flight for backend in backend_pool.backends},
+            "sent": self.sent,
+            "rejected": self.rejected,
+        }
+
+job_queue = JobQueue()
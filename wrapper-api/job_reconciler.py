@@ -0,0 +1,122 @@
+import asyncio
+from typing import Dict, Optional
+from config import config
+from backends import backend_pool, Backend
+from job_history import job_history
+from job_tracker import job_tracker
+
+# Sweeps a prompt may be missing from both /queue and /history before it is failed
+VANISHED_AFTER_TICKS = 2
+
+class JobReconciler:
+    """Scheduler-owned sweep over the in-flight jobs of one backend.
+
+    Each tick costs one /queue and one bulk /history request regardless of how
+    many jobs are in flight. It runs fast while jobs are pending and push events
+    are unavailable, and backs off while idle or while the websocket is healthy.
+    """
+
+    def __init__(self, backend: Optional[Backend] = None):
+        self.backend = backend or backend_pool.primary
+        self.push_available = False
+        self.interval = config.RECONCILE_MIN_INTERVAL
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._missing: Dict[str, int] = {}
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def wake(self):
+        """Run a sweep now and restart the backoff (new job, lost events, ...)."""
+        self.interval = config.RECONCILE_MIN_INTERVAL
+        self._wake.set()
+
+    def set_push_available(self, available: bool):
+        self.push_available = available
+        # Either we just (re)connected and must catch up, or we just lost events
+        self.wake()
+
+    def _next_interval(self, in_flight: int) -> float:
+        if in_flight and not self.push_available:
+            return config.RECONCILE_MIN_INTERVAL
+        return min(self.interval * 2, config.RECONCILE_MAX_INTERVAL)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            in_flight = 0
+            try:
+                in_flight = await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Reconciliation error: {e}")
+
+            self.interval = self._next_interval(in_flight)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def reconcile(self) -> int:
+        """Apply one sweep; returns how many jobs are still in flight."""
+        jobs = self._in_flight()
+        if not jobs:
+            self._missing.clear()
+            return 0
+
+        # Queue first: a prompt finishing in between then shows up in history
+        api = self.backend.api
+        queue = await api.get_queue()
+        self.backend.update_queue(queue)
+        history = await api.get_history_bulk(max(config.RECONCILE_HISTORY_ITEMS, len(jobs)))
+        running = {item[1] for item in queue.get("queue_running", [])}
+        pending = {item[1] for item in queue.get("queue_pending", [])}
+
+        # Coalesced jobs share a prompt; each prompt is checked once
+        for prompt_id in dict.fromkeys(job.prompt_id or job.job_id for job in jobs):
+            if prompt_id in history:
+                self._missing.pop(prompt_id, None)
+                job_tracker.complete_job(prompt_id, history[prompt_id])
+            elif prompt_id in running:
+                self._missing.pop(prompt_id, None)
+                job_tracker.mark_running(prompt_id)
+            elif prompt_id in pending:
+                self._missing.pop(prompt_id, None)
+            else:
+                # Older than the bulk history window, or gone from ComfyUI altogether
+                entry = await api.get_history(prompt_id)
+                if entry:
+                    self._missing.pop(prompt_id, None)
+                    job_tracker.complete_job(prompt_id, entry)
+                    continue
+                misses = self._missing.get(prompt_id, 0) + 1
+                if misses >= VANISHED_AFTER_TICKS:
+                    self._missing.pop(prompt_id, None)
+                    job_tracker.fail_job(prompt_id, "Prompt vanished from ComfyUI")
+                else:
+                    self._missing[prompt_id] = misses
+
+        return len(self._in_flight())
+
+    def _in_flight(self):
+        return [job for job in job_history.list_in_flight() if backend_pool.for_job(job) is self.backend]
+
+# One reconciler per backend; job_reconciler is the primary's
+job_reconcilers: Dict[str, JobReconciler] = {backend.name: JobReconciler(backend) for backend in backend_pool.backends}
+job_reconciler = job_reconcilers[backend_pool.primary.name]
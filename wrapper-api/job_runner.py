@@ -0,0 +1,119 @@
+import random
+import uuid
+from typing import Dict, Any, Optional
+from config import config
+from models import SeedControl, JobResponse
+from workflow_templates import WorkflowTemplate
+from job_history import job_history
+from job_queue import job_queue
+from result_cache import result_cache, prompt_hash
+from coalescer import prompt_coalescer
+
+def resolve_seed(seed_control: SeedControl, index: int = 0) -> int:
+    """Seed for one run; ``index`` is the position of the run within a batch."""
+    if seed_control.mode == "random":
+        return random.randint(1, 100000000000000)
+    if seed_control.mode == "increment":
+        start = seed_control.value if seed_control.value is not None else random.randint(1, 100000000000000)
+        return start + index
+    if seed_control.value is not None:
+        return seed_control.value
+    return 0
+
+async def submit(
+    template: WorkflowTemplate,
+    workflow_name: str,
+    inputs: Dict[str, Any],
+    seed: int,
+    seed_mode: str = "fixed",
+    batch_id: Optional[str] = None,
+    client_id: Optional[str] = None,
+    no_cache: bool = False,
+    priority: int = 0,
+    client: Optional[str] = None,
+) -> JobResponse:
+    """Render a template, queue it on the least-loaded backend and start tracking the job.
+
+    Unless ``no_cache`` is set, a prompt that is identical to one still in
+    flight shares its execution, and a deterministic (non-random seed) prompt
+    that has completed before is answered from the result cache. When every
+    backend has its share of our prompts the job waits in job_queue as
+    "pending", scheduled by ``priority`` and fairly between ``client``s.
+    Raises QueueFullError if it may not wait (batches are admitted as a
+    whole beforehand), or whatever ComfyAPI raises if it cannot be queued.
+    """
+    client = client or client_id or "anonymous"
+    # Patch inputs ("node_id.input_name") and seed slots into a fresh prompt
+    prompt_json, resolved_inputs = template.render(inputs, seed)
+
+    key = None
+    if not no_cache and seed_mode != "random":
+        key = prompt_hash(prompt_json)
+        cached = result_cache.lookup(key) if result_cache.enabled else None
+        if cached is not None:
+            job = JobResponse(
+                job_id=uuid.uuid4().hex,
+                prompt_id=cached["prompt_id"],
+                workflow_name=workflow_name,
+                status="completed",
+                resolved_inputs=resolved_inputs,
+                resolved_seed=seed,
+                image_url=cached["image_url"],
+                outputs=cached["outputs"],
+                batch_id=batch_id,
+                backend=cached["backend"],
+                client_id=client_id,
+                cached=True
+            )
+            job_history.add_job(job)
+            return job
+
+    async def queue() -> JobResponse:
+        if batch_id is None:
+            job_queue.admit(client)
+        # Asked of ComfyUI as the prompt id, so a job keeps its id once it leaves our queue
+        prompt_id = str(uuid.uuid4())
+        job = JobResponse(
+            job_id=prompt_id,
+            prompt_id=prompt_id,
+            workflow_name=workflow_name,
+            status="pending",
+            resolved_inputs=resolved_inputs,
+            resolved_seed=seed,
+            batch_id=batch_id,
+            client_id=client_id
+        )
+        return await job_queue.submit(job, prompt_json, key, client, priority)
+
+    coalesce_key = None
+    if config.COALESCE_IN_FLIGHT and not no_cache:
+        if key:
+            coalesce_key = key
+        elif config.COALESCE_RANDOM_SEEDS:
+            # A resubmitted random-seed run differs only in its seed
+            coalesce_key = "random:" + prompt_hash(template.render(inputs, None)[0])
+    if coalesce_key is None:
+        return await queue()
+
+    owner, shared = await prompt_coalescer.submit(coalesce_key, queue)
+    if not shared:
+        return owner
+
+    # Own job record, sharing the owner's execution (and therefore its seed)
+    job = JobResponse(
+        job_id=uuid.uuid4().hex,
+        prompt_id=owner.prompt_id,
+        workflow_name=workflow_name,
+        status=owner.status,
+        resolved_inputs=resolved_inputs,
+        resolved_seed=owner.resolved_seed,
+        image_url=owner.image_url,
+        outputs=owner.outputs,
+        error=owner.error,
+        batch_id=batch_id,
+        backend=owner.backend,
+        client_id=client_id,
+        progress=owner.progress
+    )
+    job_history.add_job(job)
+    return job
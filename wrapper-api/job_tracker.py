@@ -0,0 +1,183 @@
+import mimetypes
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+from job_history import job_history, IN_FLIGHT_STATUSES, ACTIVE_STATUSES
+from models import JobResponse, JobOutput
+from backends import backend_pool, Backend
+from output_cache import output_cache, cache_key
+from previews import preview_relay
+from coalescer import prompt_coalescer
+from result_cache import result_cache
+from metrics import job_queue_duration
+
+# How many finished-but-unknown prompt ids to remember (see JobTracker.track)
+MAX_UNCLAIMED = 256
+
+def media_kind(filename: str, format: Optional[str] = None) -> str:
+    """image, video or audio from an output's ``format`` (a MIME type, when the node gives one) or extension."""
+    content_type = format or mimetypes.guess_type(filename)[0] or ""
+    kind = content_type.split("/", 1)[0]
+    return kind if kind in ("image", "video", "audio") else "file"
+
+class JobTracker:
+    """Single completion path for jobs, fed by the event listener and the reconciler."""
+
+    def __init__(self):
+        # Prompts that finished before /run registered them in job_history
+        self._unclaimed: "OrderedDict[str, bool]" = OrderedDict()
+
+    def _outputs(self, outputs: Dict[str, Any], backend: Optional[Backend] = None) -> List[JobOutput]:
+        # Every file-like entry (images, gifs, videos, ...) of every output node
+        files = []
+        for node_id, output in outputs.items():
+            for items in output.values():
+                if not isinstance(items, list):
+                    continue
+                for item in items:
+                    if not isinstance(item, dict) or not item.get("filename"):
+                        continue
+                    filename = item["filename"]
+                    subfolder = item.get("subfolder", "")
+                    type_ = item.get("type", "output")
+                    url = f"/proxy/image?filename={filename}&subfolder={subfolder}&type={type_}"
+                    if backend is not None and backend is not backend_pool.primary:
+                        url += f"&backend={backend.name}"
+                    files.append(JobOutput(
+                        filename=filename,
+                        subfolder=subfolder,
+                        type=type_,
+                        node_id=str(node_id),
+                        kind=media_kind(filename, item.get("format")),
+                        url=url,
+                    ))
+        return files
+
+    async def track(self, prompt_id: str):
+        """Called once a job is in job_history; catches events that raced ahead of it."""
+        if self._unclaimed.pop(prompt_id, None):
+            await self.refresh(prompt_id)
+
+    def _jobs(self, prompt_id: str) -> List[JobResponse]:
+        """Jobs sharing a prompt; its owner (job_id == prompt_id) once they have finished."""
+        jobs = job_history.jobs_for_prompt(prompt_id)
+        if not jobs:
+            job = job_history.get_job(prompt_id)
+            jobs = [job] if job else []
+        return jobs
+
+    def is_finished(self, prompt_id: str) -> bool:
+        job = job_history.get_job(prompt_id)
+        return job is not None and job.status not in ACTIVE_STATUSES
+
+    def mark_queued(self, prompt_id: str, queued_id: str, backend: Backend):
+        """A job that waited in our queue reached ``backend`` (as ``queued_id`` if ComfyUI picked its own id)."""
+        if queued_id != prompt_id:
+            job_history.move_prompt(prompt_id, queued_id)
+            prompt_coalescer.move(prompt_id, queued_id)
+        for job in job_history.jobs_for_prompt(queued_id):
+            if job.status == "pending":
+                job.backend = backend.name
+                job_history.update_job_status(job.job_id, "queued")
+
+    def mark_running(self, prompt_id: str):
+        jobs = [job for job in self._jobs(prompt_id) if job.status == "queued"]
+        for job in jobs:
+            job_history.update_job_status(job.job_id, "running")
+        if jobs:
+            backend = backend_pool.for_job(jobs[0])
+            backend.job_started(prompt_id)
+            # One sample per execution, timed from the first submission
+            created = [job.created_at.timestamp() for job in jobs if job.created_at]
+            if created:
+                job_queue_duration.observe(max(time.time() - min(created), 0.0), backend.name)
+
+    def update_progress(self, prompt_id: str, node: Optional[str], value: int = 0, max: int = 0):
+        self.mark_running(prompt_id)
+        for job in job_history.jobs_for_prompt(prompt_id):
+            job_history.update_progress(job.job_id, node, value, max)
+
+    def complete_job(self, prompt_id: str, history_entry: Dict[str, Any]):
+        """Record the final state of a prompt from its /history entry."""
+        jobs = self._jobs(prompt_id)
+        if not jobs:
+            self._remember_unclaimed(prompt_id)
+            return
+        # Cancelled, completed and failed are final (e.g. an interrupt after a cancel)
+        jobs = [job for job in jobs if job.status in ACTIVE_STATUSES]
+        if not jobs:
+            return
+
+        status = history_entry.get("status", {})
+        if status.get("status_str") == "error":
+            self.fail_job(prompt_id, self._error_message(status))
+            return
+
+        backend = backend_pool.for_job(jobs[0])
+        if any(job.status in IN_FLIGHT_STATUSES for job in jobs):
+            backend.job_finished(prompt_id, success=True)
+        preview_relay.finish(prompt_id)
+        prompt_coalescer.release(prompt_id)
+        outputs = self._outputs(history_entry.get("outputs", {}), backend)
+        # First image, for clients that show a single result
+        image_url = next((output.url for output in outputs if output.kind == "image"), None)
+        for job in jobs:
+            job_history.update_job_status(job.job_id, "completed", image_url, outputs=outputs)
+        result_cache.record(prompt_id, jobs[0])
+        output_cache.prefetch(cache_key(output.filename, output.subfolder, output.type, backend and backend.name) for output in outputs)
+
+    def fail_job(self, prompt_id: str, message: str):
+        jobs = self._jobs(prompt_id)
+        if not jobs:
+            self._remember_unclaimed(prompt_id)
+            return
+        # Cancelled, completed and failed are final (e.g. an interrupt after a cancel)
+        jobs = [job for job in jobs if job.status in ACTIVE_STATUSES]
+        if not jobs:
+            return
+        if any(job.status in IN_FLIGHT_STATUSES for job in jobs):
+            backend_pool.for_job(jobs[0]).job_finished(prompt_id, success=False)
+        preview_relay.finish(prompt_id)
+        prompt_coalescer.release(prompt_id)
+        result_cache.discard(prompt_id)
+        for job in jobs:
+            job_history.update_job_status(job.job_id, "failed", error=message)
+
+    def cancel(self, prompt_id: str):
+        """Record a prompt's jobs as cancelled (removed from a queue, or interrupted)."""
+        jobs = job_history.jobs_for_prompt(prompt_id)
+        if any(job.status in IN_FLIGHT_STATUSES for job in jobs):
+            backend_pool.for_job(jobs[0]).job_cancelled(prompt_id)
+        preview_relay.finish(prompt_id)
+        prompt_coalescer.release(prompt_id)
+        result_cache.discard(prompt_id)
+        for job in jobs:
+            job_history.update_job_status(job.job_id, "cancelled")
+
+    async def refresh(self, prompt_id: str, backend: Optional[Backend] = None):
+        """Fetch a prompt's history entry and apply it if ComfyUI has finished it.
+
+        ``backend`` is needed for prompts not yet in job_history; otherwise the
+        job's own backend is asked.
+        """
+        job = job_history.get_job(prompt_id)
+        if job is not None or backend is None:
+            backend = backend_pool.for_job(job)
+        history = await backend.api.get_history(prompt_id)
+        if history:
+            self.complete_job(prompt_id, history)
+
+    def _remember_unclaimed(self, prompt_id: str):
+        self._unclaimed[prompt_id] = True
+        while len(self._unclaimed) > MAX_UNCLAIMED:
+            self._unclaimed.popitem(last=False)
+
+    def _error_message(self, status: Dict[str, Any]) -> str:
+        for message_type, data in status.get("messages", []):
+            if message_type == "execution_error":
+                return data.get("exception_message", "Execution error")
+            if message_type == "execution_interrupted":
+                return "Interrupted"
+        return "Execution error"
+
+job_tracker = JobTracker()
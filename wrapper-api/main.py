@@ -1,22 +1,82 @@
 import asyncio
 import base64
-from typing import List, Dict, Any
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 
-from config import config
 from models import (
     WorkflowSummary, 
     WorkflowIntrospection, 
     RunWorkflowRequest, 
-    JobResponse
+    JobResponse,
+    BatchRunRequest,
+    BatchResponse
 )
 from workflow_loader import workflow_loader
+from workflow_templates import workflow_templates, UIFormatError
 from node_introspection import node_introspector
 from job_history import job_history
+from job_events import job_events
+from previews import preview_relay
+from result_cache import result_cache
+from coalescer import prompt_coalescer
 from comfy_api import comfy_api
+from comfy_events import comfy_event_listeners
+from job_reconciler import job_reconcilers
+from backends import backend_pool
+from job_runner import resolve_seed, submit
+from job_queue import job_queue, QueueFullError
+from job_cancel import job_canceller
+from prompt_validation import prompt_validator, PromptValidationError
+from batches import batch_manager
+from media_proxy import proxy_view
+from output_cache import output_cache
+from output_archive import output_archive
+from image_variants import image_variants
+from uploads import image_uploads, UploadError
+from object_info_cache import object_info_cache
+from metrics import metrics, MetricsMiddleware
+from serialization import FastJSONResponse
+from compression import CompressionMiddleware, response_cache
+from routers import jobs, workflows
 
-app = FastAPI(title="ComfyUI Remote Wrapper")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client per ComfyUI backend, health-checked when there are several
+    await backend_pool.start()
+    # Restores jobs that were in flight when the wrapper last stopped
+    job_history.open()
+    # Their prompts count against each backend's outstanding limit until they finish
+    backend_pool.restore_in_flight(job_history.list_in_flight())
+    output_cache.load()
+    image_uploads.load()
+    # Fetched in the background: needed to validate runs and convert UI-format workflows
+    object_info_task = asyncio.create_task(object_info_cache.warm())
+    await workflow_loader.start()
+    # One websocket per backend updates its in-flight jobs,
+    # with a batched reconciler per backend as the fallback
+    for reconciler in job_reconcilers.values():
+        await reconciler.start()
+    for listener in comfy_event_listeners.values():
+        await listener.start()
+    yield
+    object_info_task.cancel()
+    # Prompts being sent keep their jobs; ones still waiting fail on the next start
+    await job_queue.drain()
+    for listener in comfy_event_listeners.values():
+        await listener.stop()
+    for reconciler in job_reconcilers.values():
+        await reconciler.stop()
+    await workflow_loader.stop()
+    await backend_pool.close()
+    job_history.close()
+    image_variants.close()
+    output_cache.save()
+
+app = FastAPI(title="ComfyUI Remote Wrapper", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,195 +86,394 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+app.include_router(jobs.router)
+app.include_router(workflows.router)
+
+# Read from each component's own state when /metrics is scraped
+def _in_flight_jobs():
+    counts: Dict[tuple, int] = {}
+    for job in job_history.list_in_flight():
+        key = (backend_pool.for_job(job).name, job.status)
+        counts[key] = counts.get(key, 0) + 1
+    return counts.items()
+
+def _caches():
+    return {
+        "output": output_cache,
+        "response": response_cache,
+        "object_info": object_info_cache,
+        "result": result_cache,
+        "upload": image_uploads,
+        "workflow": workflow_templates,
+    }.items()
+
+metrics.collector("jobs_in_flight", "Jobs queued or running in ComfyUI.", "gauge", ("backend", "status"), _in_flight_jobs)
+metrics.collector(
+    "backend_queue_depth", "Prompts running or pending on each backend at its last check.", "gauge", ("backend",),
+    lambda: [((backend.name,), backend.queue_depth) for backend in backend_pool.backends],
+)
+metrics.collector(
+    "backend_healthy", "Whether each backend answered its last health check.", "gauge", ("backend",),
+    lambda: [((backend.name,), int(backend.healthy)) for backend in backend_pool.backends],
+)
+metrics.collector(
+    "reconciler_running", "Whether each backend's reconciliation loop is running.", "gauge", ("backend",),
+    lambda: [((name,), int(reconciler.running)) for name, reconciler in job_reconcilers.items()],
+)
+metrics.collector(
+    "reconcile_interval_seconds", "Current polling interval of each reconciliation loop.", "gauge", ("backend",),
+    lambda: [((name,), reconciler.interval) for name, reconciler in job_reconcilers.items()],
+)
+metrics.collector(
+    "event_stream_connected", "Whether the websocket to each backend is connected.", "gauge", ("backend",),
+    lambda: [((name,), int(listener.connected)) for name, listener in comfy_event_listeners.items()],
+)
+metrics.collector(
+    "upstream_connections", "Open connections in each backend's HTTP pool.", "gauge", ("backend",),
+    lambda: [((backend.name,), backend.api.open_connections()) for backend in backend_pool.backends],
+)
+metrics.collector(
+    "stream_subscribers", "Clients attached to /events and preview streams.", "gauge", ("stream",),
+    lambda: [(("events",), job_events.stats()["subscribers"]), (("previews",), preview_relay.stats()["subscribers"])],
+)
+metrics.collector(
+    "cache_hits_total", "Lookups answered by each cache.", "counter", ("cache",),
+    lambda: [((name,), cache.hits) for name, cache in _caches()],
+)
+metrics.collector(
+    "cache_misses_total", "Lookups each cache could not answer.", "counter", ("cache",),
+    lambda: [((name,), cache.misses) for name, cache in _caches()],
+)
+metrics.collector(
+    "cache_hit_ratio", "Hits over lookups of each cache since startup.", "gauge", ("cache",),
+    lambda: [((name,), cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0) for name, cache in _caches()],
+)
+metrics.collector(
+    "queue_pending_jobs", "Jobs waiting in the wrapper for a free ComfyUI slot.", "gauge", ("priority",),
+    lambda: [((str(priority),), count) for priority, count in job_queue.counts().items()],
+)
+metrics.collector(
+    "queue_rejected_total", "Submissions turned away because the queue was full.", "counter", (),
+    lambda: [((), job_queue.rejected)],
+)
+metrics.collector(
+    "coalesced_submissions_total", "Submissions attached to an identical in-flight prompt.", "counter", (),
+    lambda: [((), prompt_coalescer.coalesced)],
+)
+
 @app.get("/workflows", response_model=List[WorkflowSummary])
 async def list_workflows():
-    return workflow_loader.list_workflows()
+    return await workflow_loader.list_workflows_async()
 
 @app.get("/workflow/{name}", response_model=Dict[str, Any])
-async def get_workflow(name: str):
-    workflow = workflow_loader.load_workflow(name)
+async def get_workflow(name: str, request: Request):
+    workflow = await workflow_loader.load_workflow_async(name)
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    return workflow
+    # The loader hands out the same object until the file changes
+    return await response_cache.get(request, ("workflow", name), workflow) or await response_cache.put(request, ("workflow", name), workflow, workflow)
 
 @app.get("/workflow/{name}/introspect", response_model=WorkflowIntrospection)
-async def introspect_workflow(name: str):
-    workflow = workflow_loader.load_workflow(name)
-    if not workflow:
+async def introspect_workflow(name: str, request: Request):
+    try:
+        template = await workflow_templates.get(name)
+    except UIFormatError:
+        return node_introspector.introspect(await workflow_loader.load_workflow_async(name))
+    if not template:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    return node_introspector.introspect(workflow)
+    # Templates are rebuilt when their source or object_info changes
+    return await response_cache.get(request, ("introspect", name), template) or await response_cache.put(request, ("introspect", name), template, template.introspection)
+
+def queue_client(client_id: Optional[str], http_request: Request) -> str:
+    """Who a submission counts against in the job queue: its client_id, else its address."""
+    if client_id:
+        return client_id
+    return http_request.client.host if http_request.client else "anonymous"
+
+def queue_full(e: QueueFullError) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
 @app.post("/run", response_model=JobResponse)
-async def run_workflow(request: RunWorkflowRequest, background_tasks: BackgroundTasks):
-    # 1. Load Workflow
-    workflow_data = workflow_loader.load_workflow(request.workflow_name)
-    if not workflow_data:
-        raise HTTPException(status_code=404, detail="Workflow not found")
-    
-    # 2. Check workflow format
-    nodes = workflow_data.get("nodes", workflow_data)
-    
-    # If nodes is a list (UI format), we can't easily modify it
-    # ComfyUI's /prompt endpoint expects API format (dict of nodes)
-    if isinstance(nodes, list):
+async def run_workflow(request: RunWorkflowRequest, http_request: Request):
+    # 1. Load the compiled workflow template
+    try:
+        template = await workflow_templates.get(request.workflow_name)
+    except UIFormatError as e:
+        # ComfyUI's /prompt endpoint expects API format (dict of nodes)
         raise HTTPException(
             status_code=400, 
-            detail="Workflow is in UI format. Please export as API format from ComfyUI (Save (API Format) option)."
+            detail=f"{e}. Please export as API format from ComfyUI (Save (API Format) option)."
         )
-    
-    # 3. Prepare Workflow (Apply Inputs)
-    resolved_inputs = {}
-    
-    for key, value in request.inputs.items():
-        # key format: "node_id.input_name"
-        try:
-            node_id, input_name = key.split(".", 1)
-            if node_id in nodes and "inputs" in nodes[node_id]:
-                nodes[node_id]["inputs"][input_name] = value
-                resolved_inputs[key] = value
-        except ValueError:
-            continue
-
-    # 4. Handle Seed
-    resolved_seed = 0
-    if request.seed_control.mode == "random":
-        import random
-        resolved_seed = random.randint(1, 100000000000000)
-    elif request.seed_control.value is not None:
-        resolved_seed = request.seed_control.value
-
-    # Apply seed to all seed inputs
-    introspection = node_introspector.introspect(workflow_data)
-    for node in introspection.nodes:
-        for inp in node.inputs:
-            if inp.is_seed:
-                if node.id in nodes and "inputs" in nodes[node.id]:
-                    nodes[node.id]["inputs"][inp.name] = resolved_seed
-
-    # 5. Submit to ComfyUI
+    if not template:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    # 2. Handle Seed
+    resolved_seed = resolve_seed(request.seed_control)
+
+    # Reject what ComfyUI would reject, without the round trip
+    try:
+        await prompt_validator.validate(template, request.inputs, resolved_seed)
+    except PromptValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+
+    # 3. Render, submit to ComfyUI and track the job
     try:
-        import json
-        print(f"Submitting workflow to ComfyUI: {json.dumps(workflow_data, indent=2)}")
-        prompt_id = await comfy_api.queue_prompt(workflow_data)
+        return await submit(
+            template,
+            request.workflow_name,
+            request.inputs,
+            resolved_seed,
+            request.seed_control.mode,
+            client_id=request.client_id,
+            no_cache=request.no_cache,
+            priority=request.priority,
+            client=queue_client(request.client_id, http_request),
+        )
+    except QueueFullError as e:
+        raise queue_full(e)
     except Exception as e:
         import traceback
         print(f"Error submitting to ComfyUI: {e}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"ComfyUI error: {str(e)}")
 
-    # 6. Create Job Response
-    job = JobResponse(
-        job_id=prompt_id,
-        workflow_name=request.workflow_name,
-        status="queued",
-        resolved_inputs=resolved_inputs,
-        resolved_seed=resolved_seed
+@app.post("/run/batch", response_model=BatchResponse)
+async def run_batch(request: BatchRunRequest, http_request: Request):
+    """Expand runs x grid x count server-side and submit them with bounded concurrency."""
+    try:
+        template = await workflow_templates.get(request.workflow_name)
+    except UIFormatError as e:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"{e}. Please export as API format from ComfyUI (Save (API Format) option)."
+        )
+    if not template:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    try:
+        return await batch_manager.run(template, request, queue_client(request.client_id, http_request))
+    except QueueFullError as e:
+        raise queue_full(e)
+    except PromptValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/batch/{batch_id}", response_model=BatchResponse)
+async def get_batch(batch_id: str):
+    batch = batch_manager.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+@app.get("/batch/{batch_id}/jobs", response_model=List[JobResponse])
+async def get_batch_jobs(batch_id: str):
+    if batch_manager.get(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch_manager.jobs(batch_id)
+
+@app.get("/batch/{batch_id}/outputs.zip")
+async def download_batch_outputs(batch_id: str):
+    """Outputs of the batch's completed jobs as one zip (a folder per job), streamed as it is built."""
+    if batch_manager.get(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    jobs = [job for job in batch_manager.jobs(batch_id) if job.outputs]
+    if not jobs:
+        raise HTTPException(status_code=409, detail="No job of the batch has outputs yet")
+    return StreamingResponse(
+        output_archive.stream(jobs, folders=True),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{batch_id}.zip"'},
     )
-    job_history.add_job(job)
-
-    # 7. Start Background Polling
-    background_tasks.add_task(poll_job, prompt_id)
-
-    return job
-
-async def poll_job(prompt_id: str):
-    """Polls ComfyUI for job completion and updates history."""
-    import asyncio
-    
-    while True:
-        try:
-            history = await comfy_api.get_history(prompt_id)
-            if history:
-                # Job finished
-                outputs = history.get("outputs", {})
-                image_url = None
-                
-                # Find first image
-                for node_id, output in outputs.items():
-                    if "images" in output:
-                        for img in output["images"]:
-                            filename = img.get("filename")
-                            subfolder = img.get("subfolder", "")
-                            type_ = img.get("type", "output")
-                            
-                            # Construct a proxy URL for the frontend
-                            # We need a new endpoint to serve these images via proxy
-                            image_url = f"/proxy/image?filename={filename}&subfolder={subfolder}&type={type_}"
-                            break
-                    if image_url: break
-                
-                job_history.update_job_status(prompt_id, "completed", image_url)
-                break
-            
-            # Check if failed? (ComfyUI doesn't make this easy via history, usually need to check queue)
-            # For now, simple polling
-            await asyncio.sleep(1)
-        except Exception as e:
-            print(f"Polling error for {prompt_id}: {e}")
-            break
+
+@app.post("/batch/{batch_id}/cancel", response_model=BatchResponse)
+async def cancel_batch(batch_id: str):
+    """Cancel the unfinished jobs of a batch; finished ones keep their results."""
+    if batch_manager.get(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    try:
+        await job_canceller.cancel(job_history.list_active(batch_id=batch_id))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return batch_manager.get(batch_id)
 
 @app.get("/history", response_model=List[JobResponse])
-async def get_history():
-    return job_history.list_jobs()
+async def get_history(
+    response: Response,
+    limit: int = Query(20, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    workflow_name: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    backend: Optional[str] = None,
+    since: Optional[datetime] = None,
+):
+    """Newest jobs first; pass the X-Next-Cursor header back as ``cursor`` for the next page."""
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    jobs, next_cursor = job_history.list_jobs(limit, cursor, status, workflow_name, batch_id, backend, since)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return jobs
+
+@app.get("/events")
+async def stream_events(
+    request: Request,
+    job_id: List[str] = Query([]),
+    client_id: Optional[str] = None,
+    last_event_id: Optional[str] = None,
+):
+    """Server-Sent Events with every state change of the selected jobs.
+
+    Filter by ``job_id`` (repeatable) and/or ``client_id``; with neither, all jobs
+    are streamed. Reconnects resume after the Last-Event-ID header (or
+    ``last_event_id``); a ``resync`` event means events were lost and the client
+    should reload /history.
+    """
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    return StreamingResponse(
+        job_events.stream(job_id or None, client_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.api_route("/proxy/image", methods=["GET", "HEAD"])
+async def proxy_image(
+    request: Request,
+    filename: str,
+    subfolder: str = "",
+    type: str = "output",
+    w: Optional[int] = None,
+    format: Optional[str] = None,
+    backend: Optional[str] = None,
+):
+    """Proxy an output; ``w`` and/or ``format`` (webp, jpeg, avif, png) request a preview variant."""
+    return await proxy_view(request, filename, subfolder, type, w, format, backend)
+
+@app.post("/upload/image")
+async def upload_image(request: Request):
+    """Upload an input image (multipart field ``image``) to every backend.
+
+    Returns the ``name`` to pass as a LoadImage input in /run. The name is
+    derived from the content, so re-uploading the same image is answered
+    without sending it to ComfyUI again (``deduplicated``).
+    """
+    try:
+        return await image_uploads.upload(request.headers.get("content-type", ""), request.stream())
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"ComfyUI upload failed: {e}")
 
-@app.get("/proxy/image")
-async def proxy_image(filename: str, subfolder: str = "", type: str = "output"):
-    from fastapi.responses import Response
+@app.get("/upload/image/{sha256}")
+async def get_uploaded_image(sha256: str):
+    """Look an image up by its sha256, so a client can skip uploading one the backends already have."""
     try:
-        content = await comfy_api.get_image(filename, subfolder, type)
-        return Response(content=content, media_type="image/png") # Assume PNG for now
+        upload = await image_uploads.lookup(sha256)
     except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
+        raise HTTPException(status_code=502, detail=str(e))
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Image not uploaded")
+    return upload
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Latency histograms, gauges and cache counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/http")
+async def get_http_stats():
+    """Connection pool and reuse counters for upstream ComfyUI traffic."""
+    return comfy_api.stats()
+
+@app.get("/backends")
+async def get_backends():
+    """Health, queue depth and execution time estimate of every ComfyUI backend."""
+    return backend_pool.stats()
+
+@app.get("/stats/jobs")
+async def get_job_stats():
+    """Stored and in-flight job counts, /events subscribers and preview streams."""
+    return {**job_history.stats(), "events": job_events.stats(), "previews": preview_relay.stats()}
+
+@app.get("/stats/queue")
+async def get_queue_stats():
+    """Jobs waiting in the wrapper per priority, and our prompts outstanding per backend."""
+    return job_queue.stats()
+
+@app.get("/stats/cache")
+async def get_cache_stats():
+    """Size and hit ratio of the on-disk output cache."""
+    return output_cache.stats()
+
+@app.get("/stats/results")
+async def get_result_cache_stats():
+    """Entries and hit ratio of the result cache, and coalesced submissions."""
+    return {**result_cache.stats(), "coalescing": prompt_coalescer.stats()}
+
+@app.get("/stats/uploads")
+async def get_upload_stats():
+    """Remembered uploads and how often an upload was deduplicated."""
+    return image_uploads.stats()
+
+@app.delete("/cache/results")
+async def clear_result_cache():
+    """Forget cached results (e.g. after deleting outputs in ComfyUI)."""
+    result_cache.clear()
+    return result_cache.stats()
+
+@app.get("/stats/object_info")
+async def get_object_info_stats():
+    """Version, age and hit ratio of the cached object_info, and prompt validation."""
+    return {**object_info_cache.stats(), "validation": prompt_validator.stats()}
 
 @app.get("/checkpoints")
-async def get_checkpoints():
+async def get_checkpoints(request: Request):
     """Get list of available checkpoints from ComfyUI."""
     try:
-        object_info = await comfy_api.get_object_info()
-        
-        # Extract checkpoint loaders
-        checkpoints = []
-        for node_type, node_info in object_info.items():
-            if "CheckpointLoader" in node_type or "checkpoint" in node_type.lower():
-                # Get the checkpoint input configuration
-                if "input" in node_info and "required" in node_info["input"]:
-                    for input_name, input_config in node_info["input"]["required"].items():
-                        if input_name == "ckpt_name" or "checkpoint" in input_name.lower():
-                            if isinstance(input_config, list) and len(input_config) > 0:
-                                # First element is usually the list of available options
-                                if isinstance(input_config[0], list):
-                                    checkpoints.extend(input_config[0])
-        
-        # Remove duplicates and sort
-        checkpoints = sorted(list(set(checkpoints)))
-        return {"checkpoints": checkpoints}
+        _, checkpoints = await object_info_cache.models("checkpoints")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get checkpoints: {str(e)}")
+    key = ("models", "checkpoints")
+    return await response_cache.get(request, key, object_info_cache.version) or await response_cache.put(request, key, object_info_cache.version, {"checkpoints": checkpoints})
 
 @app.get("/loras")
-async def get_loras():
+async def get_loras(request: Request):
     """Get list of available LoRAs from ComfyUI."""
     try:
-        object_info = await comfy_api.get_object_info()
-        
-        # Extract LoRA loaders
-        loras = []
-        for node_type, node_info in object_info.items():
-            if "LoraLoader" in node_type or "lora" in node_type.lower():
-                # Get the lora input configuration
-                if "input" in node_info and "required" in node_info["input"]:
-                    for input_name, input_config in node_info["input"]["required"].items():
-                        if "lora" in input_name.lower() and "weight" not in input_name.lower() and "strength" not in input_name.lower():
-                            if isinstance(input_config, list) and len(input_config) > 0:
-                                # First element is usually the list of available options
-                                if isinstance(input_config[0], list):
-                                    loras.extend(input_config[0])
-        
-        # Remove duplicates and sort
-        loras = sorted(list(set(loras)))
-        return {"loras": loras}
+        _, loras = await object_info_cache.models("loras")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get loras: {str(e)}")
+    key = ("models", "loras")
+    return await response_cache.get(request, key, object_info_cache.version) or await response_cache.put(request, key, object_info_cache.version, {"loras": loras})
+
+@app.get("/models")
+async def list_model_kinds():
+    """Model kinds served by /models/{kind}."""
+    return {"kinds": object_info_cache.kinds(), "version": object_info_cache.version}
+
+@app.post("/models/refresh")
+async def refresh_models():
+    """Re-fetch object_info from ComfyUI now (e.g. after adding model files)."""
+    try:
+        await object_info_cache.refresh()
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to refresh object_info: {str(e)}")
+    return object_info_cache.stats()
+
+@app.get("/models/{kind}")
+async def get_models(kind: str, prefix: str = "", offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    """Paginated option list for one model kind, filtered by case-insensitive prefix."""
+    if kind not in object_info_cache.kinds():
+        raise HTTPException(status_code=404, detail=f"Unknown model kind: {kind}")
+    try:
+        total, items = await object_info_cache.models(kind, prefix, offset, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get {kind}: {str(e)}")
+    return {"kind": kind, "total": total, "offset": offset, "limit": limit, "items": items}
 
 if __name__ == "__main__":
     import uvicorn
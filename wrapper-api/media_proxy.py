@@ -0,0 +1,109 @@
+import httpx
+from typing import Dict, Optional
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from config import config
+from backends import backend_pool
+from output_cache import output_cache, cache_key
+from image_variants import image_variants
+
+# Request headers passed through to ComfyUI's /view
+FORWARDED_REQUEST_HEADERS = ("range", "if-range")
+# Response headers passed back to the client
+FORWARDED_RESPONSE_HEADERS = (
+    "content-type",
+    "content-length",
+    "content-range",
+    "accept-ranges",
+    "last-modified",
+    "content-disposition",
+)
+
+def _response_headers(upstream: httpx.Response) -> Dict[str, str]:
+    return {name: upstream.headers[name] for name in FORWARDED_RESPONSE_HEADERS if name in upstream.headers}
+
+async def _variant_response(request: Request, entry: Dict, width: Optional[int], format: Optional[str]) -> Response:
+    try:
+        variant_format = image_variants.negotiate(format, request.headers.get("accept", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Storing the variant may evict cache entries; not this one while it is served from
+    output_cache.pin(entry["hash"])
+    try:
+        variant, body = await image_variants.get_variant(entry, width, variant_format)
+    except Exception as e:
+        # Not decodable as a still image: fall back to the original
+        print(f"Variant encoding failed for {entry['hash']}: {e}")
+        return output_cache.response(request, entry)
+    finally:
+        output_cache.unpin(entry["hash"])
+    response = output_cache.response(request, variant, body)
+    if not format:
+        response.headers["Vary"] = "Accept"
+    return response
+
+async def proxy_view(
+    request: Request,
+    filename: str,
+    subfolder: str = "",
+    type: str = "output",
+    width: Optional[int] = None,
+    format: Optional[str] = None,
+    backend: Optional[str] = None,
+) -> Response:
+    """Stream a file from ComfyUI's /view with bounded memory.
+
+    Outputs are served from the on-disk cache when possible, optionally as a
+    downscaled ``width`` / ``format`` variant (format negotiated from Accept if
+    only a width is given). Otherwise upstream
+    content type, length and range headers are forwarded, so Range and HEAD
+    requests behave as if the client were talking to ComfyUI directly.
+    ``backend`` names the ComfyUI instance that produced the file (default: primary).
+    """
+    owner = backend_pool.get(backend)
+    if owner is None:
+        raise HTTPException(status_code=404, detail=f"Unknown backend: {backend}")
+
+    if output_cache.cacheable(type):
+        key = cache_key(filename, subfolder, type, owner.name)
+        if request.method == "HEAD" and output_cache.lookup(key) is None:
+            pass
+        elif "range" in request.headers and output_cache.lookup(key) is None:
+            # Don't make a seek wait for the whole file; cache it in the background
+            output_cache.prefetch([key])
+        else:
+            try:
+                entry = await output_cache.get_or_fetch(filename, subfolder, type, backend=owner.name)
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail="Image not found")
+            except httpx.RequestError as exc:
+                raise HTTPException(status_code=503, detail=f"ComfyUI unreachable: {exc}")
+            if entry is not None and (width or format) and entry["content_type"].startswith("image/"):
+                return await _variant_response(request, entry, width, format)
+            if entry is not None:
+                return output_cache.response(request, entry)
+
+    params = {"filename": filename, "subfolder": subfolder, "type": type}
+    headers = {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+
+    try:
+        upstream = await owner.api.open_view(request.method, params, headers)
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=503, detail=f"ComfyUI unreachable: {exc}")
+
+    if upstream.status_code >= 400 and upstream.status_code != 416:
+        await upstream.aclose()
+        raise HTTPException(status_code=404 if upstream.status_code == 404 else 502, detail="Image not found")
+
+    response_headers = _response_headers(upstream)
+    if request.method == "HEAD":
+        await upstream.aclose()
+        return Response(status_code=upstream.status_code, headers=response_headers)
+
+    return StreamingResponse(
+        upstream.aiter_raw(config.PROXY_CHUNK_SIZE),
+        status_code=upstream.status_code,
+        headers=response_headers,
+        background=BackgroundTask(upstream.aclose),
+    )
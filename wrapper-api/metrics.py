@@ -0,0 +1,169 @@
+import time
+from bisect import bisect_left
+from typing import Dict, Any, Callable, Iterable, List, Tuple
+
+# Upper bounds (seconds) of request latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Upper bounds (seconds) of job phase buckets: queue waits and executions
+JOB_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+PREFIX = "comfyui_remote_"
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[Any, ...], list] = {}
+
+    def observe(self, value: float, *labels: Any):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels: Any) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Collector:
+    """A gauge or counter read from existing state when /metrics is scraped."""
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: Tuple[str, ...], collect: Callable[[], Iterable[Tuple[Tuple[Any, ...], float]]]):
+        self.name = PREFIX + name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+class MetricsRegistry:
+    """In-process metrics in the Prometheus text format.
+
+    Hot paths only touch histograms (a dict lookup, a bisect and two additions);
+    gauges and cache ratios are read from the components' own state at scrape
+    time, so nothing is maintained twice.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def collector(self, name: str, help: str, kind: str, labelnames: Tuple[str, ...], collect: Callable[[], Iterable[Tuple[Tuple[Any, ...], float]]]) -> Collector:
+        return self._add(Collector(name, help, kind, labelnames, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One broken collector must not take the whole scrape down
+                print(f"Metrics collection error in {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time from request to response headers, per route template.",
+    ("method", "route", "status"),
+)
+upstream_request_duration = metrics.histogram(
+    "upstream_request_duration_seconds",
+    "Time of ComfyUI requests per endpoint (to headers for streamed /view).",
+    ("backend", "endpoint", "status"),
+)
+job_queue_duration = metrics.histogram(
+    "job_queue_seconds",
+    "Time from submission until ComfyUI started executing the prompt.",
+    ("backend",),
+    JOB_BUCKETS,
+)
+job_execution_duration = metrics.histogram(
+    "job_execution_seconds",
+    "Time from execution start until the prompt completed or failed.",
+    ("backend", "outcome"),
+    JOB_BUCKETS,
+)
+
+def upstream_endpoint(path: str) -> str:
+    """First path segment of a ComfyUI URL ("/history/<id>" -> "/history")."""
+    return "/" + path.split("?", 1)[0].lstrip("/").split("/", 1)[0]
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency.
+
+    Labels use the matched route template so path parameters do not create new
+    series; unmatched paths share one label. Streaming responses (events,
+    previews) are timed to their headers, not to the end of the stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                self._observe(scope, status, start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if status is None:
+                self._observe(scope, 500, start)
+
+    def _observe(self, scope, status: int, start: float):
+        route = scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        http_request_duration.observe(time.perf_counter() - start, scope["method"], path, str(status))
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
@@ -23,18 +23,77 @@ class WorkflowIntrospection(BaseModel):
     nodes: List[WorkflowNode]
 
 class SeedControl(BaseModel):
-    mode: str = "random" # fixed, random
+    mode: str = "random" # fixed, random, increment (batches: value + run index)
     value: Optional[int] = None
 
 class RunWorkflowRequest(BaseModel):
     workflow_name: str
     inputs: Dict[str, Any] = {}
     seed_control: SeedControl = SeedControl()
+    # Caller-chosen id (e.g. per device) for following its jobs on /events
+    client_id: Optional[str] = None
+    # Queue the prompt even if an identical fixed-seed run is cached
+    no_cache: bool = False
+    # Higher goes first while jobs wait for a free ComfyUI slot; bounded so
+    # no client can outrank everyone by an arbitrary margin
+    priority: int = Field(0, ge=-10, le=10)
+
+class JobProgress(BaseModel):
+    # Node currently executing, and its step counter (e.g. sampler steps)
+    node: Optional[str] = None
+    value: int = 0
+    max: int = 0
+
+class JobOutput(BaseModel):
+    # As passed to ComfyUI's /view
+    filename: str
+    subfolder: str = ""
+    type: str = "output"
+    # Node that produced the file
+    node_id: str
+    kind: str = "file" # image, video, audio, file
+    url: str
 
 class JobResponse(BaseModel):
     job_id: str
+    # ComfyUI prompt that produces the job's outputs (shared by cached jobs)
+    prompt_id: Optional[str] = None
     workflow_name: str
     status: str
     resolved_inputs: Dict[str, Any]
     resolved_seed: int
     image_url: Optional[str] = None
+    # Every file of every output node, in node order
+    outputs: List[JobOutput] = []
+    error: Optional[str] = None
+    batch_id: Optional[str] = None
+    # Name of the ComfyUI backend that owns the prompt
+    backend: Optional[str] = None
+    created_at: Optional[datetime] = None
+    client_id: Optional[str] = None
+    progress: Optional[JobProgress] = None
+    # Served from the result cache instead of running on ComfyUI
+    cached: bool = False
+
+class BatchRunRequest(BaseModel):
+    workflow_name: str
+    # Inputs shared by every run
+    inputs: Dict[str, Any] = {}
+    # Per-run overrides, e.g. [{"6.text": "a cat"}, {"6.text": "a dog"}]
+    runs: List[Dict[str, Any]] = []
+    # Cartesian product of input values, e.g. {"3.cfg": [5, 7], "3.steps": [20, 30]}
+    grid: Dict[str, List[Any]] = {}
+    # Repeats of every expanded run (e.g. 32 seeds of one prompt)
+    count: int = 1
+    seed_control: SeedControl = SeedControl()
+    client_id: Optional[str] = None
+    no_cache: bool = False
+    priority: int = Field(0, ge=-10, le=10)
+
+class BatchResponse(BaseModel):
+    batch_id: str
+    workflow_name: str
+    status: str
+    job_ids: List[str]
+    # Number of jobs per status
+    counts: Dict[str, int] = {}
@@ -0,0 +1,166 @@
+import asyncio
+import bisect
+import hashlib
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from config import config
+from serialization import loads
+from comfy_api import comfy_api
+
+# Model kind -> predicate(node_type, input_name) selecting the combo inputs that list it
+MODEL_KINDS = {
+    "checkpoints": lambda node, name: name == "ckpt_name" or ("checkpoint" in node and "checkpoint" in name),
+    "loras": lambda node, name: "lora" in node and "lora" in name and "weight" not in name and "strength" not in name,
+    "vae": lambda node, name: name == "vae_name",
+    "upscalers": lambda node, name: name == "model_name" and "upscale" in node,
+    "controlnets": lambda node, name: name == "control_net_name",
+    "clip": lambda node, name: name in ("clip_name", "clip_name1", "clip_name2"),
+    "unets": lambda node, name: name == "unet_name",
+}
+# Served from ComfyUI's /embeddings rather than from object_info
+EMBEDDINGS = "embeddings"
+
+def combo_options(spec: Any) -> Optional[List[str]]:
+    """Options of a combo input spec, in both the legacy and the COMBO format."""
+    if not isinstance(spec, list) or not spec:
+        return None
+    if isinstance(spec[0], list):
+        return [option for option in spec[0] if isinstance(option, str)]
+    if spec[0] == "COMBO" and len(spec) > 1 and isinstance(spec[1], dict):
+        return [option for option in spec[1].get("options", []) if isinstance(option, str)]
+    return None
+
+def build_model_index(object_info: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Map each model kind to its sorted option list (case-insensitive order)."""
+    found: Dict[str, set] = {kind: set() for kind in MODEL_KINDS}
+    for node_type, node_info in object_info.items():
+        node = node_type.lower()
+        inputs = node_info.get("input", {}) if isinstance(node_info, dict) else {}
+        for section in ("required", "optional"):
+            for input_name, spec in (inputs.get(section) or {}).items():
+                name = input_name.lower()
+                kinds = [kind for kind, matches in MODEL_KINDS.items() if matches(node, name)]
+                if not kinds:
+                    continue
+                options = combo_options(spec)
+                if options:
+                    for kind in kinds:
+                        found[kind].update(options)
+    return {kind: sorted(options, key=str.lower) for kind, options in found.items()}
+
+class ObjectInfoCache:
+    """TTL cache of ComfyUI's /object_info with single-flight refresh and a model index."""
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.fetched_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._object_info: Optional[Dict[str, Any]] = None
+        self._index: Dict[str, List[str]] = {}
+        # Lower-cased keys parallel to each index list, for prefix bisection
+        self._keys: Dict[str, List[str]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _fresh(self) -> bool:
+        return self._object_info is not None and time.monotonic() - self.fetched_at < config.OBJECT_INFO_TTL
+
+    @property
+    def fresh(self) -> bool:
+        return self._fresh()
+
+    @property
+    def cached(self) -> Optional[Dict[str, Any]]:
+        """The last fetched object_info (possibly stale), without contacting ComfyUI."""
+        return self._object_info
+
+    def expire(self):
+        """Treat the cached copy as stale, e.g. after an upload added an input image."""
+        self.fetched_at = time.monotonic() - config.OBJECT_INFO_TTL
+
+    async def get(self) -> Dict[str, Any]:
+        """The cached object_info, refreshed once the TTL has expired."""
+        if self._fresh():
+            self.hits += 1
+            return self._object_info
+        self.misses += 1
+        await self.refresh()
+        return self._object_info
+
+    async def refresh(self):
+        """Fetch object_info now; concurrent callers share one upstream request."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+            self._refresh_task.add_done_callback(self._refresh_done)
+        await asyncio.shield(self._refresh_task)
+
+    async def warm(self):
+        """Fetch object_info ahead of the first request that needs it."""
+        try:
+            await self.get()
+        except Exception as e:
+            print(f"Could not fetch object_info: {e}")
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._refresh_task = None
+        if not task.cancelled():
+            # Retrieved by awaiters; avoid "never retrieved" noise when there are none
+            task.exception()
+
+    async def _refresh(self):
+        try:
+            raw = await comfy_api.get_object_info_raw()
+        except Exception:
+            if self._object_info is None:
+                raise
+            # Serve stale data rather than failing while ComfyUI is briefly away
+            print("object_info refresh failed, keeping cached copy")
+            self.fetched_at = time.monotonic()
+            return
+
+        version = hashlib.sha256(raw).hexdigest()[:16]
+        if version != self.version:
+            object_info, index = await asyncio.to_thread(self._parse, raw)
+            try:
+                index[EMBEDDINGS] = sorted(await comfy_api.get_embeddings(), key=str.lower)
+            except Exception as e:
+                print(f"Could not list embeddings: {e}")
+                index[EMBEDDINGS] = self._index.get(EMBEDDINGS, [])
+            self._object_info = object_info
+            self._index = index
+            self._keys = {kind: [option.lower() for option in options] for kind, options in index.items()}
+            self.version = version
+        self.fetched_at = time.monotonic()
+
+    def _parse(self, raw: bytes) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+        object_info = loads(raw)
+        return object_info, build_model_index(object_info)
+
+    def kinds(self) -> List[str]:
+        return list(MODEL_KINDS) + [EMBEDDINGS]
+
+    async def models(self, kind: str, prefix: str = "", offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[str]]:
+        """Options of one model kind matching ``prefix``: (total matches, requested page)."""
+        await self.get()
+        options = self._index.get(kind, [])
+        keys = self._keys.get(kind, [])
+        if prefix:
+            prefix = prefix.lower()
+            start = bisect.bisect_left(keys, prefix)
+            end = bisect.bisect_left(keys, prefix + "\uffff", lo=start)
+        else:
+            start, end = 0, len(options)
+        stop = end if limit is None else min(end, start + offset + limit)
+        return end - start, options[start + offset:stop]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "age": round(time.monotonic() - self.fetched_at, 1) if self.version else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+object_info_cache = ObjectInfoCache()
@@ -0,0 +1,117 @@
+import asyncio
+import time
+import zipfile
+from typing import AsyncIterator, Iterable, List, Optional
+from config import config
+from models import JobResponse, JobOutput
+from backends import backend_pool
+from output_cache import output_cache, cache_key
+
+class _Sink:
+    """Write-only file for ZipFile that hands written bytes to the response as they come."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def archive_name(job: JobResponse, output: JobOutput, folder: bool) -> str:
+    """Path of an output in the archive: subfolder/filename, optionally under the job id."""
+    parts = [part for part in f"{output.subfolder}/{output.filename}".split("/") if part and part not in (".", "..")]
+    if folder:
+        parts.insert(0, job.job_id)
+    return "/".join(parts)
+
+class OutputArchive:
+    """Zip of a job's (or batch's) outputs, built while it is sent.
+
+    Files are stored uncompressed (images and videos are compressed already)
+    and copied in PROXY_CHUNK_SIZE pieces from the output cache, or straight
+    from ComfyUI's /view when they are not cached, so memory use does not grow
+    with the number or size of the files. Sizes and checksums go in data
+    descriptors after each file, which needs no seeking. Outputs that can no
+    longer be fetched are listed in MISSING.txt at the end of the archive.
+    """
+
+    def __init__(self):
+        self.archives = 0
+        self.files = 0
+
+    async def _cached_chunks(self, path) -> AsyncIterator[bytes]:
+        with open(path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, config.PROXY_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    async def _upstream_chunks(self, output: JobOutput, backend: Optional[str]) -> AsyncIterator[bytes]:
+        owner = backend_pool.get(backend)
+        if owner is None:
+            raise FileNotFoundError(output.filename)
+        params = {"filename": output.filename, "subfolder": output.subfolder, "type": output.type}
+        upstream = await owner.api.open_view("GET", params)
+        try:
+            if upstream.status_code != 200:
+                raise FileNotFoundError(output.filename)
+            async for chunk in upstream.aiter_bytes(config.PROXY_CHUNK_SIZE):
+                yield chunk
+        finally:
+            await upstream.aclose()
+
+    async def stream(self, jobs: Iterable[JobResponse], folders: bool = False) -> AsyncIterator[bytes]:
+        """Zip bytes of every output of ``jobs``; with ``folders``, each job's files are under its id."""
+        sink = _Sink()
+        missing: List[str] = []
+        used = set()
+        self.archives += 1
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+            for job in jobs:
+                for output in job.outputs:
+                    name = archive_name(job, output, folders)
+                    if name in used:
+                        # Same file reported by two nodes
+                        continue
+                    used.add(name)
+                    entry = output_cache.lookup(cache_key(output.filename, output.subfolder, output.type, job.backend))
+                    if entry is not None:
+                        chunks, size = self._cached_chunks(output_cache.blob_path(entry["hash"])), entry["size"]
+                    else:
+                        chunks, size = self._upstream_chunks(output, job.backend), 0
+                    try:
+                        # Opened before the entry is written, so a missing file leaves no trace
+                        first = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        first = b""
+                    except Exception as e:
+                        print(f"Leaving {name} out of the archive: {e}")
+                        missing.append(name)
+                        continue
+                    info = zipfile.ZipInfo(name, time.localtime()[:6])
+                    info.file_size = size
+                    # Unknown sizes get zip64 headers in case the file is a large video
+                    with archive.open(info, "w", force_zip64=entry is None) as f:
+                        f.write(first)
+                        async for chunk in chunks:
+                            yield sink.take()
+                            f.write(chunk)
+                    self.files += 1
+                    yield sink.take()
+            if missing:
+                archive.writestr("MISSING.txt", "".join(f"{name}\n" for name in missing))
+        yield sink.take()
+
+    def stats(self):
+        return {"archives": self.archives, "files": self.files}
+
+output_archive = OutputArchive()
@@ -0,0 +1,356 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, Iterable
+from fastapi import Request
+from fastapi.responses import Response, FileResponse, StreamingResponse
+from config import config
+from backends import backend_pool
+
+# (filename, subfolder, type) as used by ComfyUI's /view, plus the backend name
+CacheKey = Tuple[str, str, str, str]
+
+# Seconds to wait before writing the index after a change
+INDEX_SAVE_DELAY = 5.0
+
+def cache_key(filename: str, subfolder: str, type: str, backend: Optional[str] = None) -> CacheKey:
+    """Cache key of an output; ``backend`` defaults to the primary backend."""
+    return (filename, subfolder, type, backend or backend_pool.primary.name)
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single "bytes=" range into inclusive offsets.
+
+    Returns None for headers we do not handle (multiple ranges, other units), in
+    which case the full body is served. Raises ValueError if unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_str, _, end_str = spec.strip().partition("-")
+    try:
+        if not start_str:
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError("Empty suffix range")
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+    except ValueError:
+        raise ValueError(f"Invalid range: {header}")
+    end = min(end, size - 1)
+    if start > end:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, end
+
+class OutputCache:
+    """Content-addressed on-disk cache of ComfyUI outputs with LRU eviction.
+
+    Blobs are stored once per sha256 digest under ``blobs/``; the index maps
+    each (filename, subfolder, type, backend) to its digest, size and content type.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[CacheKey, Dict[str, Any]]" = OrderedDict()
+        self._blob_refs: Dict[str, int] = {}
+        # Bytes of derived variants (thumbnails, ...) stored next to each blob
+        self._variant_bytes: Dict[str, int] = {}
+        # Blobs (and their variants) in use by a request, skipped by eviction
+        self._pins: Dict[str, int] = {}
+        self._size = 0
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self._tasks: set = set()
+        self._prefetch_slots: Optional[asyncio.Semaphore] = None
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return config.OUTPUT_CACHE_MAX_BYTES > 0
+
+    def cacheable(self, type: str) -> bool:
+        # temp/input files are overwritten in place by ComfyUI; outputs get fresh names
+        return self.enabled and type == "output"
+
+    def _blob_dir(self) -> Path:
+        return config.OUTPUT_CACHE_DIR / "blobs"
+
+    def blob_path(self, digest: str) -> Path:
+        return self._blob_dir() / digest
+
+    def variant_path(self, digest: str, name: str) -> Path:
+        return self._blob_dir() / f"{digest}.{name}"
+
+    def add_variant(self, digest: str, size: int):
+        """Account for a variant file written next to a cached blob."""
+        self._variant_bytes[digest] = self._variant_bytes.get(digest, 0) + size
+        self._size += size
+        self._evict()
+
+    def pin(self, digest: str):
+        """Keep a blob and its variants on disk until the matching unpin()."""
+        self._pins[digest] = self._pins.get(digest, 0) + 1
+
+    def unpin(self, digest: str):
+        refs = self._pins.pop(digest, 0) - 1
+        if refs > 0:
+            self._pins[digest] = refs
+        else:
+            self._evict()
+
+    def _index_path(self) -> Path:
+        return config.OUTPUT_CACHE_DIR / "index.json"
+
+    def load(self):
+        """Rebuild the in-memory index from disk (called from the app lifespan)."""
+        if not self.enabled or not self._index_path().exists():
+            return
+        try:
+            with open(self._index_path(), "r") as f:
+                records = json.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable output cache index: {e}")
+            return
+        for record in records:
+            key = cache_key(record["filename"], record["subfolder"], record["type"], record.get("backend"))
+            entry = {name: record[name] for name in ("hash", "size", "content_type")}
+            if self.blob_path(entry["hash"]).exists():
+                self._add(key, entry)
+        self._scan_variants()
+        self._evict()
+
+    def _scan_variants(self):
+        # Variants are not indexed; pick them up from disk and drop leftovers
+        for path in self._blob_dir().iterdir():
+            digest, dot, _ = path.name.partition(".")
+            if not dot:
+                continue
+            if path.name.endswith(".part") or digest not in self._blob_refs:
+                path.unlink(missing_ok=True)
+            else:
+                size = path.stat().st_size
+                self._variant_bytes[digest] = self._variant_bytes.get(digest, 0) + size
+                self._size += size
+
+    def save(self):
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if not self.enabled:
+            return
+        records = [
+            {"filename": key[0], "subfolder": key[1], "type": key[2], "backend": key[3], **entry}
+            for key, entry in self._entries.items()
+        ]
+        config.OUTPUT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._index_path().with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(records, f)
+        os.replace(tmp_path, self._index_path())
+
+    def _schedule_save(self):
+        if self._save_handle is None:
+            self._save_handle = asyncio.get_running_loop().call_later(INDEX_SAVE_DELAY, self.save)
+
+    def _add(self, key: CacheKey, entry: Dict[str, Any]):
+        self._drop(key)
+        self._entries[key] = entry
+        refs = self._blob_refs.get(entry["hash"], 0)
+        if refs == 0:
+            self._size += entry["size"]
+        self._blob_refs[entry["hash"]] = refs + 1
+
+    def _drop(self, key: CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        refs = self._blob_refs[entry["hash"]] - 1
+        if refs > 0:
+            self._blob_refs[entry["hash"]] = refs
+            return
+        del self._blob_refs[entry["hash"]]
+        self._size -= entry["size"] + self._variant_bytes.pop(entry["hash"], 0)
+        self.blob_path(entry["hash"]).unlink(missing_ok=True)
+        for variant in self._blob_dir().glob(f"{entry['hash']}.*"):
+            variant.unlink(missing_ok=True)
+
+    def _evict(self):
+        for key in [key for key, entry in self._entries.items() if entry["hash"] not in self._pins]:
+            if self._size <= config.OUTPUT_CACHE_MAX_BYTES:
+                return
+            self._drop(key)
+
+    def lookup(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not self.blob_path(entry["hash"]).exists():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def get_or_fetch(self, filename: str, subfolder: str, type: str, prefetch: bool = False, backend: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the cache entry for an output, downloading it on a miss.
+
+        Concurrent misses for the same file share one download. Returns None when
+        the file cannot be cached (too large, upstream error other than 404).
+        """
+        key = cache_key(filename, subfolder, type, backend)
+        entry = self.lookup(key)
+        if entry is not None:
+            if not prefetch:
+                self.hits += 1
+            return entry
+
+        if not prefetch:
+            self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        filename, subfolder, type, backend = key
+        owner = backend_pool.get(backend)
+        if owner is None:
+            raise FileNotFoundError(filename)
+        params = {"filename": filename, "subfolder": subfolder, "type": type}
+        upstream = await owner.api.open_view("GET", params)
+        try:
+            if upstream.status_code == 404:
+                raise FileNotFoundError(filename)
+            if upstream.status_code != 200:
+                return None
+            if int(upstream.headers.get("content-length", 0)) > config.OUTPUT_CACHE_MAX_BYTES:
+                return None
+
+            self._blob_dir().mkdir(parents=True, exist_ok=True)
+            digest = hashlib.sha256()
+            size = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self._blob_dir(), suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    async for chunk in upstream.aiter_bytes(config.PROXY_CHUNK_SIZE):
+                        digest.update(chunk)
+                        size += len(chunk)
+                        if size > config.OUTPUT_CACHE_MAX_BYTES:
+                            raise OverflowError(filename)
+                        await asyncio.to_thread(f.write, chunk)
+                # Identical content from different filenames lands on the same blob
+                os.replace(tmp_path, self.blob_path(digest.hexdigest()))
+            except OverflowError:
+                os.unlink(tmp_path)
+                return None
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        finally:
+            await upstream.aclose()
+
+        entry = {
+            "hash": digest.hexdigest(),
+            "size": size,
+            "content_type": upstream.headers.get("content-type", "application/octet-stream"),
+        }
+        self._add(key, entry)
+        self._evict()
+        self._schedule_save()
+        return entry
+
+    def prefetch(self, files: Iterable[CacheKey]):
+        """Download outputs in the background as soon as a job completes."""
+        if self._prefetch_slots is None:
+            self._prefetch_slots = asyncio.Semaphore(config.OUTPUT_CACHE_PREFETCH_CONCURRENCY)
+        for key in files:
+            if not self.cacheable(key[2]) or key in self._entries:
+                continue
+            task = asyncio.create_task(self._prefetch(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _prefetch(self, key: CacheKey):
+        async with self._prefetch_slots:
+            try:
+                await self.get_or_fetch(*key[:3], prefetch=True, backend=key[3])
+            except Exception as e:
+                print(f"Prefetch failed for {key[0]}: {e}")
+
+    def response(self, request: Request, entry: Dict[str, Any], body: Optional[bytes] = None) -> Response:
+        """Serve a cached entry with ETag/Cache-Control, 304 and single-range support.
+
+        ``body`` is the entry's content already read into memory; it is served
+        instead of the file, which may then be evicted at any time.
+        """
+        etag = f'"{entry["hash"]}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"private, max-age={config.OUTPUT_CACHE_MAX_AGE}",
+            "Accept-Ranges": "bytes",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if etag in tags or "*" in tags:
+                return Response(status_code=304, headers=headers)
+
+        path = self.blob_path(entry["hash"])
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (if_range is None or if_range == etag):
+            size = entry["size"]
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                headers["Content-Length"] = str(end - start + 1)
+                if request.method == "HEAD":
+                    return Response(status_code=206, headers=headers, media_type=entry["content_type"])
+                if body is not None:
+                    return Response(body[start:end + 1], status_code=206, headers=headers, media_type=entry["content_type"])
+                return StreamingResponse(
+                    self._read_range(path, start, end),
+                    status_code=206,
+                    headers=headers,
+                    media_type=entry["content_type"],
+                )
+
+        if body is not None:
+            return Response(body, media_type=entry["content_type"], headers=headers)
+        return FileResponse(path, media_type=entry["content_type"], headers=headers)
+
+    async def _read_range(self, path: Path, start: int, end: int):
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(config.PROXY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "blobs": len(self._blob_refs),
+            "bytes": self._size,
+            "max_bytes": config.OUTPUT_CACHE_MAX_BYTES,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+output_cache = OutputCache()
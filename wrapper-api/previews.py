@@ -0,0 +1,112 @@
+import asyncio
+import io
+from typing import Dict, Optional, AsyncIterator, Tuple
+from PIL import Image
+from config import config
+
+# Multipart boundary of the preview stream
+BOUNDARY = "frame"
+
+def downscale_frame(image: bytes, width: int, quality: int) -> bytes:
+    """Shrink a preview frame to ``width`` and re-encode it as JPEG."""
+    with Image.open(io.BytesIO(image)) as img:
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.BILINEAR)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=quality)
+        return out.getvalue()
+
+class PreviewSlot:
+    """Latest preview frame of one prompt; older frames are simply replaced."""
+
+    def __init__(self):
+        self.seq = 0
+        self.frame: Optional[bytes] = None
+        self.subscribers = 0
+        self.done = False
+        self.changed = asyncio.Event()
+        # (seq, JPEG bytes) of the latest frame, downscaled once for every subscriber
+        self._scaled: Optional[Tuple[int, asyncio.Future]] = None
+
+    def update(self, frame: Optional[bytes]):
+        if frame is not None:
+            self.frame = frame
+            self.seq += 1
+        # Wake everyone waiting on the current event and start a new one
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def scaled(self) -> bytes:
+        if self._scaled is None or self._scaled[0] != self.seq:
+            task = asyncio.ensure_future(asyncio.to_thread(downscale_frame, self.frame, config.PREVIEW_MAX_WIDTH, config.PREVIEW_QUALITY))
+            self._scaled = (self.seq, task)
+        return await asyncio.shield(self._scaled[1])
+
+class PreviewRelay:
+    """Relays ComfyUI's latent previews to opted-in clients.
+
+    Frames are only kept for prompts that someone is watching. Each subscriber
+    reads the latest frame at its own rate, so a slow client skips frames
+    instead of holding up the ComfyUI websocket.
+    """
+
+    def __init__(self):
+        self._slots: Dict[str, PreviewSlot] = {}
+        self.frames_received = 0
+        self.frames_sent = 0
+
+    def publish(self, prompt_id: str, frame: bytes):
+        self.frames_received += 1
+        slot = self._slots.get(prompt_id)
+        if slot is not None and slot.subscribers:
+            slot.update(frame)
+
+    def finish(self, prompt_id: str):
+        """End every preview stream of a prompt (it completed, failed or was cancelled)."""
+        slot = self._slots.pop(prompt_id, None)
+        if slot is not None:
+            slot.done = True
+            slot.update(None)
+
+    async def frames(self, prompt_id: str, fps: float) -> AsyncIterator[bytes]:
+        """Downscaled JPEG frames for one subscriber, at most ``fps`` per second."""
+        slot = self._slots.setdefault(prompt_id, PreviewSlot())
+        slot.subscribers += 1
+        interval = 1.0 / max(min(fps, config.PREVIEW_FPS), 0.1)
+        sent = 0
+        try:
+            while not slot.done:
+                if slot.seq == sent:
+                    await slot.changed.wait()
+                    continue
+                sent = slot.seq
+                frame = await slot.scaled()
+                self.frames_sent += 1
+                yield frame
+                await asyncio.sleep(interval)
+        finally:
+            slot.subscribers -= 1
+            if slot.subscribers == 0 and self._slots.get(prompt_id) is slot:
+                del self._slots[prompt_id]
+
+    async def multipart(self, prompt_id: str, fps: float) -> AsyncIterator[bytes]:
+        """``multipart/x-mixed-replace`` body (MJPEG) of a prompt's previews."""
+        async for frame in self.frames(prompt_id, fps):
+            yield (
+                f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(frame)}\r\n\r\n".encode()
+                + frame
+                + b"\r\n"
+            )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "watched_prompts": len(self._slots),
+            "subscribers": sum(slot.subscribers for slot in self._slots.values()),
+            "frames_received": self.frames_received,
+            "frames_sent": self.frames_sent,
+        }
+
+preview_relay = PreviewRelay()
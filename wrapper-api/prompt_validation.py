@@ -0,0 +1,209 @@
+import weakref
+from typing import Dict, Any, List, Optional, Callable
+from config import config
+from object_info_cache import object_info_cache, combo_options
+from workflow_templates import WorkflowTemplate
+
+# Checks one value; returns an error message or None
+Check = Callable[[Any], Optional[str]]
+
+# Combo errors list the options when there are at most this many
+LIST_OPTIONS = 10
+
+class PromptValidationError(ValueError):
+    """Run inputs that ComfyUI would reject; ``errors`` has one entry per input."""
+
+    def __init__(self, errors: List[Dict[str, str]]):
+        self.errors = errors
+        super().__init__("; ".join(f"{error['input']}: {error['message']}" for error in errors))
+
+def _is_link(value: Any) -> bool:
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+def _number_check(kind: str, convert: Callable[[Any], Any], options: Dict[str, Any]) -> Check:
+    # Same conversion and bounds as ComfyUI's own validate_inputs
+    low, high = options.get("min"), options.get("max")
+
+    def check(value: Any) -> Optional[str]:
+        try:
+            value = convert(value)
+        except (TypeError, ValueError, OverflowError):
+            return f"{value!r} is not a valid {kind}"
+        if low is not None and value < low:
+            return f"{value} is smaller than the minimum of {low}"
+        if high is not None and value > high:
+            return f"{value} is bigger than the maximum of {high}"
+        return None
+    return check
+
+def _combo_check(options: List[str]) -> Check:
+    allowed = frozenset(options)
+    if len(options) <= LIST_OPTIONS:
+        expected = "one of " + ", ".join(repr(option) for option in options)
+    else:
+        expected = f"one of the {len(options)} available options"
+
+    def check(value: Any) -> Optional[str]:
+        if isinstance(value, str) and value in allowed:
+            return None
+        return f"{value!r} is not {expected}"
+    return check
+
+def _value_check(kind: str) -> Check:
+    # ComfyUI coerces anything else with str() / bool()
+    def check(value: Any) -> Optional[str]:
+        if isinstance(value, (list, dict)):
+            return f"{value!r} is not a valid {kind}"
+        return None
+    return check
+
+def compile_spec(spec: Any) -> Optional[Check]:
+    """Check for one input spec from object_info; None for connection-only inputs."""
+    if not isinstance(spec, list) or not spec:
+        return lambda value: None
+    options = combo_options(spec)
+    if options is not None:
+        return _combo_check(options)
+    extra = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+    kind = spec[0]
+    if kind == "INT":
+        return _number_check("INT", int, extra)
+    if kind == "FLOAT":
+        return _number_check("FLOAT", float, extra)
+    if kind == "STRING":
+        return _value_check("STRING")
+    if kind == "BOOLEAN":
+        return _value_check("BOOLEAN")
+    if isinstance(kind, str) and kind.isupper():
+        # MODEL, CLIP, LATENT, ...: only a connection to another node fits
+        return None
+    return lambda value: None
+
+class NodeSpec:
+    """Compiled checks of one node type."""
+
+    def __init__(self, class_type: str, node_info: Dict[str, Any]):
+        self.class_type = class_type
+        inputs = node_info.get("input", {}) if isinstance(node_info, dict) else {}
+        self.required = list((inputs.get("required") or {}).keys())
+        self.checks: Dict[str, Optional[Check]] = {}
+        self.types: Dict[str, str] = {}
+        for section in ("required", "optional"):
+            for name, spec in (inputs.get(section) or {}).items():
+                self.checks[name] = compile_spec(spec)
+                self.types[name] = spec[0] if isinstance(spec, list) and spec and isinstance(spec[0], str) else "COMBO"
+
+    def check(self, name: str, value: Any) -> Optional[str]:
+        if name not in self.checks:
+            return f"{self.class_type} has no input {name!r}"
+        check = self.checks[name]
+        if _is_link(value):
+            return None
+        if check is None:
+            return f"expects a {self.types[name]} connection, not a value"
+        return check(value)
+
+class PromptValidator:
+    """Validates run inputs against the cached object_info before they are queued.
+
+    Node types are compiled to checks once per object_info version. A template's
+    own values and required inputs are checked once per version as well, so a
+    run only pays for a dict lookup and a comparison per override. Nothing is
+    checked until object_info has been fetched; ComfyUI still validates then.
+    """
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self._specs: Dict[str, Optional[NodeSpec]] = {}
+        # template -> (object_info version, errors of its unpatched graph by input key)
+        self._templates: "weakref.WeakKeyDictionary[WorkflowTemplate, tuple]" = weakref.WeakKeyDictionary()
+        self.rejected = 0
+
+    def _spec(self, object_info: Dict[str, Any], class_type: str) -> Optional[NodeSpec]:
+        if class_type not in self._specs:
+            node_info = object_info.get(class_type)
+            self._specs[class_type] = NodeSpec(class_type, node_info) if node_info is not None else None
+        return self._specs[class_type]
+
+    def _template_errors(self, object_info: Dict[str, Any], template: WorkflowTemplate) -> Dict[str, str]:
+        cached = self._templates.get(template)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        errors = {}
+        for node_id, node in template.nodes.items():
+            if not isinstance(node, dict):
+                continue
+            class_type = node.get("class_type")
+            spec = self._spec(object_info, class_type)
+            if spec is None:
+                errors[node_id] = f"unknown node type {class_type!r} (missing custom node?)"
+                continue
+            inputs = node.get("inputs") or {}
+            for name in spec.required:
+                if name not in inputs:
+                    errors[f"{node_id}.{name}"] = f"required input of {class_type} is missing"
+            for name, value in inputs.items():
+                # ComfyUI ignores inputs its node type does not declare
+                message = spec.check(name, value) if name in spec.checks else None
+                if message:
+                    errors[f"{node_id}.{name}"] = message
+        self._templates[template] = (self.version, errors)
+        return errors
+
+    def errors(self, object_info: Dict[str, Any], version: Optional[str], template: WorkflowTemplate, inputs: Dict[str, Any], seed: Optional[int] = None) -> List[Dict[str, str]]:
+        """Problems of the prompt ``template`` renders with these overrides and seed."""
+        if version != self.version:
+            self.version = version
+            self._specs.clear()
+
+        overrides: Dict[str, Any] = {}
+        for key, value in inputs.items():
+            node_id, _, name = key.partition(".")
+            # Same rule as WorkflowTemplate.render: other keys are ignored there
+            if name and isinstance(template.nodes.get(node_id), dict) and "inputs" in template.nodes[node_id]:
+                overrides[key] = value
+        if seed is not None:
+            for node_id, name in template.seed_slots:
+                overrides[f"{node_id}.{name}"] = seed
+
+        errors = []
+        for key, message in self._template_errors(object_info, template).items():
+            if key not in overrides:
+                errors.append({"input": key, "message": message})
+        for key, value in overrides.items():
+            node_id, _, name = key.partition(".")
+            spec = self._spec(object_info, template.nodes[node_id].get("class_type"))
+            if spec is None:
+                continue  # Already reported for the node
+            message = spec.check(name, value)
+            if message:
+                errors.append({"input": key, "message": message})
+        return errors
+
+    async def validate(self, template: WorkflowTemplate, inputs: Dict[str, Any], seed: Optional[int] = None):
+        """Raise PromptValidationError for inputs ComfyUI would reject.
+
+        Uses whatever object_info is cached without waiting for ComfyUI. Only when
+        that copy finds problems is it refreshed (if stale) and checked again, so
+        newly added models are not rejected because of an old list.
+        """
+        if not config.VALIDATE_PROMPTS:
+            return
+        object_info = object_info_cache.cached
+        if object_info is None:
+            return
+        errors = self.errors(object_info, object_info_cache.version, template, inputs, seed)
+        if errors and not object_info_cache.fresh:
+            try:
+                object_info = await object_info_cache.get()
+            except Exception as e:
+                print(f"object_info refresh before validation failed: {e}")
+            errors = self.errors(object_info, object_info_cache.version, template, inputs, seed)
+        if errors:
+            self.rejected += 1
+            raise PromptValidationError(errors)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": config.VALIDATE_PROMPTS, "version": self.version, "node_types": len(self._specs), "rejected": self.rejected}
+
+prompt_validator = PromptValidator()
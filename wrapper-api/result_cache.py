@@ -0,0 +1,84 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from config import config
+from serialization import dumps, loads
+from models import JobResponse
+
+def prompt_hash(prompt_json: str) -> str:
+    """Canonical hash of a resolved prompt graph (key order and whitespace ignored)."""
+    canonical = dumps(loads(prompt_json), sort_keys=True)
+    return hashlib.sha256(canonical).hexdigest()
+
+class ResultCache:
+    """Completed results of deterministic prompts, keyed by prompt hash.
+
+    Only prompts whose output is fully determined by the graph (fixed seed)
+    are registered. A hit points at the outputs of the earlier run, which
+    stay on the backend that produced them.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # prompt_id -> hash of prompts that will be cached once they complete
+        self._pending: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return config.RESULT_CACHE_SIZE > 0
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry["stored_at"] > config.RESULT_CACHE_TTL:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def expect(self, prompt_id: str, key: str):
+        """Cache the result of ``prompt_id`` under ``key`` when it completes."""
+        if self.enabled:
+            self._pending[prompt_id] = key
+
+    def record(self, prompt_id: str, job: JobResponse):
+        key = self._pending.pop(prompt_id, None)
+        if key is None:
+            return
+        self._entries[key] = {
+            "prompt_id": prompt_id,
+            "job_id": job.job_id,
+            "image_url": job.image_url,
+            "outputs": job.outputs,
+            "backend": job.backend,
+            "stored_at": time.time(),
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > config.RESULT_CACHE_SIZE:
+            self._entries.popitem(last=False)
+
+    def discard(self, prompt_id: str):
+        """Forget a prompt that failed or was cancelled."""
+        self._pending.pop(prompt_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "pending": len(self._pending),
+            "max_entries": config.RESULT_CACHE_SIZE,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+result_cache = ResultCache()
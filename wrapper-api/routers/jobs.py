@@ -1,51 +1,59 @@
-from fastapi import APIRouter, HTTPException, Response
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional
 import httpx
+import copy
 import uuid
 import json
 import random
-from config import settings
+from config import config
+from comfy_api import ComfyAPI, comfy_api
+from backends import backend_pool
+from job_history import job_history, IN_FLIGHT_STATUSES
+from job_cancel import job_canceller
+from media_proxy import proxy_view
+from output_archive import output_archive
+from previews import preview_relay, BOUNDARY
+from workflow_loader import workflow_loader
 
 router = APIRouter(
     prefix="/jobs",
     tags=["jobs"]
 )
 
-async def comfy_request(method: str, endpoint: str, json_data: Any = None):
-    """Helper to make requests to ComfyUI"""
-    url = f"{settings.comfyui_base_url}{endpoint}"
-    async with httpx.AsyncClient() as client:
-        try:
-            if method == "GET":
-                response = await client.get(url)
-            elif method == "POST":
-                response = await client.post(url, json=json_data)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            response.raise_for_status()
-            return response
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"ComfyUI unreachable: {exc}")
-        except httpx.HTTPStatusError as exc:
-            raise HTTPException(status_code=exc.response.status_code, detail=f"ComfyUI error: {exc.response.text}")
+def job_api(job_id: str) -> ComfyAPI:
+    """Client of the backend that owns a job (the primary for unknown jobs)"""
+    return backend_pool.for_job(job_history.get_job(job_id)).api
+
+def job_prompt_id(job_id: str) -> str:
+    """ComfyUI prompt behind a job (cached jobs reuse an earlier prompt)"""
+    job = job_history.get_job(job_id)
+    return job.prompt_id if job and job.prompt_id else job_id
+
+async def comfy_request(method: str, endpoint: str, json_data: Any = None, api: ComfyAPI = comfy_api):
+    """Helper to make requests to ComfyUI over the shared connection pool"""
+    try:
+        response = await api.request(method, endpoint, json_data)
+        response.raise_for_status()
+        return response
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=503, detail=f"ComfyUI unreachable: {exc}")
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(status_code=exc.response.status_code, detail=f"ComfyUI error: {exc.response.text}")
 
 @router.post("/start", response_model=Dict[str, Any])
 async def start_job(workflow_id: str, node_updates: Dict[str, Any] = None):
     """
     Start a job (via ComfyUI /prompt).
     """
-    # 1. Load workflow JSON
-    # We reuse the logic from workflows router or just read file directly
-    # Ideally we should have a service layer, but for now direct file read is fine
-    import os
-    workflow_path = os.path.join(settings.workflow_dir, workflow_id)
-    if not os.path.exists(workflow_path):
+    # 1. Load workflow JSON from the shared catalog (copied, since we modify it)
+    if not config.WORKFLOW_DIR:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    
-    with open(workflow_path, 'r') as f:
-        workflow_data = json.load(f)
-    
+    workflow_data = await workflow_loader.load_workflow_async(workflow_id)
+    if workflow_data is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    workflow_data = copy.deepcopy(workflow_data)
+
     workflow = workflow_data.get("nodes", workflow_data) # Handle both wrapped and raw formats
 
     # 2. Apply node_updates
@@ -71,33 +79,61 @@ async def start_job(workflow_id: str, node_updates: Dict[str, Any] = None):
     
     return {"job_id": data.get("prompt_id"), "status": "queued"}
 
+@router.post("/cancel", response_model=Dict[str, Any])
+async def cancel_client_jobs(client_id: str):
+    """
+    Cancel every unfinished job of a client.
+    """
+    try:
+        cancelled = await job_canceller.cancel(job_history.list_active(client_id=client_id))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"client_id": client_id, "cancelled": [job.job_id for job in cancelled]}
+
 @router.post("/{job_id}/stop", response_model=Dict[str, Any])
 async def stop_job(job_id: str):
     """
-    Stop a job (via ComfyUI /interrupt).
+    Cancel a job: removed from the queue while pending, interrupted only while it is the one running.
     """
-    await comfy_request("POST", "/interrupt")
-    return {"job_id": job_id, "status": "stopped"}
+    job = job_history.get_job(job_id)
+    try:
+        if job is None:
+            # Not ours (e.g. queued with /jobs/start): only what ComfyUI has queued or running
+            if not await job_canceller.cancel_prompt(job_id):
+                raise HTTPException(status_code=404, detail="Job not found in the queue")
+        elif not await job_canceller.cancel([job]):
+            raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"job_id": job_id, "status": "cancelled"}
 
 @router.get("/{job_id}", response_model=Dict[str, Any])
 async def get_job_status(job_id: str):
     """
     Check job status.
     """
+    job = job_history.get_job(job_id)
+    if job is not None and job.status == "pending":
+        # Still in the wrapper's queue; ComfyUI has not seen it
+        return {"job_id": job_id, "status": "pending"}
+    api = job_api(job_id)
+    prompt_id = job_prompt_id(job_id)
     # Check history first (finished jobs)
-    history_resp = await comfy_request("GET", f"/history/{job_id}")
+    history_resp = await comfy_request("GET", f"/history/{prompt_id}", api=api)
     history = history_resp.json()
     
-    if job_id in history:
-        return {"job_id": job_id, "status": "completed", "details": history[job_id]}
+    if prompt_id in history:
+        return {"job_id": job_id, "status": "completed", "details": history[prompt_id]}
         
     # Check queue (pending/running)
-    queue_resp = await comfy_request("GET", "/queue")
+    queue_resp = await comfy_request("GET", "/queue", api=api)
     queue = queue_resp.json()
     
     for status in ["queue_running", "queue_pending"]:
         for item in queue.get(status, []):
-            if item[1] == job_id:
+            if item[1] == prompt_id:
                 return {"job_id": job_id, "status": status}
                 
     return {"job_id": job_id, "status": "unknown"}
@@ -107,13 +143,14 @@ async def list_job_images(job_id: str):
     """
     List images from finished jobs.
     """
-    history_resp = await comfy_request("GET", f"/history/{job_id}")
+    prompt_id = job_prompt_id(job_id)
+    history_resp = await comfy_request("GET", f"/history/{prompt_id}", api=job_api(job_id))
     history = history_resp.json()
     
-    if job_id not in history:
+    if prompt_id not in history:
         raise HTTPException(status_code=404, detail="Job not found or not finished")
         
-    outputs = history[job_id].get("outputs", {})
+    outputs = history[prompt_id].get("outputs", {})
     images = []
     for node_id, node_output in outputs.items():
         if "images" in node_output:
@@ -122,21 +159,50 @@ async def list_job_images(job_id: str):
                 
     return images
 
-@router.get("/{job_id}/images/{filename}")
-async def get_job_image(job_id: str, filename: str):
+@router.get("/{job_id}/outputs.zip")
+async def download_job_outputs(job_id: str):
     """
-    Retrieve a specific image from a job.
+    All outputs of a finished job (every node, images, gifs and videos) as one zip, streamed as it is built.
     """
-    # We need to find the image details (subfolder, type) from history again
-    # Or we can just try to fetch it from ComfyUI /view
-    
-    # Simple proxy to /view
-    params = f"?filename={filename}"
-    url = f"{settings.comfyui_base_url}/view{params}"
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        if response.status_code != 200:
-             raise HTTPException(status_code=response.status_code, detail="Image not found")
-        
-        return Response(content=response.content, media_type=response.headers.get("content-type"))
+    job = job_history.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.outputs:
+        raise HTTPException(status_code=409, detail="Job has no outputs")
+    return StreamingResponse(
+        output_archive.stream([job]),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{job_id}.zip"'},
+    )
+
+@router.api_route("/{job_id}/images/{filename}", methods=["GET", "HEAD"])
+async def get_job_image(
+    request: Request,
+    job_id: str,
+    filename: str,
+    subfolder: str = "",
+    type: str = "output",
+    w: Optional[int] = None,
+    format: Optional[str] = None,
+):
+    """
+    Retrieve a specific image from a job, optionally as a resized variant.
+    """
+    job = job_history.get_job(job_id)
+    return await proxy_view(request, filename, subfolder, type, w, format, job.backend if job else None)
+
+@router.get("/{job_id}/preview")
+async def stream_job_preview(job_id: str, fps: float = Query(None, gt=0)):
+    """
+    Live latent previews of a running job as an MJPEG (multipart/x-mixed-replace) stream.
+    Frames are downscaled and sent at most ``fps`` times per second; the stream ends with the job.
+    """
+    job = job_history.get_job(job_id)
+    if job is None or job.status not in IN_FLIGHT_STATUSES:
+        raise HTTPException(status_code=404, detail="Job not found or not running")
+    # Frames and the end of the stream come under the prompt, which coalesced jobs share
+    return StreamingResponse(
+        preview_relay.multipart(job.prompt_id or job_id, fps or config.PREVIEW_FPS),
+        media_type=f"multipart/x-mixed-replace; boundary={BOUNDARY}",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
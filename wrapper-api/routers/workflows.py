@@ -1,8 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from typing import List, Dict, Any
-import os
-import json
-from config import settings
+from config import config
+from workflow_loader import workflow_loader
+from compression import response_cache
 
 router = APIRouter(
     prefix="/workflows",
@@ -17,33 +17,12 @@ async def list_workflows():
     Returns:
         List of workflow summaries (id, name, description).
     """
-    workflows = []
-    workflow_dir = settings.workflow_dir
-    
-    if not os.path.exists(workflow_dir):
+    if not config.WORKFLOW_DIR:
         return []
-
-    for filename in os.listdir(workflow_dir):
-        if filename.endswith(".json"):
-            file_path = os.path.join(workflow_dir, filename)
-            try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    # Attempt to extract metadata, fallback to filename
-                    name = data.get("name", filename.replace(".json", ""))
-                    description = data.get("description", "No description provided")
-                    workflows.append({
-                        "id": filename,
-                        "name": name,
-                        "description": description
-                    })
-            except json.JSONDecodeError:
-                continue # Skip invalid JSON files
-                
-    return workflows
+    return await workflow_loader.list_catalog_async()
 
 @router.get("/{id}", response_model=Dict[str, Any])
-async def get_workflow(id: str):
+async def get_workflow(id: str, request: Request):
     """
     Retrieve workflow JSON + parsed nodes.
     
@@ -51,16 +30,12 @@ async def get_workflow(id: str):
         id: The ID of the workflow to retrieve (filename).
         
     Returns:
-        Full workflow JSON object.
+        Full workflow JSON object, precompressed per Accept-Encoding.
     """
-    workflow_dir = settings.workflow_dir
-    file_path = os.path.join(workflow_dir, id)
-    
-    if not os.path.exists(file_path):
+    if not config.WORKFLOW_DIR:
         raise HTTPException(status_code=404, detail="Workflow not found")
-        
-    try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading workflow: {str(e)}")
+
+    workflow = await workflow_loader.load_workflow_async(id)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    return await response_cache.get(request, ("workflow", id), workflow) or await response_cache.put(request, ("workflow", id), workflow, workflow)
@@ -0,0 +1,42 @@
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value: Any, sort_keys: bool = False) -> bytes:
+    """Compact UTF-8 JSON; orjson when it is installed (and the value fits it, e.g. ints up to 64 bits)."""
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(value, default=_default, option=options)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(value, default=_default, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False).encode()
+
+def dumps_str(value: Any, sort_keys: bool = False) -> str:
+    return dumps(value, sort_keys).decode()
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Also what orjson rejects but json accepts (NaN, integers beyond 64 bits)
+            pass
+    return json.loads(data)
+
+class FastJSONResponse(JSONResponse):
+    """The app's default response class: bodies encoded with dumps()."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
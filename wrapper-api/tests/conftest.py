@@ -1,9 +1,63 @@
 import pytest
 from fastapi.testclient import TestClient
 import respx
-from httpx import Response
+from pathlib import Path
 from main import app
-from config import settings
+from config import config
+from job_history import job_history
+from output_cache import output_cache
+from result_cache import result_cache
+from coalescer import prompt_coalescer
+from backends import backend_pool
+from job_queue import job_queue
+from object_info_cache import object_info_cache
+from uploads import image_uploads
+from compression import response_cache
+
+@pytest.fixture(autouse=True)
+def workflow_dir():
+    config.WORKFLOW_DIR = Path(__file__).resolve().parent.parent / "workflows"
+    return config.WORKFLOW_DIR
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    config.OUTPUT_CACHE_DIR = tmp_path / "cache"
+    output_cache.__init__()
+    return config.OUTPUT_CACHE_DIR
+
+@pytest.fixture(autouse=True)
+def upload_index(tmp_path):
+    config.UPLOAD_INDEX_PATH = tmp_path / "uploads.json"
+    image_uploads.__init__()
+    return config.UPLOAD_INDEX_PATH
+
+@pytest.fixture(autouse=True)
+def job_db(tmp_path):
+    config.JOB_DB_PATH = tmp_path / "jobs.db"
+    job_history.close()
+    yield config.JOB_DB_PATH
+    job_history.close()
+
+@pytest.fixture(autouse=True)
+def clear_prompt_state():
+    yield
+    result_cache.__init__()
+    prompt_coalescer.__init__()
+    # Mocked prompts never finish; their slots would fill up the queue's limit
+    job_queue.__init__()
+    for backend in backend_pool.backends:
+        backend.in_flight = backend.queue_pending = backend.queue_running = 0
+
+@pytest.fixture(autouse=True)
+def clear_object_info():
+    # Cached node definitions would make later runs validate against them
+    yield
+    object_info_cache.__init__()
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    yield
+    response_cache.__init__()
 
 @pytest.fixture
 def client():
@@ -11,5 +65,5 @@ def client():
 
 @pytest.fixture
 def mock_comfy():
-    with respx.mock(base_url=settings.comfyui_base_url) as respx_mock:
+    with respx.mock(base_url=config.COMFYUI_URL) as respx_mock:
         yield respx_mock
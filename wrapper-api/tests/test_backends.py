@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+import respx
+from httpx import Response
+from backends import Backend, backend_pool
+from comfy_api import ComfyAPI
+from job_history import job_history
+from job_reconciler import JobReconciler
+from models import JobResponse
+
+@pytest.fixture
+def gpu2(monkeypatch):
+    backend = Backend("gpu2", ComfyAPI("http://gpu2:8188"))
+    monkeypatch.setitem(backend_pool._by_name, "gpu2", backend)
+    monkeypatch.setattr(backend_pool, "backends", [backend_pool.primary, backend])
+    return backend
+
+def test_pick_prefers_least_loaded_healthy_backend(gpu2, monkeypatch):
+    primary = backend_pool.primary
+    monkeypatch.setattr(primary, "queue_pending", 3)
+    monkeypatch.setattr(primary, "execution_time", 5.0)
+    gpu2.execution_time = 12.0
+    assert backend_pool.pick() is gpu2  # 1 x 12s beats 4 x 5s
+
+    gpu2.queue_pending = 2
+    assert backend_pool.pick() is primary
+
+    monkeypatch.setattr(primary, "healthy", False)
+    assert backend_pool.pick() is gpu2
+
+def test_execution_time_average():
+    backend = Backend("b", ComfyAPI("http://b:8188"))
+    backend.job_submitted()
+    backend.job_started("p1")
+    backend._started["p1"] -= 10
+    backend.job_finished("p1", success=True)
+    assert backend.in_flight == 0
+    assert backend.execution_time == pytest.approx(10, abs=0.5)
+
+def test_queue_depth_follows_our_prompts_between_checks():
+    # A single backend is never health-checked; events alone must bring it back to idle
+    backend = Backend("b", ComfyAPI("http://b:8188"))
+    backend.job_submitted()
+    backend.job_submitted()
+    assert (backend.queue_pending, backend.queue_running) == (2, 0)
+    backend.job_started("p1")
+    assert (backend.queue_pending, backend.queue_running) == (1, 1)
+    backend.job_finished("p1", success=True)
+    backend.job_finished("p2", success=True)  # Completed without a start event (cached)
+    assert backend.queue_depth == 0
+
+    backend.update_queue({"queue_running": [[0, "p3"]], "queue_pending": []})
+    backend.job_started("p3")
+    backend.job_cancelled("p3")
+    assert backend.queue_depth == 0
+    # Nothing ahead of a new prompt
+    assert backend.load() == backend.execution_time
+
+def test_restored_jobs_count_as_outstanding(gpu2):
+    for job_id, backend in (("a", None), ("b", "gpu2"), ("c", "gpu2")):
+        job_history.add_job(JobResponse(job_id=job_id, workflow_name="basic_txt2img", status="queued", resolved_inputs={}, resolved_seed=1, backend=backend))
+    # Coalesced onto b's prompt
+    job_history.add_job(JobResponse(job_id="d", prompt_id="b", workflow_name="basic_txt2img", status="queued", resolved_inputs={}, resolved_seed=1, backend="gpu2"))
+    job_history.close()
+    job_history.open()
+
+    backend_pool.restore_in_flight(job_history.list_in_flight())
+    assert (backend_pool.primary.in_flight, gpu2.in_flight) == (1, 2)
+
+def test_health_check_marks_backend_unhealthy(gpu2):
+    with respx.mock() as mock:
+        mock.get("http://gpu2:8188/queue").mock(return_value=Response(500))
+        asyncio.run(backend_pool.check(gpu2))
+        assert not gpu2.healthy
+
+        mock.get("http://gpu2:8188/queue").mock(return_value=Response(200, json={"queue_running": [[0, "a"]], "queue_pending": []}))
+        asyncio.run(backend_pool.check(gpu2))
+        assert gpu2.healthy
+        assert gpu2.queue_depth == 1
+
+def test_reconciler_asks_the_owning_backend(gpu2):
+    job = JobResponse(job_id="remote_1", workflow_name="basic_txt2img", status="queued", resolved_inputs={}, resolved_seed=1, backend="gpu2")
+    job_history.add_job(job)
+    outputs = {"9": {"images": [{"filename": "r.png", "subfolder": "", "type": "temp"}]}}
+
+    with respx.mock() as mock:
+        mock.get("http://gpu2:8188/queue").mock(return_value=Response(200, json={"queue_running": [], "queue_pending": []}))
+        mock.get("http://gpu2:8188/history").mock(return_value=Response(200, json={"remote_1": {"outputs": outputs, "status": {"status_str": "success"}}}))
+
+        # The primary's reconciler leaves the job alone
+        assert asyncio.run(JobReconciler().reconcile()) == 0
+        asyncio.run(JobReconciler(gpu2).reconcile())
+
+    assert job.status == "completed"
+    assert job.image_url == "/proxy/image?filename=r.png&subfolder=&type=temp&backend=gpu2"
+
+def test_unknown_backend_is_404(client):
+    assert client.get("/proxy/image?filename=x.png&backend=nope").status_code == 404
@@ -0,0 +1,64 @@
+import json
+import pytest
+from httpx import Response
+from batches import expand_runs
+from models import BatchRunRequest
+from config import config
+from job_history import job_history
+
+def test_expand_runs_grid_and_count():
+    request = BatchRunRequest(
+        workflow_name="basic_txt2img",
+        inputs={"6.text": "a cat", "3.steps": 10},
+        runs=[{"6.text": "a dog"}, {}],
+        grid={"3.cfg": [5, 7], "3.steps": [20, 30]},
+        count=2,
+    )
+    runs = expand_runs(request)
+    assert len(runs) == 2 * 4 * 2
+    assert runs[0] == {"6.text": "a dog", "3.steps": 20, "3.cfg": 5}
+    assert runs[-1] == {"6.text": "a cat", "3.steps": 30, "3.cfg": 7}
+
+def test_expand_runs_rejects_oversized_batch():
+    with pytest.raises(ValueError):
+        expand_runs(BatchRunRequest(workflow_name="w", count=10000))
+    with pytest.raises(ValueError):
+        expand_runs(BatchRunRequest(workflow_name="w", grid={"3.cfg": []}))
+
+def test_run_batch_submits_every_run(client, mock_comfy, monkeypatch):
+    monkeypatch.setattr(config, "QUEUE_MAX_OUTSTANDING", 0)
+    prompt_ids = iter(["p1", "p2", "p3"])
+    route = mock_comfy.post("/prompt").mock(side_effect=lambda request: Response(200, json={"prompt_id": next(prompt_ids)}))
+
+    response = client.post("/run/batch", json={
+        "workflow_name": "basic_txt2img",
+        "grid": {"3.steps": [10, 20, 30]},
+        "seed_control": {"mode": "increment", "value": 100},
+    })
+    assert response.status_code == 200
+    batch = response.json()
+    assert sorted(batch["job_ids"]) == ["p1", "p2", "p3"]
+    assert batch["status"] == "queued"
+    assert batch["counts"] == {"queued": 3}
+
+    prompts = sorted(
+        (json.loads(call.request.content)["prompt"]["3"]["inputs"] for call in route.calls),
+        key=lambda inputs: inputs["steps"],
+    )
+    assert [(inputs["steps"], inputs["seed"]) for inputs in prompts] == [(10, 100), (20, 101), (30, 102)]
+
+def test_batch_status_counts_failed_submissions(client, mock_comfy):
+    responses = iter([Response(200, json={"prompt_id": "p1"}), Response(500)])
+    mock_comfy.post("/prompt").mock(side_effect=lambda request: next(responses))
+
+    batch = client.post("/run/batch", json={"workflow_name": "basic_txt2img", "count": 2}).json()
+    assert batch["counts"] == {"queued": 1, "failed": 1}
+
+    jobs = client.get(f"/batch/{batch['batch_id']}/jobs").json()
+    assert all(job["batch_id"] == batch["batch_id"] for job in jobs)
+
+    job_history.update_job_status("p1", "completed")
+    assert client.get(f"/batch/{batch['batch_id']}").json()["status"] == "partial"
+
+def test_unknown_batch(client):
+    assert client.get("/batch/missing").status_code == 404
@@ -0,0 +1,50 @@
+import json
+import time
+from fastapi.testclient import TestClient
+from bench.fake_comfy import FakeComfySettings, create_app
+from bench.load import percentile, compare
+
+PROMPT = {"3": {"class_type": "KSampler", "inputs": {}}, "9": {"class_type": "SaveImage", "inputs": {}}}
+
+def fake_comfy(**settings):
+    defaults = {"exec_time": 0.05, "steps": 2, "image_width": 32, "image_height": 32, "object_info_nodes": 20, "models": 5}
+    return TestClient(create_app(FakeComfySettings(**{**defaults, **settings})))
+
+def test_fake_comfy_runs_prompts_with_events():
+    with fake_comfy() as comfy, comfy.websocket_connect("/ws?clientId=bench") as ws:
+        assert json.loads(ws.receive_text())["type"] == "status"
+        prompt_id = comfy.post("/prompt", json={"prompt": PROMPT, "client_id": "bench"}).json()["prompt_id"]
+
+        events = [json.loads(ws.receive_text())["type"] for _ in range(7)]
+        assert events == ["execution_start", "executing", "progress", "progress", "executed", "execution_success", "executing"]
+
+        entry = comfy.get(f"/history/{prompt_id}").json()[prompt_id]
+        assert entry["status"]["status_str"] == "success"
+        image = entry["outputs"]["9"]["images"][0]
+        assert comfy.get("/view", params={"filename": image["filename"]}).headers["content-type"] == "image/png"
+        assert prompt_id in comfy.get("/history", params={"max_items": 1}).json()
+
+def test_fake_comfy_interrupt_and_delete():
+    with fake_comfy(exec_time=5) as comfy:
+        first = comfy.post("/prompt", json={"prompt": PROMPT}).json()["prompt_id"]
+        second = comfy.post("/prompt", json={"prompt": PROMPT}).json()["prompt_id"]
+        while not comfy.get("/queue").json()["queue_running"]:
+            time.sleep(0.01)
+        comfy.post("/queue", json={"delete": [second]})
+        comfy.post("/interrupt")
+        while first not in comfy.get("/history").json():
+            time.sleep(0.01)
+        assert comfy.get(f"/history/{first}").json()[first]["status"]["status_str"] == "error"
+        assert comfy.get("/queue").json() == {"queue_running": [], "queue_pending": []}
+
+def test_object_info_has_model_lists():
+    with fake_comfy() as comfy:
+        info = comfy.get("/object_info").json()
+        assert len(info) == 20
+        assert len(info["CheckpointLoaderSimple"]["input"]["required"]["ckpt_name"][0]) == 5
+
+def test_compare_flags_regressions():
+    assert percentile([3, 1, 2, 4], 0.5) in (2, 3)
+    baseline = [{"scenario": "run", "throughput": 100.0, "p99_ms": 50.0}]
+    assert compare([{"scenario": "run", "throughput": 95.0, "p99_ms": 55.0}], baseline, 0.2) == []
+    assert len(compare([{"scenario": "run", "throughput": 70.0, "p99_ms": 80.0}], baseline, 0.2)) == 2
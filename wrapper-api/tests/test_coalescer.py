@@ -0,0 +1,78 @@
+import asyncio
+from httpx import Response
+from config import config
+from coalescer import prompt_coalescer
+from job_history import job_history
+from job_runner import submit
+from job_tracker import job_tracker
+from models import JobResponse, JobOutput
+from workflow_loader import workflow_loader
+from workflow_templates import WorkflowTemplate
+
+RUN = {"workflow_name": "basic_txt2img", "inputs": {"3.steps": 12}, "seed_control": {"mode": "fixed", "value": 7}}
+HISTORY = {"outputs": {"9": {"images": [{"filename": "out.png", "subfolder": "", "type": "temp"}]}}, "status": {"status_str": "success"}}
+
+def test_identical_run_attaches_to_in_flight_prompt(client, mock_comfy):
+    route = mock_comfy.post("/prompt").mock(return_value=Response(200, json={"prompt_id": "p1"}))
+
+    first = client.post("/run", json=RUN).json()
+    second = client.post("/run", json=RUN).json()
+    assert route.call_count == 1
+    assert second["job_id"] != first["job_id"]
+    assert second["prompt_id"] == first["prompt_id"] == "p1"
+    assert second["status"] == "queued"
+
+    job_tracker.mark_running("p1")
+    job_tracker.complete_job("p1", HISTORY)
+    for job_id in (first["job_id"], second["job_id"]):
+        job = job_history.get_job(job_id)
+        assert job.status == "completed"
+        assert job.image_url == "/proxy/image?filename=out.png&subfolder=&type=temp"
+
+    # Once finished, identical runs are new work again (here: the result cache)
+    assert client.post("/run", json=RUN).json()["cached"] is True
+
+def test_random_seed_runs_coalesce_only_when_enabled(client, mock_comfy, monkeypatch):
+    monkeypatch.setattr(config, "QUEUE_MAX_OUTSTANDING", 0)
+    prompt_ids = iter(["p1", "p2", "p3"])
+    route = mock_comfy.post("/prompt").mock(side_effect=lambda request: Response(200, json={"prompt_id": next(prompt_ids)}))
+    run = {**RUN, "seed_control": {"mode": "random"}}
+
+    client.post("/run", json=run)
+    client.post("/run", json=run)
+    assert route.call_count == 2
+
+    monkeypatch.setattr(config, "COALESCE_RANDOM_SEEDS", True)
+    first = client.post("/run", json=run).json()
+    second = client.post("/run", json=run).json()
+    assert route.call_count == 3
+    assert second["prompt_id"] == first["prompt_id"]
+    assert second["resolved_seed"] == first["resolved_seed"]
+
+def test_concurrent_submissions_queue_once(mock_comfy):
+    route = mock_comfy.post("/prompt").mock(return_value=Response(200, json={"prompt_id": "p1"}))
+    template = WorkflowTemplate("basic_txt2img", workflow_loader.load_workflow("basic_txt2img"))
+
+    async def run():
+        return await asyncio.gather(*(submit(template, "basic_txt2img", {"3.steps": 9}, 5) for _ in range(3)))
+
+    jobs = asyncio.run(run())
+    assert route.call_count == 1
+    assert {job.prompt_id for job in jobs} == {"p1"}
+    assert len({job.job_id for job in jobs}) == 3
+    assert len(job_history.jobs_for_prompt("p1")) == 3
+
+def test_shared_job_of_a_finished_owner_gets_its_outputs(monkeypatch):
+    template = WorkflowTemplate("basic_txt2img", workflow_loader.load_workflow("basic_txt2img"))
+    output = JobOutput(filename="out.png", type="temp", node_id="9", kind="image", url="/proxy/image?filename=out.png&subfolder=&type=temp")
+    owner = JobResponse(job_id="p1", prompt_id="p1", workflow_name="basic_txt2img", status="completed", resolved_inputs={}, resolved_seed=5, image_url=output.url, outputs=[output])
+
+    async def finished_in_between(key, queue):
+        # The owner completed after the waiter attached but before its record was made
+        return owner, True
+
+    monkeypatch.setattr(prompt_coalescer, "submit", finished_in_between)
+    job = asyncio.run(submit(template, "basic_txt2img", {"3.steps": 9}, 5))
+    assert job.job_id != "p1"
+    assert job.status == "completed"
+    assert job_history.get_job(job.job_id).outputs == [output]
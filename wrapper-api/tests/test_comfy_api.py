@@ -0,0 +1,26 @@
+import asyncio
+from httpx import Response
+from comfy_api import ComfyAPI
+from config import config
+
+def test_timeout_for_uses_longest_prefix():
+    api = ComfyAPI()
+    assert api.timeout_for("/view?filename=a.png").read == config.HTTP_TIMEOUTS["/view"]
+    assert api.timeout_for("/history/abc").read == config.HTTP_TIMEOUTS["/history"]
+    assert api.timeout_for("/unknown").read == config.HTTP_TIMEOUTS[""]
+
+def test_requests_share_one_client(mock_comfy):
+    mock_comfy.get("/queue").mock(return_value=Response(200, json={"queue_running": [], "queue_pending": []}))
+    api = ComfyAPI()
+
+    async def run():
+        await api.start()
+        client = api.client
+        await api.get_queue()
+        await api.get_queue()
+        assert api.client is client
+        await api.close()
+
+    asyncio.run(run())
+    assert api.stats()["requests"] == 2
+    assert api._client is None
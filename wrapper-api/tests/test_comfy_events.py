@@ -0,0 +1,95 @@
+import asyncio
+import io
+import json
+import pytest
+from PIL import Image
+from config import config
+from httpx import Response
+from comfy_events import ComfyEventListener
+from job_history import job_history
+from models import JobResponse
+from previews import preview_relay
+
+@pytest.fixture
+def job():
+    job = JobResponse(job_id="prompt_1", workflow_name="basic_txt2img", status="queued", resolved_inputs={}, resolved_seed=1)
+    job_history.add_job(job)
+    return job
+
+def test_events_complete_job(job):
+    listener = ComfyEventListener()
+    messages = [
+        {"type": "execution_start", "data": {"prompt_id": "prompt_1"}},
+        {"type": "executing", "data": {"node": "3", "prompt_id": "prompt_1"}},
+        {"type": "executed", "data": {"node": "9", "prompt_id": "prompt_1", "output": {"images": [{"filename": "out.png", "subfolder": "", "type": "output"}]}}},
+        {"type": "execution_success", "data": {"prompt_id": "prompt_1"}},
+        {"type": "executing", "data": {"node": None, "prompt_id": "prompt_1"}},
+    ]
+
+    async def run():
+        await listener.handle_message(messages[0])
+        assert job.status == "running"
+        for message in messages[1:]:
+            await listener.handle_message(message)
+
+    asyncio.run(run())
+    assert job.status == "completed"
+    assert job.image_url == "/proxy/image?filename=out.png&subfolder=&type=output"
+
+def test_execution_error_fails_job(job):
+    listener = ComfyEventListener()
+    asyncio.run(listener.handle_message({
+        "type": "execution_error",
+        "data": {"prompt_id": "prompt_1", "exception_message": "CUDA out of memory"},
+    }))
+    assert job.status == "failed"
+    assert job.error == "CUDA out of memory"
+
+def test_cached_prompt_completes_from_history(job, mock_comfy):
+    history = {"prompt_1": {"outputs": {"9": {"images": [{"filename": "cached.png", "subfolder": "", "type": "output"}]}}, "status": {"status_str": "success"}}}
+    mock_comfy.get("/history/prompt_1").mock(return_value=Response(200, json=history))
+    listener = ComfyEventListener()
+
+    async def run():
+        await listener.handle_message({"type": "execution_cached", "data": {"prompt_id": "prompt_1", "nodes": ["3", "8", "9"]}})
+        await listener.handle_message({"type": "execution_success", "data": {"prompt_id": "prompt_1"}})
+
+    asyncio.run(run())
+    assert job.status == "completed"
+    assert "cached.png" in job.image_url
+
+def test_progress_events_update_job(job):
+    listener = ComfyEventListener()
+
+    async def run():
+        await listener.handle_message({"type": "executing", "data": {"node": "3", "prompt_id": "prompt_1"}})
+        await listener.handle_message({"type": "progress", "data": {"node": "3", "prompt_id": "prompt_1", "value": 5, "max": 20}})
+
+    asyncio.run(run())
+    assert job.status == "running"
+    assert (job.progress.node, job.progress.value, job.progress.max) == ("3", 5, 20)
+
+def test_preview_frames_relayed_to_subscriber(job):
+    listener = ComfyEventListener()
+    frame = io.BytesIO()
+    Image.new("RGB", (1024, 512), "red").save(frame, "JPEG")
+    metadata = json.dumps({"prompt_id": "prompt_1", "image_type": "image/jpeg"}).encode()
+    message = (4).to_bytes(4, "big") + len(metadata).to_bytes(4, "big") + metadata + frame.getvalue()
+
+    async def run():
+        frames = preview_relay.frames("prompt_1", fps=100)
+        first = asyncio.ensure_future(frames.__anext__())
+        while not preview_relay.stats()["subscribers"]:
+            await asyncio.sleep(0)
+        # Untagged frames belong to the executing prompt; none is known yet
+        listener.handle_binary((1).to_bytes(4, "big") + (1).to_bytes(4, "big") + frame.getvalue())
+        listener.handle_binary(message)
+        received = await first
+        preview_relay.finish("prompt_1")
+        rest = [chunk async for chunk in frames]
+        return received, rest
+
+    received, rest = asyncio.run(run())
+    with Image.open(io.BytesIO(received)) as img:
+        assert img.width == config.PREVIEW_MAX_WIDTH
+    assert rest == []
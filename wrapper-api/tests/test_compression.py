@@ -0,0 +1,49 @@
+import gzip
+from config import config
+from compression import negotiate, compress, brotli, response_cache
+from serialization import dumps, loads
+from workflow_loader import workflow_loader
+
+def test_negotiate():
+    assert negotiate("") is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("deflate, gzip;q=0.8") == "gzip"
+    assert negotiate("*") == ("br" if brotli else "gzip")
+    assert negotiate("br;q=0.5, gzip") == "gzip"
+
+def test_workflow_is_served_precompressed(client):
+    workflow = workflow_loader.load_workflow("basic_txt2img")
+    response = client.get("/workflow/basic_txt2img", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == workflow
+    etag = response.headers["etag"]
+
+    # Unchanged source: 304 without a body
+    response = client.get("/workflow/basic_txt2img", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Another representation of the same entry
+    response = client.get("/workflow/basic_txt2img", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert loads(response.content) == workflow
+    assert (response_cache.hits, response_cache.misses) == (2, 1)
+
+def test_dynamic_json_is_compressed_above_the_threshold(client, monkeypatch):
+    response = client.get("/stats/queue", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    monkeypatch.setattr(config, "COMPRESS_MIN_BYTES", 16)
+    response = client.get("/stats/queue", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json()["pending"] == 0
+    assert gzip.decompress(compress(b"x" * 100, "gzip")) == b"x" * 100
+
+def test_dumps_handles_what_orjson_cannot():
+    value = {"seed": 2 ** 70, 3: "int key", "text": "café"}
+    assert loads(dumps(value)) == {"seed": 2 ** 70, "3": "int key", "text": "café"}
+    assert dumps({"b": 1, "a": 2}, sort_keys=True) == b'{"a":2,"b":1}'
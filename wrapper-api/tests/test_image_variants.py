@@ -0,0 +1,53 @@
+import io
+from httpx import Response
+from PIL import Image
+from config import config
+from image_variants import image_variants
+from output_cache import output_cache
+
+def png_bytes(width=64, height=32):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "purple").save(buffer, "PNG")
+    return buffer.getvalue()
+
+def test_width_and_format_variant(client, mock_comfy):
+    mock_comfy.get("/view").mock(return_value=Response(200, content=png_bytes(), headers={"content-type": "image/png"}))
+
+    response = client.get("/proxy/image?filename=out.png&w=16&format=webp")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    image = Image.open(io.BytesIO(response.content))
+    assert image.size == (16, 8)
+
+def test_format_negotiated_from_accept(client, mock_comfy):
+    mock_comfy.get("/view").mock(return_value=Response(200, content=png_bytes(), headers={"content-type": "image/png"}))
+
+    response = client.get("/proxy/image?filename=out.png&w=16", headers={"Accept": "image/webp,image/*"})
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["vary"] == "Accept"
+
+    response = client.get("/proxy/image?filename=out.png&w=16", headers={"Accept": "image/*"})
+    assert response.headers["content-type"] == "image/jpeg"
+
+    response = client.get("/proxy/image?filename=out.png&w=16", headers={"Accept": "image/webp;q=0, image/*"})
+    assert response.headers["content-type"] == "image/jpeg"
+
+def test_variant_that_overflows_the_cache_is_still_served(client, mock_comfy, monkeypatch):
+    original = png_bytes()
+    # Room for the original only: storing the variant evicts both once it is read
+    monkeypatch.setattr(config, "OUTPUT_CACHE_MAX_BYTES", len(original) + 10)
+    mock_comfy.get("/view").mock(return_value=Response(200, content=original, headers={"content-type": "image/png"}))
+
+    response = client.get("/proxy/image?filename=out.png&w=16&format=jpeg")
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.content)).size == (16, 8)
+    assert output_cache.stats()["entries"] == 0
+
+def test_unsupported_format(client, mock_comfy):
+    mock_comfy.get("/view").mock(return_value=Response(200, content=png_bytes(), headers={"content-type": "image/png"}))
+
+    response = client.get("/proxy/image?filename=out.png&format=bmp")
+    assert response.status_code == 400
+
+def teardown_module():
+    image_variants.close()
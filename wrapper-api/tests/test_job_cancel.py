@@ -0,0 +1,98 @@
+import asyncio
+import json
+import pytest
+from httpx import Response
+from config import config
+from backends import backend_pool
+from comfy_events import ComfyEventListener
+from job_history import job_history
+from job_tracker import job_tracker
+from job_queue import job_queue
+
+RUN = {"workflow_name": "basic_txt2img", "inputs": {"3.steps": 12}, "seed_control": {"mode": "fixed", "value": 7}}
+
+def queue(running=(), pending=()):
+    return Response(200, json={
+        "queue_running": [[1, prompt_id, {}, {}, []] for prompt_id in running],
+        "queue_pending": [[2, prompt_id, {}, {}, []] for prompt_id in pending],
+    })
+
+@pytest.fixture
+def comfy(mock_comfy):
+    mock_comfy.post("/prompt").mock(side_effect=lambda request: Response(200, json={"prompt_id": json.loads(request.content)["prompt_id"]}))
+    return mock_comfy
+
+def test_pending_jobs_leave_the_local_queue(client, comfy, monkeypatch):
+    monkeypatch.setattr(config, "QUEUE_MAX_OUTSTANDING", 1)
+    client.post("/run", json={"workflow_name": "basic_txt2img"})
+    waiting = client.post("/run", json={"workflow_name": "basic_txt2img"}).json()
+    assert waiting["status"] == "pending"
+
+    assert client.post(f"/jobs/{waiting['job_id']}/stop").json()["status"] == "cancelled"
+    assert job_history.get_job(waiting["job_id"]).status == "cancelled"
+    # ComfyUI never saw it (its queue and interrupt APIs are not even mocked)
+    assert job_queue.pending == 0
+
+def test_queued_prompt_is_deleted_not_interrupted(client, comfy):
+    job = client.post("/run", json=RUN).json()
+    delete = comfy.post("/queue").mock(return_value=Response(200))
+    # Still pending behind someone else's prompt when ComfyUI is asked
+    comfy.get("/queue").mock(return_value=queue(running=["someone-else"], pending=[job["prompt_id"]]))
+
+    assert client.post(f"/jobs/{job['job_id']}/stop").status_code == 200
+    assert json.loads(delete.calls.last.request.content) == {"delete": [job["prompt_id"]]}
+    assert job_history.get_job(job["job_id"]).status == "cancelled"
+    assert backend_pool.primary.in_flight == 0
+    # Finished jobs stay as they are
+    assert client.post(f"/jobs/{job['job_id']}/stop").status_code == 409
+
+def test_interrupted_prompt_stays_cancelled(client, comfy):
+    job = client.post("/run", json=RUN).json()
+    listener = ComfyEventListener()
+    asyncio.run(listener.handle_message({"type": "execution_start", "data": {"prompt_id": job["prompt_id"]}}))
+    comfy.post("/queue").mock(return_value=Response(200))
+    comfy.get("/queue").mock(return_value=queue(running=[job["prompt_id"]]))
+    comfy.post("/interrupt").mock(return_value=Response(200))
+
+    assert client.post(f"/jobs/{job['job_id']}/stop").json()["status"] == "cancelled"
+    # What ComfyUI reports for the prompt afterwards does not change that
+    asyncio.run(listener.handle_message({"type": "execution_interrupted", "data": {"prompt_id": job["prompt_id"]}}))
+    assert job_history.get_job(job["job_id"]).status == "cancelled"
+    job_tracker.complete_job(job["prompt_id"], {"outputs": {}, "status": {"status_str": "success"}})
+    assert job_history.get_job(job["job_id"]).status == "cancelled"
+    assert backend_pool.primary.in_flight == 0
+
+def test_shared_prompt_runs_until_its_last_job_is_cancelled(client, comfy):
+    first = client.post("/run", json=RUN).json()
+    second = client.post("/run", json=RUN).json()
+    assert second["prompt_id"] == first["prompt_id"]
+
+    client.post(f"/jobs/{first['job_id']}/stop")
+    assert job_history.get_job(first["job_id"]).status == "cancelled"
+    assert job_history.get_job(second["job_id"]).status == "queued"
+
+    comfy.post("/queue").mock(return_value=Response(200))
+    comfy.get("/queue").mock(return_value=queue(running=[first["prompt_id"]]))
+    interrupt = comfy.post("/interrupt").mock(return_value=Response(200))
+    client.post(f"/jobs/{second['job_id']}/stop")
+    assert json.loads(interrupt.calls.last.request.content) == {"prompt_id": first["prompt_id"]}
+    assert job_history.get_job(second["job_id"]).status == "cancelled"
+    # The next identical run is queued again
+    assert client.post("/run", json=RUN).json()["prompt_id"] != first["prompt_id"]
+
+def test_cancel_batch_and_client(client, comfy, monkeypatch):
+    monkeypatch.setattr(config, "QUEUE_MAX_OUTSTANDING", 1)
+    batch = client.post("/run/batch", json={"workflow_name": "basic_txt2img", "count": 3, "client_id": "phone"}).json()
+    assert batch["counts"] == {"queued": 1, "pending": 2}
+    comfy.post("/queue").mock(return_value=Response(200))
+    comfy.get("/queue").mock(return_value=queue())
+
+    batch = client.post(f"/batch/{batch['batch_id']}/cancel").json()
+    assert batch["status"] == "cancelled"
+    assert job_queue.pending == 0
+
+    client.post("/run", json={"workflow_name": "basic_txt2img", "client_id": "phone"})
+    client.post("/run", json={"workflow_name": "basic_txt2img", "client_id": "tablet"})
+    cancelled = client.post("/jobs/cancel", params={"client_id": "phone"}).json()["cancelled"]
+    assert len(cancelled) == 1
+    assert [job.client_id for job in job_history.list_active()] == ["tablet"]
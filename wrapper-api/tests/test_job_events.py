@@ -0,0 +1,88 @@
+import asyncio
+import json
+from config import config
+from job_events import JobEventBus, job_events
+from job_history import job_history
+from models import JobResponse
+
+async def take(stream, count):
+    chunks = []
+    while len(chunks) < count:
+        chunk = await asyncio.wait_for(stream.__anext__(), timeout=1)
+        if not chunk.startswith(("retry:", ":")):
+            chunks.append(chunk)
+    return chunks
+
+async def subscribed(bus, count):
+    while len(bus._subscribers) < count:
+        await asyncio.sleep(0)
+
+def parse(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return fields["id"], fields["event"], json.loads(fields["data"])
+
+def test_stream_filters_by_client_and_job():
+    bus = JobEventBus()
+
+    async def run():
+        mine = bus.stream(client_id="phone")
+        one_job = bus.stream(job_ids=["b"])
+        first = asyncio.ensure_future(take(mine, 2))
+        second = asyncio.ensure_future(take(one_job, 1))
+        await subscribed(bus, 2)
+        bus.publish("a", "phone", '{"job_id": "a"}')
+        bus.publish("b", "tablet", '{"job_id": "b"}')
+        bus.publish("c", "phone", '{"job_id": "c"}')
+        return await first, await second
+
+    mine, one_job = asyncio.run(run())
+    assert [parse(chunk)[2]["job_id"] for chunk in mine] == ["a", "c"]
+    assert [parse(chunk)[2]["job_id"] for chunk in one_job] == ["b"]
+
+def test_resume_after_last_event_id():
+    bus = JobEventBus()
+    bus.publish("a", None, '{"n": 1}')
+    bus.publish("a", None, '{"n": 2}')
+    bus.publish("a", None, '{"n": 3}')
+
+    async def run(last_event_id):
+        return await take(bus.stream(last_event_id=last_event_id), 2)
+
+    chunks = asyncio.run(run(f"{bus.epoch}-1"))
+    assert [parse(chunk)[2]["n"] for chunk in chunks] == [2, 3]
+
+    # An id from a previous run cannot be resumed
+    stale = asyncio.run(take(bus.stream(last_event_id="1-2"), 1))
+    assert parse(stale[0])[1] == "resync"
+
+def test_progress_does_not_push_state_changes_out_of_the_buffer(monkeypatch):
+    monkeypatch.setattr(config, "EVENT_BUFFER_SIZE", 3)
+    bus = JobEventBus()
+    bus.publish("a", None, '{"status": "queued"}')
+    bus.publish("b", None, '{"status": "queued"}')
+    for step in range(10):
+        bus.publish("a", None, f'{{"step": {step}}}', event="progress")
+        bus.publish("b", None, f'{{"step": {step}}}', event="progress")
+    bus.publish("b", None, '{"status": "completed"}')
+
+    # State changes, then a's latest step; b's steps ended with its completion
+    chunks = asyncio.run(take(bus.stream(last_event_id=f"{bus.epoch}-0"), 4))
+    assert [parse(chunk)[2] for chunk in chunks] == [{"status": "queued"}, {"status": "queued"}, {"step": 9}, {"status": "completed"}]
+
+    for n in range(3):
+        bus.publish("c", None, f'{{"n": {n}}}')
+    assert parse(asyncio.run(take(bus.stream(last_event_id=f"{bus.epoch}-1"), 1))[0])[1] == "resync"
+
+def test_job_updates_are_published():
+    seen = []
+
+    async def run():
+        stream = job_events.stream(job_ids=["job_1"])
+        task = asyncio.ensure_future(take(stream, 2))
+        await subscribed(job_events, 1)
+        job_history.add_job(JobResponse(job_id="job_1", workflow_name="w", status="queued", resolved_inputs={}, resolved_seed=1))
+        job_history.update_job_status("job_1", "completed", image_url="/proxy/image?filename=a.png")
+        seen.extend(await task)
+
+    asyncio.run(run())
+    assert [parse(chunk)[2]["status"] for chunk in seen] == ["queued", "completed"]
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+from config import config
+from job_history import job_history
+from models import JobResponse
+
+def make_job(job_id, status="completed", workflow_name="basic_txt2img", **fields):
+    job = JobResponse(job_id=job_id, workflow_name=workflow_name, status=status, resolved_inputs={}, resolved_seed=1, **fields)
+    job_history.add_job(job)
+    return job
+
+def test_cursor_pagination_and_filters():
+    for i in range(5):
+        make_job(f"job_{i}", workflow_name="a" if i % 2 else "b")
+
+    page, cursor = job_history.list_jobs(limit=2)
+    assert [job.job_id for job in page] == ["job_4", "job_3"]
+    page, cursor = job_history.list_jobs(limit=2, cursor=cursor)
+    assert [job.job_id for job in page] == ["job_2", "job_1"]
+    page, cursor = job_history.list_jobs(limit=2, cursor=cursor)
+    assert [job.job_id for job in page] == ["job_0"]
+    assert cursor is None
+
+    page, _ = job_history.list_jobs(workflow_name="a")
+    assert [job.job_id for job in page] == ["job_3", "job_1"]
+
+def test_history_endpoint_returns_next_cursor(client):
+    for i in range(3):
+        make_job(f"job_{i}", status="queued" if i == 1 else "completed")
+
+    response = client.get("/history?limit=1")
+    assert [job["job_id"] for job in response.json()] == ["job_2"]
+    next_page = client.get(f"/history?limit=1&cursor={response.headers['x-next-cursor']}")
+    assert [job["job_id"] for job in next_page.json()] == ["job_1"]
+
+    assert [job["job_id"] for job in client.get("/history?status=queued").json()] == ["job_1"]
+
+def test_in_flight_jobs_survive_restart():
+    make_job("done")
+    make_job("pending", status="queued")
+    job_history.update_job_status("pending", "running")
+
+    job_history.close()
+    assert [job.job_id for job in job_history.list_in_flight()] == []
+    job_history.open()
+
+    assert [job.job_id for job in job_history.list_in_flight()] == ["pending"]
+    assert job_history.get_job("pending").status == "running"
+    assert job_history.get_job("done").status == "completed"
+
+def test_retention_keeps_in_flight_jobs(monkeypatch):
+    monkeypatch.setattr(config, "JOB_RETENTION_MAX", 2)
+    make_job("old", created_at=datetime.now(timezone.utc) - timedelta(days=400))
+    make_job("old_running", status="running")
+    for i in range(3):
+        make_job(f"new_{i}")
+
+    job_history.prune()
+    page, _ = job_history.list_jobs()
+    assert [job.job_id for job in page] == ["new_2", "new_1", "old_running"]
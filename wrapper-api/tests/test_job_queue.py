@@ -0,0 +1,89 @@
+import asyncio
+import json
+import pytest
+from httpx import Response
+from config import config
+from job_history import job_history
+from job_queue import job_queue
+from job_runner import submit
+from job_tracker import job_tracker
+from workflow_loader import workflow_loader
+from workflow_templates import WorkflowTemplate
+
+HISTORY = {"outputs": {}, "status": {"status_str": "success"}}
+
+@pytest.fixture
+def template():
+    return WorkflowTemplate("basic_txt2img", workflow_loader.load_workflow("basic_txt2img"))
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    monkeypatch.setattr(config, "QUEUE_MAX_OUTSTANDING", 1)
+
+def echo_prompt_id(request):
+    # Like ComfyUI: keep the prompt id the client asked for
+    return Response(200, json={"prompt_id": json.loads(request.content)["prompt_id"]})
+
+def test_freed_slots_go_by_priority_then_round_robin(template, mock_comfy, one_slot):
+    route = mock_comfy.post("/prompt").mock(side_effect=echo_prompt_id)
+
+    async def scenario():
+        jobs = {}
+        for name, client, priority in (("a1", "a", 0), ("a2", "a", 0), ("a3", "a", 0), ("b1", "b", 0), ("c1", "c", 5)):
+            jobs[name] = await submit(template, "basic_txt2img", {}, 1, "random", client_id=client, priority=priority)
+        assert [job.status for job in jobs.values()] == ["queued", "pending", "pending", "pending", "pending"]
+        assert job_queue.counts() == {0: 3, 5: 1}
+
+        order = {job.prompt_id: name for name, job in jobs.items()}
+        sent = ["a1"]
+        while len(sent) < len(jobs):
+            job_tracker.complete_job(jobs[sent[-1]].prompt_id, HISTORY)
+            await job_queue.drain()
+            sent.append(order[json.loads(route.calls.last.request.content)["prompt_id"]])
+        return jobs, sent
+
+    jobs, sent = asyncio.run(scenario())
+    assert sent == ["a1", "c1", "a2", "b1", "a3"]
+    # Jobs keep the id they were given while waiting
+    assert job_history.get_job(jobs["a3"].job_id).status == "queued"
+    assert jobs["a3"].backend == "default"
+
+def test_full_queue_answers_429(client, mock_comfy, one_slot, monkeypatch):
+    monkeypatch.setattr(config, "QUEUE_MAX_PENDING_PER_CLIENT", 1)
+    route = mock_comfy.post("/prompt").mock(side_effect=echo_prompt_id)
+    run = {"workflow_name": "basic_txt2img", "client_id": "a"}
+
+    assert client.post("/run", json=run).json()["status"] == "queued"
+    assert client.post("/run", json=run).json()["status"] == "pending"
+    response = client.post("/run", json=run)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.post("/run/batch", json={**run, "count": 2}).status_code == 429
+
+    # Other clients still get their share
+    assert client.post("/run", json={**run, "client_id": "b"}).json()["status"] == "pending"
+    assert route.call_count == 1
+    assert client.get("/stats/queue").json()["rejected"] == 2
+    # Priorities are bounded, so nobody can jump the whole queue
+    assert client.post("/run", json={**run, "client_id": "c", "priority": 1000}).status_code == 422
+
+def test_queued_job_follows_the_id_comfyui_picked_or_fails(template, mock_comfy, one_slot):
+    responses = iter([Response(200, json={"prompt_id": "p1"}), Response(200, json={"prompt_id": "own-id"}), Response(500)])
+    mock_comfy.post("/prompt").mock(side_effect=lambda request: next(responses))
+
+    async def scenario():
+        first = await submit(template, "basic_txt2img", {}, 1, "random")
+        second = await submit(template, "basic_txt2img", {}, 2, "random")
+        third = await submit(template, "basic_txt2img", {}, 3, "random")
+        job_tracker.complete_job("p1", HISTORY)
+        await job_queue.drain()
+        job_tracker.complete_job("own-id", HISTORY)
+        await job_queue.drain()
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first.job_id == "p1"
+    assert second.prompt_id == "own-id" and second.job_id != "own-id"
+    assert job_history.get_job(second.job_id).status == "completed"
+    assert third.status == "failed"
+    assert third.error.startswith("ComfyUI error")
@@ -0,0 +1,41 @@
+import asyncio
+from httpx import Response
+from job_reconciler import JobReconciler
+from job_history import job_history
+from models import JobResponse
+
+def make_job(job_id):
+    job = JobResponse(job_id=job_id, workflow_name="basic_txt2img", status="queued", resolved_inputs={}, resolved_seed=1)
+    job_history.add_job(job)
+    return job
+
+def test_reconcile_updates_all_jobs_with_two_requests(mock_comfy):
+    done, running, gone = make_job("done_1"), make_job("running_1"), make_job("gone_1")
+    queue_route = mock_comfy.get("/queue").mock(return_value=Response(200, json={
+        "queue_running": [[1, "running_1", {}, {}, []]],
+        "queue_pending": [],
+    }))
+    history_route = mock_comfy.get("/history").mock(return_value=Response(200, json={
+        "done_1": {"outputs": {"9": {"images": [{"filename": "a.png", "subfolder": "", "type": "output"}]}}, "status": {"status_str": "success"}},
+    }))
+    mock_comfy.get("/history/gone_1").mock(return_value=Response(200, json={}))
+
+    reconciler = JobReconciler()
+    asyncio.run(reconciler.reconcile())
+    assert done.status == "completed"
+    assert running.status == "running"
+    assert gone.status == "queued"
+    assert queue_route.call_count == 1
+    assert history_route.call_count == 1
+
+    # Still missing on the next sweep: reported instead of tracked forever
+    asyncio.run(reconciler.reconcile())
+    assert gone.status == "failed"
+
+def test_interval_adapts_to_push_and_load():
+    reconciler = JobReconciler()
+    reconciler.interval = 1.0
+    assert reconciler._next_interval(in_flight=3) == 1.0
+    assert reconciler._next_interval(in_flight=0) == 2.0
+    reconciler.push_available = True
+    assert reconciler._next_interval(in_flight=3) == 2.0
@@ -1,6 +1,13 @@
 import pytest
+import asyncio
+import io
 import json
 from httpx import Response
+from PIL import Image
+from job_history import job_history
+from models import JobResponse
+from previews import preview_relay
+from routers.jobs import stream_job_preview
 
 def test_start_job(client, mock_comfy):
     # Mock ComfyUI /prompt endpoint
@@ -13,12 +20,18 @@ def test_start_job(client, mock_comfy):
     assert data["status"] == "queued"
 
 def test_stop_job(client, mock_comfy):
-    # Mock ComfyUI /interrupt endpoint
-    mock_comfy.post("/interrupt").mock(return_value=Response(200))
+    # A prompt queued outside the wrapper is interrupted only while it is running
+    mock_comfy.get("/queue").mock(return_value=Response(200, json={"queue_running": [[1, "job_123", {}, {}, []]], "queue_pending": []}))
+    mock_comfy.post("/queue").mock(return_value=Response(200))
+    interrupt = mock_comfy.post("/interrupt").mock(return_value=Response(200))
     
     response = client.post("/jobs/job_123/stop")
     assert response.status_code == 200
-    assert response.json()["status"] == "stopped"
+    assert response.json()["status"] == "cancelled"
+    assert json.loads(interrupt.calls.last.request.content) == {"prompt_id": "job_123"}
+
+    assert client.post("/jobs/job_456/stop").status_code == 404
+    assert interrupt.call_count == 1
 
 def test_get_job_status_completed(client, mock_comfy):
     # Mock ComfyUI /history/{id} endpoint
@@ -70,3 +83,25 @@ def test_list_job_images(client, mock_comfy):
     assert response.status_code == 200
     data = response.json()
     assert "image_1.png" in data
+
+def test_preview_of_coalesced_job_follows_its_prompt():
+    # Attached to the in-flight prompt of another job
+    job_history.add_job(JobResponse(job_id="shared", prompt_id="p1", workflow_name="basic_txt2img", status="running", resolved_inputs={}, resolved_seed=1))
+    frame = io.BytesIO()
+    Image.new("RGB", (64, 64), "red").save(frame, "JPEG")
+
+    async def run():
+        response = await stream_job_preview("shared", fps=100)
+        body = response.body_iterator
+        first = asyncio.ensure_future(body.__anext__())
+        while not preview_relay.stats()["subscribers"]:
+            await asyncio.sleep(0)
+        preview_relay.publish("p1", frame.getvalue())
+        received = await first
+        preview_relay.finish("p1")
+        # The stream ends with the prompt
+        return received, [chunk async for chunk in body]
+
+    received, rest = asyncio.run(run())
+    assert received.startswith(b"--") and b"image/jpeg" in received
+    assert rest == []
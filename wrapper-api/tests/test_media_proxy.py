@@ -0,0 +1,35 @@
+from httpx import Response
+
+def test_proxy_forwards_content_type(client, mock_comfy):
+    mock_comfy.get("/view").mock(return_value=Response(200, content=b"RIFFwebp", headers={"content-type": "image/webp"}))
+
+    response = client.get("/proxy/image?filename=anim.webp")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.content == b"RIFFwebp"
+
+def test_proxy_forwards_range(client, mock_comfy):
+    route = mock_comfy.get("/view").mock(return_value=Response(206, content=b"0123", headers={
+        "content-type": "video/mp4",
+        "content-range": "bytes 0-3/100",
+        "content-length": "4",
+    }))
+
+    response = client.get("/proxy/image?filename=clip.mp4&type=temp", headers={"Range": "bytes=0-3"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 0-3/100"
+    assert route.calls.last.request.headers["range"] == "bytes=0-3"
+
+def test_proxy_head(client, mock_comfy):
+    mock_comfy.head("/view").mock(return_value=Response(200, headers={"content-type": "image/png", "content-length": "2048"}))
+
+    response = client.head("/jobs/job_123/images/out.png")
+    assert response.status_code == 200
+    assert response.headers["content-length"] == "2048"
+    assert response.content == b""
+
+def test_proxy_not_found(client, mock_comfy):
+    mock_comfy.get("/view").mock(return_value=Response(404))
+
+    response = client.get("/proxy/image?filename=missing.png")
+    assert response.status_code == 404
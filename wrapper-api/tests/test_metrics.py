@@ -0,0 +1,60 @@
+from httpx import Response
+from job_tracker import job_tracker
+from metrics import MetricsRegistry, upstream_endpoint, http_request_duration, upstream_request_duration, job_queue_duration, job_execution_duration
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+
+    text = registry.render()
+    assert 'comfyui_remote_test_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'comfyui_remote_test_seconds_bucket{route="/a",le="1.0"} 3' in text
+    assert 'comfyui_remote_test_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'comfyui_remote_test_seconds_count{route="/a"} 4' in text
+    assert 'comfyui_remote_test_seconds_sum{route="/a"} 3.65' in text
+
+def test_upstream_endpoint():
+    assert upstream_endpoint("/history/abc") == "/history"
+    assert upstream_endpoint("/view?filename=x.png") == "/view"
+    assert upstream_endpoint("/object_info") == "/object_info"
+
+def test_route_and_upstream_latency(client, mock_comfy):
+    mock_comfy.get("/history/job_123").mock(return_value=Response(200, json={}))
+    mock_comfy.get("/queue").mock(return_value=Response(200, json={"queue_running": [], "queue_pending": []}))
+    routes = http_request_duration.count("GET", "/jobs/{job_id}", "200")
+    upstream = upstream_request_duration.count("default", "/history", "200")
+
+    client.get("/jobs/job_123")
+    client.get("/no/such/path")
+
+    # Route templates, not raw paths
+    assert http_request_duration.count("GET", "/jobs/{job_id}", "200") == routes + 1
+    assert http_request_duration.count("GET", "unmatched", "404") >= 1
+    assert upstream_request_duration.count("default", "/history", "200") == upstream + 1
+
+def test_job_transition_times(client, mock_comfy):
+    mock_comfy.post("/prompt").mock(return_value=Response(200, json={"prompt_id": "p1"}))
+    queued = job_queue_duration.count("default")
+    executed = job_execution_duration.count("default", "completed")
+
+    client.post("/run", json={"workflow_name": "basic_txt2img", "inputs": {}})
+    job_tracker.mark_running("p1")
+    job_tracker.complete_job("p1", {"outputs": {}, "status": {"status_str": "success"}})
+
+    assert job_queue_duration.count("default") == queued + 1
+    assert job_execution_duration.count("default", "completed") == executed + 1
+
+def test_metrics_endpoint(client, mock_comfy):
+    mock_comfy.post("/prompt").mock(return_value=Response(200, json={"prompt_id": "p1"}))
+    client.post("/run", json={"workflow_name": "basic_txt2img", "inputs": {}})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'comfyui_remote_jobs_in_flight{backend="default",status="queued"} 1' in text
+    assert 'comfyui_remote_cache_hit_ratio{cache="workflow"}' in text
+    assert 'comfyui_remote_reconciler_running{backend="default"} 0' in text
+    assert "# TYPE comfyui_remote_http_request_duration_seconds histogram" in text
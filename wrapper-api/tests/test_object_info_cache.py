@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from httpx import Response
+from object_info_cache import ObjectInfoCache, build_model_index, object_info_cache
+
+OBJECT_INFO = {
+    "CheckpointLoaderSimple": {"input": {"required": {"ckpt_name": [["sdxl/base.safetensors", "SD15/v1-5.ckpt"]]}}},
+    "LoraLoader": {"input": {"required": {
+        "model": ["MODEL"],
+        "lora_name": [["detail.safetensors", "Anime.safetensors", "add_detail_v2.safetensors"]],
+        "strength_model": ["FLOAT", {"default": 1.0}],
+    }}},
+    "VAELoader": {"input": {"required": {"vae_name": ["COMBO", {"options": ["sdxl_vae.safetensors"]}]}}},
+    "UpscaleModelLoader": {"input": {"required": {"model_name": [["4x-UltraSharp.pth"]]}}},
+}
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    object_info_cache.__init__()
+
+def test_build_model_index():
+    index = build_model_index(OBJECT_INFO)
+    assert index["checkpoints"] == ["SD15/v1-5.ckpt", "sdxl/base.safetensors"]
+    assert index["loras"] == ["add_detail_v2.safetensors", "Anime.safetensors", "detail.safetensors"]
+    assert index["vae"] == ["sdxl_vae.safetensors"]
+    assert index["upscalers"] == ["4x-UltraSharp.pth"]
+
+def test_concurrent_misses_share_one_fetch(mock_comfy):
+    route = mock_comfy.get("/object_info").mock(return_value=Response(200, json=OBJECT_INFO))
+    mock_comfy.get("/embeddings").mock(return_value=Response(200, json=["easynegative"]))
+    cache = ObjectInfoCache()
+
+    async def run():
+        await asyncio.gather(*(cache.get() for _ in range(10)))
+        await cache.get()
+
+    asyncio.run(run())
+    assert route.call_count == 1
+    assert cache.hits == 1
+
+def test_models_endpoint_prefix_and_pagination(client, mock_comfy):
+    mock_comfy.get("/object_info").mock(return_value=Response(200, json=OBJECT_INFO))
+    mock_comfy.get("/embeddings").mock(return_value=Response(200, json=["easynegative"]))
+
+    response = client.get("/models/loras?prefix=A&limit=1")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert data["items"] == ["add_detail_v2.safetensors"]
+
+    data = client.get("/models/loras?prefix=a&offset=1").json()
+    assert data["items"] == ["Anime.safetensors"]
+
+    assert client.get("/models/embeddings").json()["items"] == ["easynegative"]
+    assert client.get("/models/unknown").status_code == 404
+
+def test_checkpoints_endpoint_uses_index(client, mock_comfy):
+    mock_comfy.get("/object_info").mock(return_value=Response(200, json=OBJECT_INFO))
+    mock_comfy.get("/embeddings").mock(return_value=Response(200, json=[]))
+
+    response = client.get("/checkpoints")
+    assert response.json() == {"checkpoints": ["SD15/v1-5.ckpt", "sdxl/base.safetensors"]}
@@ -0,0 +1,70 @@
+import asyncio
+import io
+import json
+import zipfile
+from httpx import Response
+from config import config
+from job_history import job_history
+from job_tracker import job_tracker
+from models import JobResponse, JobOutput
+
+def view(request):
+    filename = request.url.params["filename"]
+    if filename == "missing.png":
+        return Response(404)
+    return Response(200, content=f"{request.url.params['subfolder']}/{filename}".encode())
+
+def complete(prompt_id, outputs):
+    async def run():
+        job_tracker.complete_job(prompt_id, {"outputs": outputs, "status": {"status_str": "success"}})
+    asyncio.run(run())
+
+def test_completed_job_lists_every_output():
+    job = JobResponse(job_id="p1", workflow_name="basic_txt2img", status="running", resolved_inputs={}, resolved_seed=1)
+    job_history.add_job(job)
+    complete("p1", {
+        "12": {"gifs": [{"filename": "clip.mp4", "subfolder": "", "type": "temp", "format": "video/h264-mp4"}]},
+        "9": {"images": [{"filename": "a.png", "subfolder": "", "type": "temp"}, {"filename": "b.png", "subfolder": "x", "type": "temp"}], "animated": [False]},
+        "13": {"text": ["not a file"], "audio": [{"filename": "voice.flac", "subfolder": "", "type": "temp"}]},
+    })
+
+    job = job_history.get_job("p1")
+    assert [(output.node_id, output.filename, output.kind) for output in job.outputs] == [
+        ("12", "clip.mp4", "video"), ("9", "a.png", "image"), ("9", "b.png", "image"), ("13", "voice.flac", "audio"),
+    ]
+    assert job.outputs[2].url == "/proxy/image?filename=b.png&subfolder=x&type=temp"
+    # The first image, not the first file
+    assert job.image_url == job.outputs[1].url
+
+def test_job_outputs_stream_as_zip(client, mock_comfy):
+    mock_comfy.get("/view").mock(side_effect=view)
+    outputs = [
+        JobOutput(filename=name, subfolder=subfolder, type="temp", node_id="9", kind="image", url="")
+        for name, subfolder in (("a.png", ""), ("b.png", "sub"), ("missing.png", ""))
+    ]
+    job_history.add_job(JobResponse(job_id="p1", workflow_name="basic_txt2img", status="completed", resolved_inputs={}, resolved_seed=1, outputs=outputs))
+
+    response = client.get("/jobs/p1/outputs.zip")
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["a.png", "sub/b.png", "MISSING.txt"]
+    assert archive.read("sub/b.png") == b"sub/b.png"
+    assert archive.read("MISSING.txt") == b"missing.png\n"
+
+    job_history.add_job(JobResponse(job_id="p2", workflow_name="basic_txt2img", status="failed", resolved_inputs={}, resolved_seed=1))
+    assert client.get("/jobs/p2/outputs.zip").status_code == 409
+    assert client.get("/jobs/nope/outputs.zip").status_code == 404
+
+def test_batch_outputs_in_one_zip(client, mock_comfy, monkeypatch):
+    monkeypatch.setattr(config, "QUEUE_MAX_OUTSTANDING", 0)
+    mock_comfy.post("/prompt").mock(side_effect=lambda request: Response(200, json={"prompt_id": json.loads(request.content)["prompt_id"]}))
+    mock_comfy.get("/view").mock(side_effect=view)
+    batch = client.post("/run/batch", json={"workflow_name": "basic_txt2img", "count": 2}).json()
+    assert client.get(f"/batch/{batch['batch_id']}/outputs.zip").status_code == 409
+
+    for job_id in batch["job_ids"]:
+        complete(job_id, {"9": {"images": [{"filename": "out.png", "subfolder": "", "type": "temp"}]}})
+    response = client.get(f"/batch/{batch['batch_id']}/outputs.zip")
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == [f"{job_id}/out.png" for job_id in batch["job_ids"]]
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from httpx import Response
+from config import config
+from output_cache import OutputCache, parse_range, cache_key
+
+PNG = b"\x89PNG" + b"x" * 96
+
+def test_second_fetch_served_from_cache(client, mock_comfy):
+    route = mock_comfy.get("/view").mock(return_value=Response(200, content=PNG, headers={"content-type": "image/png"}))
+
+    first = client.get("/proxy/image?filename=out.png")
+    second = client.get("/proxy/image?filename=out.png")
+    assert first.content == second.content == PNG
+    assert route.call_count == 1
+    assert second.headers["etag"] == first.headers["etag"]
+    assert "max-age" in second.headers["cache-control"]
+
+def test_if_none_match_returns_304(client, mock_comfy):
+    mock_comfy.get("/view").mock(return_value=Response(200, content=PNG, headers={"content-type": "image/png"}))
+    etag = client.get("/proxy/image?filename=out.png").headers["etag"]
+
+    response = client.get("/proxy/image?filename=out.png", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+def test_range_on_cached_file(client, mock_comfy):
+    mock_comfy.get("/view").mock(return_value=Response(200, content=PNG, headers={"content-type": "image/png"}))
+    client.get("/proxy/image?filename=out.png")
+
+    response = client.get("/proxy/image?filename=out.png", headers={"Range": "bytes=0-3"})
+    assert response.status_code == 206
+    assert response.content == b"\x89PNG"
+    assert response.headers["content-range"] == f"bytes 0-3/{len(PNG)}"
+
+def test_lru_eviction(mock_comfy, monkeypatch):
+    monkeypatch.setattr(config, "OUTPUT_CACHE_MAX_BYTES", 250)
+    mock_comfy.get("/view", params={"filename": "a.png"}).mock(return_value=Response(200, content=b"a" * 100))
+    mock_comfy.get("/view", params={"filename": "b.png"}).mock(return_value=Response(200, content=b"b" * 100))
+    mock_comfy.get("/view", params={"filename": "c.png"}).mock(return_value=Response(200, content=b"c" * 100))
+    cache = OutputCache()
+
+    async def run():
+        await cache.get_or_fetch("a.png", "", "output")
+        await cache.get_or_fetch("b.png", "", "output")
+        await cache.get_or_fetch("a.png", "", "output")  # a is now most recent
+        await cache.get_or_fetch("c.png", "", "output")
+
+    asyncio.run(run())
+    assert cache.lookup(cache_key("a.png", "", "output")) is not None
+    assert cache.lookup(cache_key("b.png", "", "output")) is None
+    assert cache.stats()["bytes"] == 200
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=200-300", 100)
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from httpx import Response
+from object_info_cache import object_info_cache
+from prompt_validation import prompt_validator, PromptValidationError
+from workflow_loader import workflow_loader
+from workflow_templates import WorkflowTemplate
+
+OBJECT_INFO = {
+    "KSampler": {"input": {"required": {
+        "model": ["MODEL"],
+        "seed": ["INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}],
+        "steps": ["INT", {"default": 20, "min": 1, "max": 10000}],
+        "cfg": ["FLOAT", {"default": 8.0, "min": 0.0, "max": 100.0}],
+        "sampler_name": [["euler", "dpmpp_2m"]],
+        "scheduler": [["normal", "karras"]],
+        "positive": ["CONDITIONING"],
+        "negative": ["CONDITIONING"],
+        "latent_image": ["LATENT"],
+        "denoise": ["FLOAT", {"default": 1.0, "min": 0.0, "max": 1.0}],
+    }}},
+    "CheckpointLoaderSimple": {"input": {"required": {"ckpt_name": [["SDXL 1.0/sd_xl_base_1.0.safetensors"]]}}},
+    "EmptyLatentImage": {"input": {"required": {"width": ["INT", {"min": 16, "max": 16384}], "height": ["INT", {"min": 16, "max": 16384}], "batch_size": ["INT", {"min": 1, "max": 4096}]}}},
+    "CLIPTextEncode": {"input": {"required": {"text": ["STRING", {"multiline": True}], "clip": ["CLIP"]}}},
+    "VAEDecode": {"input": {"required": {"samples": ["LATENT"], "vae": ["VAE"]}}},
+    "SaveImage": {"input": {"required": {"images": ["IMAGE"], "filename_prefix": ["STRING", {}]}}},
+}
+
+@pytest.fixture
+def template():
+    return WorkflowTemplate("basic_txt2img", workflow_loader.load_workflow("basic_txt2img"))
+
+@pytest.fixture
+def object_info(mock_comfy):
+    route = mock_comfy.get("/object_info").mock(return_value=Response(200, json=OBJECT_INFO))
+    mock_comfy.get("/embeddings").mock(return_value=Response(200, json=[]))
+    asyncio.run(object_info_cache.get())
+    return route
+
+def validate(template, inputs, seed=None):
+    asyncio.run(prompt_validator.validate(template, inputs, seed))
+
+def test_valid_inputs_pass(template, object_info):
+    validate(template, {"3.steps": 30, "3.cfg": 6.5, "3.sampler_name": "dpmpp_2m", "6.text": "a cat", "99.x": 1}, seed=42)
+
+def test_invalid_inputs_are_reported_per_input(template, object_info):
+    with pytest.raises(PromptValidationError) as error:
+        validate(template, {
+            "3.steps": 0,
+            "3.cfg": "high",
+            "3.sampler_name": "nope",
+            "4.ckpt_name": "missing.safetensors",
+            "3.model": 5,
+            "3.stepz": 20,
+        })
+    assert {e["input"]: e["message"] for e in error.value.errors} == {
+        "3.steps": "0 is smaller than the minimum of 1",
+        "3.cfg": "'high' is not a valid FLOAT",
+        "3.sampler_name": "'nope' is not one of 'euler', 'dpmpp_2m'",
+        "4.ckpt_name": "'missing.safetensors' is not one of 'SDXL 1.0/sd_xl_base_1.0.safetensors'",
+        "3.model": "expects a MODEL connection, not a value",
+        "3.stepz": "KSampler has no input 'stepz'",
+    }
+
+def test_template_problems_are_reported(template, object_info):
+    # The workflow's own checkpoint is gone and a node type is unknown
+    info = {**OBJECT_INFO, "CheckpointLoaderSimple": {"input": {"required": {"ckpt_name": [["other.safetensors"]]}}}}
+    del info["SaveImage"]
+    object_info.mock(return_value=Response(200, json=info))
+    asyncio.run(object_info_cache.refresh())
+
+    with pytest.raises(PromptValidationError) as error:
+        validate(template, {})
+    assert [e["input"] for e in error.value.errors] == ["4.ckpt_name", "9"]
+    # Overriding the bad value fixes that input
+    with pytest.raises(PromptValidationError) as error:
+        validate(template, {"4.ckpt_name": "other.safetensors"})
+    assert [e["input"] for e in error.value.errors] == ["9"]
+
+def test_stale_object_info_is_refreshed_before_rejecting(template, object_info):
+    object_info_cache.fetched_at = 0
+    info = {**OBJECT_INFO, "CheckpointLoaderSimple": {"input": {"required": {"ckpt_name": [["SDXL 1.0/sd_xl_base_1.0.safetensors", "new.safetensors"]]}}}}
+    object_info.mock(return_value=Response(200, json=info))
+
+    validate(template, {"4.ckpt_name": "new.safetensors"})
+    assert object_info.call_count == 2
+
+def test_run_rejects_invalid_inputs_without_queueing(client, mock_comfy, object_info):
+    route = mock_comfy.post("/prompt").mock(return_value=Response(200, json={"prompt_id": "p1"}))
+
+    response = client.post("/run", json={"workflow_name": "basic_txt2img", "inputs": {"3.steps": 100000}})
+    assert response.status_code == 400
+    assert response.json()["detail"] == [{"input": "3.steps", "message": "100000 is bigger than the maximum of 10000"}]
+
+    response = client.post("/run/batch", json={"workflow_name": "basic_txt2img", "grid": {"3.steps": [20, -1]}})
+    assert response.status_code == 400
+    assert response.json()["detail"][0]["input"] == "3.steps"
+    assert route.call_count == 0
+
+    assert client.post("/run", json={"workflow_name": "basic_txt2img", "inputs": {"3.steps": 25}}).status_code == 200
+    assert route.call_count == 1
+
+def test_nothing_is_checked_without_object_info(template):
+    validate(template, {"3.steps": -5})
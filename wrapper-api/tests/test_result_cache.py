@@ -0,0 +1,40 @@
+from httpx import Response
+from config import config
+from job_tracker import job_tracker
+from result_cache import prompt_hash
+
+RUN = {"workflow_name": "basic_txt2img", "inputs": {"3.steps": 12}, "seed_control": {"mode": "fixed", "value": 7}}
+HISTORY = {"outputs": {"9": {"images": [{"filename": "out.png", "subfolder": "", "type": "temp"}]}}, "status": {"status_str": "success"}}
+
+def test_prompt_hash_is_canonical():
+    assert prompt_hash('{"b": 1, "a": {"y": 2, "x": 3}}') == prompt_hash('{"a":{"x":3,"y":2},"b":1}')
+    assert prompt_hash('{"a": 1}') != prompt_hash('{"a": 2}')
+
+def test_identical_fixed_seed_run_served_from_cache(client, mock_comfy, monkeypatch):
+    monkeypatch.setattr(config, "QUEUE_MAX_OUTSTANDING", 0)
+    route = mock_comfy.post("/prompt").mock(return_value=Response(200, json={"prompt_id": "p1"}))
+
+    first = client.post("/run", json=RUN).json()
+    job_tracker.complete_job("p1", HISTORY)
+
+    second = client.post("/run", json=RUN).json()
+    assert route.call_count == 1
+    assert second["cached"] is True
+    assert second["status"] == "completed"
+    assert second["job_id"] != first["job_id"]
+    assert second["prompt_id"] == "p1"
+    assert second["image_url"] == "/proxy/image?filename=out.png&subfolder=&type=temp"
+
+    # Different inputs, random seeds and opting out all reach ComfyUI
+    client.post("/run", json={**RUN, "inputs": {"3.steps": 13}})
+    client.post("/run", json={**RUN, "seed_control": {"mode": "random"}})
+    client.post("/run", json={**RUN, "no_cache": True})
+    assert route.call_count == 4
+
+def test_failed_run_is_not_cached(client, mock_comfy):
+    route = mock_comfy.post("/prompt").mock(return_value=Response(200, json={"prompt_id": "p1"}))
+    client.post("/run", json=RUN)
+    job_tracker.fail_job("p1", "CUDA out of memory")
+
+    assert client.post("/run", json=RUN).json()["cached"] is False
+    assert route.call_count == 2
@@ -0,0 +1,40 @@
+import hashlib
+from httpx import Response
+from config import config
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+
+def upload(client, data, filename="photo.png"):
+    return client.post("/upload/image", files={"image": (filename, data, "application/octet-stream")}, data={"note": "x"})
+
+def test_upload_is_forwarded_once_per_content(client, mock_comfy):
+    sent = mock_comfy.post("/upload/image").mock(return_value=Response(200, json={"name": "ignored", "type": "input"}))
+    mock_comfy.head("/view").mock(return_value=Response(200))
+    digest = hashlib.sha256(PNG).hexdigest()
+
+    first = upload(client, PNG).json()
+    assert first == {"name": f"upload-{digest[:16]}.png", "sha256": digest, "size": len(PNG), "deduplicated": False}
+    assert PNG in sent.calls.last.request.read()
+
+    # Same bytes under another file name: nothing is sent again
+    assert upload(client, PNG, "copy.png").json() == {**first, "deduplicated": True}
+    assert sent.call_count == 1
+    assert client.get(f"/upload/image/{digest}").json()["name"] == first["name"]
+    assert client.get(f"/upload/image/{'0' * 64}").status_code == 404
+    assert client.get("/stats/uploads").json()["entries"] == 1
+
+def test_upload_is_sent_again_when_comfyui_lost_it(client, mock_comfy):
+    sent = mock_comfy.post("/upload/image").mock(return_value=Response(200, json={}))
+    mock_comfy.head("/view").mock(return_value=Response(404))
+    upload(client, PNG)
+    assert upload(client, PNG).json()["deduplicated"] is False
+    assert sent.call_count == 2
+
+def test_rejected_uploads(client, monkeypatch):
+    assert upload(client, b"plain text").status_code == 415
+    assert client.post("/upload/image", content=PNG, headers={"content-type": "image/png"}).status_code == 415
+    assert client.post("/upload/image", files={"other": ("a.png", PNG)}).status_code == 400
+    truncated = b'--b\r\nContent-Disposition: form-data; name="image"; filename="a.png"\r\n\r\n' + PNG
+    assert client.post("/upload/image", content=truncated, headers={"content-type": "multipart/form-data; boundary=b"}).status_code == 400
+    monkeypatch.setattr(config, "UPLOAD_MAX_BYTES", 1024)
+    assert upload(client, PNG).status_code == 413
@@ -0,0 +1,136 @@
+import json
+import pytest
+from httpx import Response
+from config import config
+from object_info_cache import object_info_cache
+from workflow_converter import convert_ui_workflow, WorkflowConversionError
+from workflow_loader import workflow_loader
+from workflow_templates import workflow_templates
+
+OBJECT_INFO = {
+    "CheckpointLoaderSimple": {"input": {"required": {"ckpt_name": [["sd15.safetensors", "sdxl.safetensors"]]}}, "display_name": "Load Checkpoint"},
+    "CLIPTextEncode": {"input": {"required": {"text": ["STRING", {"multiline": True}], "clip": ["CLIP"]}}},
+    "EmptyLatentImage": {"input": {"required": {"width": ["INT", {}], "height": ["INT", {}], "batch_size": ["INT", {}]}}},
+    "KSampler": {"input": {"required": {
+        "model": ["MODEL"],
+        "seed": ["INT", {"control_after_generate": True}],
+        "steps": ["INT", {}],
+        "cfg": ["FLOAT", {}],
+        "sampler_name": [["euler", "dpmpp_2m"]],
+        "scheduler": [["normal", "karras"]],
+        "positive": ["CONDITIONING"],
+        "negative": ["CONDITIONING"],
+        "latent_image": ["LATENT"],
+        "denoise": ["FLOAT", {}],
+    }}},
+    "LoraLoader": {"input": {"required": {"model": ["MODEL"], "clip": ["CLIP"], "lora_name": [["detail.safetensors"]], "strength_model": ["FLOAT", {}], "strength_clip": ["FLOAT", {}]}}},
+    "SaveImage": {"input": {"required": {"images": ["IMAGE"], "filename_prefix": ["STRING", {}]}}},
+    "VAEDecode": {"input": {"required": {"samples": ["LATENT"], "vae": ["VAE"]}}},
+}
+
+def slot(name, type, link, widget=False):
+    entry = {"name": name, "type": type, "link": link}
+    if widget:
+        entry["widget"] = {"name": name}
+    return entry
+
+# Checkpoint -> (bypassed LoRA) -> reroute -> KSampler; steps come from a primitive node
+UI_WORKFLOW = {
+    "nodes": [
+        {"id": 4, "type": "CheckpointLoaderSimple", "order": 0, "mode": 0, "inputs": [], "widgets_values": ["sdxl.safetensors"]},
+        {"id": 10, "type": "LoraLoader", "order": 1, "mode": 4, "inputs": [slot("model", "MODEL", 1), slot("clip", "CLIP", 2)], "widgets_values": ["detail.safetensors", 1, 1]},
+        {"id": 11, "type": "Reroute", "order": 2, "mode": 0, "inputs": [slot("", "*", 3)]},
+        {"id": 12, "type": "PrimitiveNode", "order": 3, "mode": 0, "inputs": [], "widgets_values": [28, "fixed"]},
+        {"id": 6, "type": "CLIPTextEncode", "order": 4, "mode": 0, "title": "Positive", "inputs": [slot("clip", "CLIP", 5)], "widgets_values": ["a lighthouse"]},
+        {"id": 5, "type": "EmptyLatentImage", "order": 5, "mode": 0, "inputs": [], "widgets_values": [1024, 1024, 1]},
+        {"id": 3, "type": "KSampler", "order": 6, "mode": 0, "inputs": [
+            slot("model", "MODEL", 4), slot("positive", "CONDITIONING", 6), slot("negative", "CONDITIONING", 6),
+            slot("latent_image", "LATENT", 7), slot("steps", "INT", 8, widget=True),
+        ], "widgets_values": [156680208700286, "randomize", 20, 7.5, "euler", "karras", 1]},
+        {"id": 13, "type": "Note", "order": 7, "mode": 0, "inputs": [], "widgets_values": ["remember to ..."]},
+        {"id": 14, "type": "SaveImage", "order": 8, "mode": 2, "inputs": [slot("images", "IMAGE", None)], "widgets_values": ["muted"]},
+    ],
+    "links": [
+        [1, 4, 0, 10, 0, "MODEL"],
+        [2, 4, 1, 10, 1, "CLIP"],
+        [3, 10, 0, 11, 0, "MODEL"],
+        [4, 11, 0, 3, 0, "MODEL"],
+        [5, 4, 1, 6, 0, "CLIP"],
+        [6, 6, 0, 3, 1, "CONDITIONING"],
+        [7, 5, 0, 3, 3, "LATENT"],
+        [8, 12, 0, 3, 4, "INT"],
+    ],
+}
+
+def test_convert_ui_workflow():
+    prompt = convert_ui_workflow(UI_WORKFLOW, OBJECT_INFO)
+
+    # Frontend-only, bypassed and muted nodes are not sent
+    assert list(prompt) == ["4", "6", "5", "3"]
+    assert prompt["4"] == {"inputs": {"ckpt_name": "sdxl.safetensors"}, "class_type": "CheckpointLoaderSimple", "_meta": {"title": "Load Checkpoint"}}
+    assert prompt["6"]["inputs"] == {"text": "a lighthouse", "clip": ["4", 1]}
+    assert prompt["6"]["_meta"]["title"] == "Positive"
+    assert prompt["5"]["inputs"] == {"width": 1024, "height": 1024, "batch_size": 1}
+    # The seed's "control after generate" value is skipped, the reroute and the
+    # bypassed LoRA resolve to the checkpoint, and the primitive's value is inlined
+    assert prompt["3"]["inputs"] == {
+        "seed": 156680208700286,
+        "steps": 28,
+        "cfg": 7.5,
+        "sampler_name": "euler",
+        "scheduler": "karras",
+        "denoise": 1,
+        "model": ["4", 0],
+        "positive": ["6", 0],
+        "negative": ["6", 0],
+        "latent_image": ["5", 0],
+    }
+
+def test_unknown_node_type_is_reported():
+    workflow = {"nodes": [{"id": 1, "type": "SomeCustomNode", "inputs": [], "widgets_values": []}], "links": []}
+    with pytest.raises(WorkflowConversionError, match="SomeCustomNode"):
+        convert_ui_workflow(workflow, OBJECT_INFO)
+
+@pytest.fixture
+def ui_workflow_dir(tmp_path):
+    config.WORKFLOW_DIR = tmp_path
+    (tmp_path / "ui_graph.json").write_text(json.dumps(UI_WORKFLOW))
+    workflow_loader.__init__()
+    workflow_templates.__init__()
+    object_info_cache.__init__()
+    yield tmp_path
+    workflow_loader.__init__()
+    workflow_templates.__init__()
+    object_info_cache.__init__()
+
+def test_run_ui_format_workflow_converts_once(client, mock_comfy, ui_workflow_dir):
+    object_info = mock_comfy.get("/object_info").mock(return_value=Response(200, json=OBJECT_INFO))
+    mock_comfy.get("/embeddings").mock(return_value=Response(200, json=[]))
+    prompt = mock_comfy.post("/prompt").mock(return_value=Response(200, json={"prompt_id": "p1"}))
+
+    for steps in (30, 31):
+        response = client.post("/run", json={"workflow_name": "ui_graph", "inputs": {"3.cfg": 5, "3.steps": steps}, "seed_control": {"mode": "fixed", "value": 7}, "no_cache": True})
+        assert response.status_code == 200
+    submitted = json.loads(prompt.calls.last.request.content)["prompt"]
+    assert submitted["3"]["inputs"]["seed"] == 7
+    assert submitted["3"]["inputs"]["cfg"] == 5
+    assert submitted["3"]["inputs"]["steps"] == 31
+    assert submitted["3"]["inputs"]["model"] == ["4", 0]
+    assert object_info.call_count == 1
+    assert workflow_templates.misses == 1
+
+    introspection = client.get("/workflow/ui_graph/introspect").json()
+    assert any(node["id"] == "3" for node in introspection["nodes"])
+
+    # New node definitions convert again
+    OBJECT_INFO_V2 = {**OBJECT_INFO, "Extra": {"input": {}}}
+    object_info.mock(return_value=Response(200, json=OBJECT_INFO_V2))
+    client.post("/models/refresh")
+    client.post("/run", json={"workflow_name": "ui_graph", "inputs": {}, "no_cache": True})
+    assert workflow_templates.misses == 2
+
+def test_ui_format_without_object_info_is_rejected(client, mock_comfy, ui_workflow_dir):
+    mock_comfy.get("/object_info").mock(return_value=Response(500))
+    response = client.post("/run", json={"workflow_name": "ui_graph", "inputs": {}})
+    assert response.status_code == 400
+    assert "UI format" in response.json()["detail"]
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import os
+import sys
+import pytest
+from config import config
+from workflow_loader import WorkflowLoader
+
+@pytest.fixture
+def loader(tmp_path):
+    config.WORKFLOW_DIR = tmp_path
+    (tmp_path / "a.json").write_text(json.dumps({"name": "A", "nodes": {}}))
+    return WorkflowLoader()
+
+def test_load_is_cached_until_file_changes(loader, tmp_path):
+    first = loader.load_workflow("a")
+    assert loader.load_workflow("a.json") is first
+
+    path = tmp_path / "a.json"
+    path.write_text(json.dumps({"name": "A2", "nodes": {"1": {}}}))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert loader.load_workflow("a")["name"] == "A2"
+
+def test_catalog_picks_up_new_and_removed_files(loader, tmp_path):
+    assert [w.file_name for w in loader.list_workflows()] == ["a.json"]
+    (tmp_path / "b.json").write_text(json.dumps({"description": "second"}))
+    catalog = {w["id"]: w for w in loader.list_catalog()}
+    assert catalog["b.json"]["name"] == "b"
+    assert catalog["b.json"]["description"] == "second"
+
+    (tmp_path / "a.json").unlink()
+    assert loader.load_workflow("a") is None
+
+def test_path_traversal_rejected(loader, tmp_path):
+    (tmp_path.parent / "outside.json").write_text("{}")
+    assert loader.load_workflow("../outside") is None
+
+def test_concurrent_loads_share_a_small_cache(loader, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "WORKFLOW_CACHE_SIZE", 1)
+    names = [f"w{i}" for i in range(8)]
+    for name in names:
+        (tmp_path / f"{name}.json").write_text(json.dumps({"name": name, "nodes": {}}))
+
+    async def run():
+        # Every load evicts another's graph, from several worker threads at once
+        loads = [loader.load_workflow_async(names[i % len(names)]) for i in range(400)]
+        return await asyncio.gather(*loads, loader.list_catalog_async())
+
+    interval = sys.getswitchinterval()
+    # Switch threads as often as possible, so they interleave inside cache updates
+    sys.setswitchinterval(1e-6)
+    try:
+        *graphs, catalog = asyncio.run(run())
+    finally:
+        sys.setswitchinterval(interval)
+    assert [graph["name"] for graph in graphs] == [names[i % len(names)] for i in range(400)]
+    assert len(catalog) == len(names) + 1
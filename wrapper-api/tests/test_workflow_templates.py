@@ -0,0 +1,43 @@
+import json
+from httpx import Response
+from workflow_loader import workflow_loader
+from workflow_templates import WorkflowTemplate
+
+def load_template():
+    return WorkflowTemplate("basic_txt2img", workflow_loader.load_workflow("basic_txt2img"))
+
+def test_template_slots_and_seeds():
+    template = load_template()
+    assert template.slots["3.steps"] == "int"
+    assert template.slots["6.text"] == "string"
+    assert template.seed_slots == [("3", "seed")]
+    assert json.loads(template.base_json) == template.nodes
+
+def test_render_patches_without_mutating_source():
+    template = load_template()
+    prompt_json, resolved = template.render({"3.steps": 30, "6.text": "a cat", "99.steps": 1, "nodot": 1}, 42)
+    prompt = json.loads(prompt_json)
+
+    assert resolved == {"3.steps": 30, "6.text": "a cat"}
+    assert prompt["3"]["inputs"]["steps"] == 30
+    assert prompt["3"]["inputs"]["seed"] == 42
+    assert prompt["6"]["inputs"]["text"] == "a cat"
+    assert prompt["3"]["inputs"]["model"] == ["4", 0]
+    assert template.nodes["3"]["inputs"]["steps"] == 20
+    assert template.nodes["6"]["inputs"]["text"] != "a cat"
+
+def test_run_submits_rendered_prompt(client, mock_comfy):
+    route = mock_comfy.post("/prompt").mock(return_value=Response(200, json={"prompt_id": "p1"}))
+
+    response = client.post("/run", json={
+        "workflow_name": "basic_txt2img",
+        "inputs": {"3.steps": 12},
+        "seed_control": {"mode": "fixed", "value": 7},
+    })
+    assert response.status_code == 200
+    assert response.json()["resolved_inputs"] == {"3.steps": 12}
+
+    payload = json.loads(route.calls.last.request.content)
+    assert payload["prompt"]["3"]["inputs"]["steps"] == 12
+    assert payload["prompt"]["3"]["inputs"]["seed"] == 7
+    assert "name" not in payload["prompt"]
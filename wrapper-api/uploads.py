@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, BinaryIO, List, Optional, Tuple
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from config import config
+from backends import backend_pool
+from object_info_cache import object_info_cache
+
+# Uploads kept in memory before spilling to a temporary file
+SPOOL_BYTES = 1024 ** 2
+# Hashes remembered (oldest use forgotten first)
+MAX_ENTRIES = 10000
+# Longest header of one multipart part
+MAX_PART_HEADER = 16 * 1024
+
+# Leading bytes -> (extension, content type) of the formats ComfyUI's LoadImage opens
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", ".png", "image/png"),
+    (b"\xff\xd8\xff", ".jpg", "image/jpeg"),
+    (b"GIF87a", ".gif", "image/gif"),
+    (b"GIF89a", ".gif", "image/gif"),
+    (b"BM", ".bmp", "image/bmp"),
+    (b"II*\x00", ".tiff", "image/tiff"),
+    (b"MM\x00*", ".tiff", "image/tiff"),
+)
+
+class UploadError(Exception):
+    """An upload the wrapper will not forward; ``status_code`` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        self.status_code = status_code
+        super().__init__(message)
+
+def sniff_image(head: bytes) -> Optional[Tuple[str, str]]:
+    """(extension, content type) of an image from its first bytes; None if not a supported image."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp", "image/webp"
+    for signature, extension, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension, content_type
+    return None
+
+class ImageUploads:
+    """Content-addressed input image uploads to ComfyUI.
+
+    An upload is hashed (sha256) while it streams in and stored in every
+    backend's input directory under a name derived from that hash, so the
+    name can be used as a LoadImage value on whichever backend runs the job.
+    The hash -> name map means a photo that was uploaded before is not sent to
+    ComfyUI again, and a client that knows the hash can skip sending it at all.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Read the hash -> name map (called from the app lifespan)."""
+        if not config.UPLOAD_INDEX_PATH.exists():
+            return
+        try:
+            with open(config.UPLOAD_INDEX_PATH, "r") as f:
+                self._entries = OrderedDict(json.load(f))
+        except Exception as e:
+            print(f"Ignoring unreadable upload index: {e}")
+
+    def save(self):
+        config.UPLOAD_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = config.UPLOAD_INDEX_PATH.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, config.UPLOAD_INDEX_PATH)
+
+    def _response(self, digest: str, entry: Dict[str, Any], deduplicated: bool) -> Dict[str, Any]:
+        return {"name": entry["name"], "sha256": digest, "size": entry["size"], "deduplicated": deduplicated}
+
+    async def _missing(self, entry: Dict[str, Any]) -> List[Any]:
+        """Backends that do not have the upload (never sent, or deleted from their input directory)."""
+        backends = [backend for backend in backend_pool.backends if backend.name in entry["backends"]]
+        present = await asyncio.gather(*(backend.api.has_input(entry["name"]) for backend in backends), return_exceptions=True)
+        kept = [backend.name for backend, found in zip(backends, present) if found is True]
+        if len(kept) != len(entry["backends"]):
+            entry["backends"] = kept
+        return [backend for backend in backend_pool.backends if backend.name not in kept]
+
+    async def lookup(self, digest: str) -> Optional[Dict[str, Any]]:
+        """The upload with this sha256 if every backend still has it."""
+        entry = self._entries.get(digest.lower())
+        if entry is None or await self._missing(entry):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(digest.lower())
+        return self._response(digest.lower(), entry, True)
+
+    async def upload(self, content_type: str, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Receive a multipart upload (``image`` field) and store it on the backends that lack it."""
+        media_type, options = parse_options_header(content_type or "")
+        if media_type.lower() != b"multipart/form-data" or not options.get(b"boundary"):
+            raise UploadError("Expected multipart/form-data with an image field", 415)
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as file:
+            digest, size, (extension, image_type) = await self._receive(options[b"boundary"], chunks, file)
+
+            entry = self._entries.get(digest)
+            if entry is None:
+                entry = {"name": f"upload-{digest[:16]}{extension}", "size": size, "backends": [], "uploaded_at": time.time()}
+            missing = await self._missing(entry)
+            if not missing:
+                self.hits += 1
+                self._entries.move_to_end(digest)
+                return self._response(digest, entry, True)
+
+            self.misses += 1
+            for backend in missing:
+                file.seek(0)
+                await backend.api.upload_image(entry["name"], file, image_type)
+                entry["backends"].append(backend.name)
+
+        self._entries[digest] = entry
+        self._entries.move_to_end(digest)
+        while len(self._entries) > MAX_ENTRIES:
+            self._entries.popitem(last=False)
+        self.save()
+        # LoadImage's option list changed; validation refreshes it before rejecting the name
+        object_info_cache.expire()
+        return self._response(digest, entry, False)
+
+    async def _receive(self, boundary: bytes, chunks: AsyncIterator[bytes], file: BinaryIO) -> Tuple[str, int, Tuple[str, str]]:
+        """Hash and spool the ``image`` part; returns (sha256, size, (extension, content type))."""
+        sha256 = hashlib.sha256()
+        state = {"size": 0, "head": b"", "found": False, "reading": False, "ended": False}
+        headers: Dict[bytes, bytes] = {}
+        field = bytearray()
+        value = bytearray()
+
+        def on_part_begin():
+            headers.clear()
+
+        def on_header_field(data, start, end):
+            field.extend(data[start:end])
+            if len(field) > MAX_PART_HEADER:
+                raise UploadError("Multipart part headers are too long")
+
+        def on_header_value(data, start, end):
+            value.extend(data[start:end])
+            if len(value) > MAX_PART_HEADER:
+                raise UploadError("Multipart part headers are too long")
+
+        def on_header_end():
+            headers[bytes(field).lower()] = bytes(value)
+            field.clear()
+            value.clear()
+
+        def on_headers_finished():
+            disposition, params = parse_options_header(headers.get(b"content-disposition", b""))
+            # The first file sent as ``image``; other fields are ignored
+            state["reading"] = (disposition == b"form-data" and params.get(b"name") == b"image"
+                                and b"filename" in params and not state["found"])
+            state["found"] = state["found"] or state["reading"]
+
+        def on_part_data(data, start, end):
+            if not state["reading"]:
+                return
+            chunk = data[start:end]
+            state["size"] += len(chunk)
+            if state["size"] > config.UPLOAD_MAX_BYTES:
+                raise UploadError(f"Upload is larger than {config.UPLOAD_MAX_BYTES} bytes", 413)
+            if len(state["head"]) < 16:
+                state["head"] += chunk[:16]
+            sha256.update(chunk)
+            file.write(chunk)
+
+        def on_part_end():
+            state["reading"] = False
+
+        def on_end():
+            state["ended"] = True
+
+        parser = MultipartParser(boundary, {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+            "on_end": on_end,
+        })
+        try:
+            async for chunk in chunks:
+                parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadError(f"Malformed multipart body: {e}")
+        parser.finalize()
+        if not state["ended"]:
+            raise UploadError("Multipart body ended early")
+        if not state["found"]:
+            raise UploadError("No image field in the upload")
+
+        kind = sniff_image(state["head"])
+        if kind is None:
+            raise UploadError("Not a PNG, JPEG, WebP, GIF, BMP or TIFF image", 415)
+        return sha256.hexdigest(), state["size"], kind
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+image_uploads = ImageUploads()
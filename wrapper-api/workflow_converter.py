@@ -0,0 +1,150 @@
+from typing import Dict, Any, List, Optional, Tuple
+
+# Input types ComfyUI's frontend renders as widgets (their values live in widgets_values)
+WIDGET_TYPES = ("INT", "FLOAT", "STRING", "BOOLEAN", "COMBO")
+# Values of the "control after generate" widget the frontend adds after seed inputs
+SEED_CONTROL_VALUES = ("fixed", "increment", "decrement", "randomize")
+# Frontend-only nodes: never sent to ComfyUI
+REROUTE = "Reroute"
+PRIMITIVE = "PrimitiveNode"
+VIRTUAL_NODES = (REROUTE, PRIMITIVE, "Note", "MarkdownNote")
+# Node modes: muted nodes are dropped, bypassed ones pass an input through
+MODE_MUTED = 2
+MODE_BYPASS = 4
+
+class WorkflowConversionError(ValueError):
+    """A UI-format workflow that cannot be turned into an API prompt."""
+
+def is_ui_format(workflow: Any) -> bool:
+    return isinstance(workflow, dict) and isinstance(workflow.get("nodes"), list)
+
+def _is_widget(spec: Any) -> bool:
+    if not isinstance(spec, list) or not spec:
+        return False
+    # Legacy combos are a bare option list
+    return isinstance(spec[0], list) or spec[0] in WIDGET_TYPES
+
+def _has_seed_control(name: str, spec: Any) -> bool:
+    options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+    return bool(options.get("control_after_generate")) or (spec[0] == "INT" and name in ("seed", "noise_seed"))
+
+def widget_inputs(node_info: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """(name, spec) of a node type's widget inputs, in the order the frontend lays them out."""
+    inputs = node_info.get("input", {}) if isinstance(node_info, dict) else {}
+    order = node_info.get("input_order") if isinstance(node_info, dict) else None
+    widgets = []
+    for section in ("required", "optional"):
+        specs = inputs.get(section) or {}
+        names = (order or {}).get(section) or list(specs)
+        for name in names:
+            spec = specs.get(name)
+            if _is_widget(spec):
+                widgets.append((name, spec))
+    return widgets
+
+class WorkflowConverter:
+    """Converts one UI-format graph (as saved by ComfyUI's editor) to API format.
+
+    Widget values are matched to input names by the widget order in
+    object_info, links become ``[source_id, slot]`` edges, and frontend-only
+    nodes are resolved away: reroutes are followed, primitive nodes inline
+    their value, bypassed nodes pass through an input of the same type.
+    """
+
+    def __init__(self, workflow: Dict[str, Any], object_info: Dict[str, Any]):
+        self.object_info = object_info
+        self.nodes = {node["id"]: node for node in workflow["nodes"] if isinstance(node, dict) and "id" in node}
+        # link id -> (origin node id, origin slot, type)
+        self.links: Dict[Any, Tuple[Any, int, Any]] = {}
+        for link in workflow.get("links") or []:
+            if isinstance(link, list) and len(link) >= 5:
+                self.links[link[0]] = (link[1], link[2], link[5] if len(link) > 5 else None)
+            elif isinstance(link, dict):
+                self.links[link["id"]] = (link["origin_id"], link["origin_slot"], link.get("type"))
+
+    def convert(self) -> Dict[str, Any]:
+        prompt = {}
+        ordered = sorted(self.nodes.values(), key=lambda node: (node.get("order", 0), node["id"]))
+        for node in ordered:
+            node_type = node.get("type")
+            if node_type in VIRTUAL_NODES or node.get("mode") in (MODE_MUTED, MODE_BYPASS):
+                continue
+            node_info = self.object_info.get(node_type)
+            if node_info is None:
+                raise WorkflowConversionError(f"Node {node['id']} has unknown type {node_type!r} (missing custom node?)")
+            prompt[str(node["id"])] = {
+                "inputs": self._inputs(node, node_info),
+                "class_type": node_type,
+                "_meta": {"title": node.get("title") or node_info.get("display_name") or node_type},
+            }
+        return prompt
+
+    def _inputs(self, node: Dict[str, Any], node_info: Dict[str, Any]) -> Dict[str, Any]:
+        inputs: Dict[str, Any] = {}
+        values = node.get("widgets_values")
+        if isinstance(values, dict):
+            # Some custom nodes save widgets by name
+            names = {name for name, _ in widget_inputs(node_info)}
+            inputs.update({name: value for name, value in values.items() if name in names})
+        elif isinstance(values, list):
+            position = 0
+            for name, spec in widget_inputs(node_info):
+                if position >= len(values):
+                    break
+                inputs[name] = values[position]
+                position += 1
+                if _has_seed_control(name, spec) and position < len(values) and values[position] in SEED_CONTROL_VALUES:
+                    position += 1
+
+        # Links override widget values (widgets converted to inputs keep a stale value)
+        for slot in node.get("inputs") or []:
+            if not isinstance(slot, dict) or slot.get("link") is None:
+                continue
+            source = self._resolve(slot["link"])
+            if source is None:
+                inputs.pop(slot.get("name"), None)
+            elif source[0] == "value":
+                inputs[slot["name"]] = source[1]
+            else:
+                inputs[slot["name"]] = [str(source[1]), source[2]]
+        return inputs
+
+    def _resolve(self, link_id: Any, seen: Optional[set] = None) -> Optional[tuple]:
+        """("link", node id, slot) or ("value", value) feeding ``link_id``; None if nothing does."""
+        link = self.links.get(link_id)
+        if link is None:
+            return None
+        if seen is None:
+            seen = set()
+        if link_id in seen:
+            raise WorkflowConversionError(f"Link {link_id} is part of a reroute cycle")
+        seen.add(link_id)
+
+        origin_id, origin_slot, link_type = link
+        origin = self.nodes.get(origin_id)
+        if origin is None:
+            return None
+        origin_type = origin.get("type")
+        if origin_type == PRIMITIVE:
+            values = origin.get("widgets_values") or []
+            return ("value", values[0]) if values else None
+        if origin_type == REROUTE:
+            slots = origin.get("inputs") or []
+            return self._resolve(slots[0].get("link"), seen) if slots else None
+        if origin.get("mode") == MODE_MUTED:
+            return None
+        if origin.get("mode") == MODE_BYPASS:
+            return self._bypass(origin, origin_slot, link_type, seen)
+        return ("link", origin_id, origin_slot)
+
+    def _bypass(self, node: Dict[str, Any], slot: int, link_type: Any, seen: set) -> Optional[tuple]:
+        # Like the frontend: the input at the same slot if its type matches, else the first that does
+        candidates = [inp for inp in node.get("inputs") or [] if isinstance(inp, dict) and inp.get("link") is not None and inp.get("type") == link_type]
+        inputs = node.get("inputs") or []
+        if slot < len(inputs) and inputs[slot] in candidates:
+            candidates.insert(0, inputs[slot])
+        return self._resolve(candidates[0]["link"], seen) if candidates else None
+
+def convert_ui_workflow(workflow: Dict[str, Any], object_info: Dict[str, Any]) -> Dict[str, Any]:
+    """API-format prompt (node id -> {inputs, class_type, _meta}) of a UI-format workflow."""
+    return WorkflowConverter(workflow, object_info).convert()
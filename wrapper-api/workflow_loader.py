@@ -1,52 +1,222 @@
+import asyncio
 import json
 import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime
 from config import config
 from models import WorkflowSummary
 
+try:
+    import watchfiles
+except ImportError:  # Fall back to polling the directory
+    watchfiles = None
+
 class WorkflowLoader:
+    """In-memory catalog of the workflow directory.
+
+    Each file's stat signature (mtime, size) and metadata are kept in memory and
+    only re-read when the signature changes. While the watcher runs, the catalog
+    is trusted until it reports a change; otherwise every call re-stats.
+    Parsed graphs are shared and must be treated as read-only by callers.
+    Calls run on worker threads (the *_async variants), so the parsed-graph
+    LRU and catalog swaps are guarded by a lock; file reads happen outside it.
+    """
+
     def __init__(self):
-        pass
+        self._catalog: Dict[str, Dict[str, Any]] = {}
+        self._catalog_dir: Optional[Path] = None
+        self._parsed: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stale = True
+        self._watch_task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
 
     def _get_workflow_dir(self) -> Path:
         if not config.WORKFLOW_DIR:
              raise FileNotFoundError("Workflow directory not configured")
         return config.WORKFLOW_DIR
 
+    @property
+    def watching(self) -> bool:
+        return self._watch_task is not None and not self._watch_task.done()
+
+    def _signature(self, stat: os.stat_result) -> tuple:
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _scan(self, workflow_dir: Path):
+        """Re-stat the directory, keeping metadata of unchanged files."""
+        with self._lock:
+            self._stale = False
+            catalog = {}
+            if not workflow_dir.exists():
+                self._catalog = catalog
+                self._catalog_dir = workflow_dir
+                return
+            for entry in os.scandir(workflow_dir):
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                previous = self._catalog.get(entry.name)
+                if previous and previous["signature"] == self._signature(stat) and self._catalog_dir == workflow_dir:
+                    catalog[entry.name] = previous
+                else:
+                    catalog[entry.name] = {
+                        "path": Path(entry.path),
+                        "signature": self._signature(stat),
+                        "summary": WorkflowSummary(
+                            file_name=entry.name,
+                            name=entry.name[:-5],
+                            last_modified=datetime.fromtimestamp(stat.st_mtime)
+                        ),
+                        "meta": None,
+                    }
+            self._catalog = catalog
+            self._catalog_dir = workflow_dir
+
+    def _ensure_catalog(self) -> Path:
+        workflow_dir = self._get_workflow_dir()
+        if self._stale or not self.watching or self._catalog_dir != workflow_dir:
+            self._scan(workflow_dir)
+        return workflow_dir
+
     def list_workflows(self) -> List[WorkflowSummary]:
         workflow_dir = self._get_workflow_dir()
         if not workflow_dir.exists():
             return []
 
+        self._ensure_catalog()
+        return [entry["summary"] for entry in list(self._catalog.values())]
+
+    def list_catalog(self) -> List[Dict[str, Any]]:
+        """id/name/description of every workflow, parsing each file only once per change."""
+        workflow_dir = self._get_workflow_dir()
+        if not workflow_dir.exists():
+            return []
+
+        self._ensure_catalog()
         workflows = []
-        for file_path in workflow_dir.glob("*.json"):
-            stat = file_path.stat()
-            workflows.append(WorkflowSummary(
-                file_name=file_path.name,
-                name=file_path.stem,
-                last_modified=datetime.fromtimestamp(stat.st_mtime)
-            ))
+        # A snapshot; a concurrent scan swaps in a new dict rather than changing this one
+        for file_name, entry in list(self._catalog.items()):
+            if entry["meta"] is None:
+                data = self._read(entry)
+                if not isinstance(data, dict):
+                    continue  # Skip invalid JSON files
+                entry["meta"] = {
+                    "id": file_name,
+                    "name": data.get("name", file_name[:-5]),
+                    "description": data.get("description", "No description provided"),
+                }
+            workflows.append(entry["meta"])
         return workflows
 
+    def _cached(self, entry: Dict[str, Any]) -> Optional[tuple]:
+        """(signature, data) of an entry if its parsed graph is cached and current."""
+        with self._lock:
+            cached = self._parsed.get(entry["path"].name)
+            if cached and cached[0] == entry["signature"]:
+                self._parsed.move_to_end(entry["path"].name)
+                return cached
+        return None
+
+    def _read(self, entry: Dict[str, Any]) -> Optional[Any]:
+        cached = self._cached(entry)
+        if cached:
+            return cached[1]
+        try:
+            with open(entry["path"], "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error loading workflow {entry['path'].name}: {e}")
+            return None
+
+        with self._lock:
+            self._parsed[entry["path"].name] = (entry["signature"], data)
+            self._parsed.move_to_end(entry["path"].name)
+            while len(self._parsed) > config.WORKFLOW_CACHE_SIZE:
+                self._parsed.popitem(last=False)
+        return data
+
     def load_workflow(self, name: str) -> Optional[dict]:
-        workflow_dir = self._get_workflow_dir()
-        
+        workflow_dir = self._ensure_catalog()
+
         # Strip .json extension if present
         if name.endswith('.json'):
             name = name[:-5]
-        
-        file_path = workflow_dir / f"{name}.json"
-        
-        if not file_path.exists():
-            return None
-            
-        try:
-            with open(file_path, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading workflow {name}: {e}")
+
+        # Only files in the catalog can be loaded, which also rules out path traversal
+        entry = self._catalog.get(f"{name}.json")
+        if entry is None:
             return None
 
+        if not self.watching:
+            try:
+                signature = self._signature(entry["path"].stat())
+            except FileNotFoundError:
+                return None
+            if signature != entry["signature"]:
+                self._scan(workflow_dir)
+                entry = self._catalog.get(f"{name}.json")
+                if entry is None:
+                    return None
+
+        return self._read(entry)
+
+    async def list_workflows_async(self) -> List[WorkflowSummary]:
+        return await asyncio.to_thread(self.list_workflows)
+
+    async def list_catalog_async(self) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.list_catalog)
+
+    async def load_workflow_async(self, name: str) -> Optional[dict]:
+        """load_workflow with file reads and parsing off the event loop (cache hits stay inline)."""
+        entry = self._catalog.get(f"{name[:-5] if name.endswith('.json') else name}.json")
+        if entry and self.watching and not self._stale:
+            cached = self._cached(entry)
+            if cached:
+                return cached[1]
+        return await asyncio.to_thread(self.load_workflow, name)
+
+    async def start(self):
+        """Watch the workflow directory (inotify via watchfiles, or polling)."""
+        if self._watch_task is None and config.WORKFLOW_DIR and config.WORKFLOW_DIR.exists():
+            self._stale = True
+            self._watch_task = asyncio.create_task(self._watch(config.WORKFLOW_DIR))
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self, workflow_dir: Path):
+        if watchfiles is not None:
+            try:
+                async for _ in watchfiles.awatch(workflow_dir, recursive=False, debounce=200):
+                    self._stale = True
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Workflow watcher failed, falling back to polling: {e}")
+
+        signatures = None
+        while True:
+            current = await asyncio.to_thread(self._poll_signatures, workflow_dir)
+            if current != signatures:
+                signatures = current
+                self._stale = True
+            await asyncio.sleep(config.WORKFLOW_POLL_INTERVAL)
+
+    def _poll_signatures(self, workflow_dir: Path) -> Dict[str, tuple]:
+        return {
+            entry.name: self._signature(entry.stat())
+            for entry in os.scandir(workflow_dir)
+            if entry.name.endswith(".json")
+        }
+
 workflow_loader = WorkflowLoader()
@@ -0,0 +1,137 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from config import config
+from serialization import dumps_str
+from models import WorkflowIntrospection
+from node_introspection import node_introspector
+from workflow_loader import workflow_loader
+from workflow_converter import convert_ui_workflow, is_ui_format, WorkflowConversionError
+from object_info_cache import object_info_cache
+
+class UIFormatError(ValueError):
+    """Raised for UI-format workflows that could not be converted to API format."""
+
+class WorkflowTemplate:
+    """A workflow compiled once for repeated runs.
+
+    Holds the table of patchable input slots, the seed locations and every node
+    pre-serialized to JSON. Rendering re-serializes only the nodes a run patches
+    and never mutates the (shared) source graph.
+
+    UI-format sources are compiled from their API-format conversion, passed as
+    ``nodes`` together with the object_info version it was made with.
+    """
+
+    def __init__(self, name: str, source: Dict[str, Any], nodes: Optional[Dict[str, Any]] = None, object_info_version: Optional[str] = None):
+        self.name = name
+        self.source = source
+        self.object_info_version = object_info_version
+        if nodes is None:
+            nodes = source.get("nodes", source)
+        if isinstance(nodes, list):
+            raise UIFormatError(f"{name} is in UI format")
+        self.nodes: Dict[str, Any] = nodes
+        self.introspection: WorkflowIntrospection = node_introspector.introspect(nodes)
+
+        # "node_id.input_name" -> introspected type, for every primitive input
+        self.slots: Dict[str, str] = {}
+        self.seed_slots: List[Tuple[str, str]] = []
+        for node in self.introspection.nodes:
+            for inp in node.inputs:
+                self.slots[f"{node.id}.{inp.name}"] = inp.type
+                if inp.is_seed and "inputs" in self.nodes.get(node.id, {}):
+                    self.seed_slots.append((node.id, inp.name))
+
+        # (node id, '"<id>": ' prefix, serialized node) in graph order
+        self._parts = [
+            (node_id, f"{dumps_str(node_id)}:", dumps_str(node))
+            for node_id, node in self.nodes.items()
+        ]
+        self.base_json = self._join({})
+
+    def _join(self, patched: Dict[str, str]) -> str:
+        return "{" + ",".join(prefix + patched.get(node_id, node_json) for node_id, prefix, node_json in self._parts) + "}"
+
+    def render(self, inputs: Dict[str, Any], seed: Optional[int]) -> Tuple[str, Dict[str, Any]]:
+        """Apply ``node_id.input_name`` overrides and the seed.
+
+        Returns the API-format prompt as JSON text and the overrides that applied.
+        """
+        patches: Dict[str, Dict[str, Any]] = {}
+        resolved_inputs = {}
+        for key, value in inputs.items():
+            node_id, _, input_name = key.partition(".")
+            if not input_name:
+                continue
+            node = self.nodes.get(node_id)
+            if isinstance(node, dict) and "inputs" in node:
+                patches.setdefault(node_id, {})[input_name] = value
+                resolved_inputs[key] = value
+
+        if seed is not None:
+            for node_id, input_name in self.seed_slots:
+                patches.setdefault(node_id, {})[input_name] = seed
+
+        patched = {}
+        for node_id, patch in patches.items():
+            # Shallow copies only: untouched inputs and nodes are shared with the template
+            node = dict(self.nodes[node_id])
+            node["inputs"] = {**node["inputs"], **patch}
+            patched[node_id] = dumps_str(node)
+        return self._join(patched), resolved_inputs
+
+class WorkflowTemplates:
+    """Compiled templates per workflow, rebuilt when the loader's graph changes.
+
+    UI-format workflows are converted once per (file version, object_info
+    version): an edited file or a new set of node definitions converts again.
+    """
+
+    def __init__(self):
+        self._templates: "OrderedDict[str, WorkflowTemplate]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, name: str) -> Optional[WorkflowTemplate]:
+        if name.endswith(".json"):
+            name = name[:-5]
+        source = await workflow_loader.load_workflow_async(name)
+        if not source:
+            return None
+
+        ui_format = is_ui_format(source)
+        if ui_format:
+            try:
+                object_info = await object_info_cache.get()
+            except Exception as e:
+                raise UIFormatError(f"{name} is in UI format and object_info is unavailable: {e}")
+
+        template = self._templates.get(name)
+        # The loader hands out the same object until the file changes
+        if (
+            template is None
+            or template.source is not source
+            or (ui_format and template.object_info_version != object_info_cache.version)
+        ):
+            self.misses += 1
+            if ui_format:
+                template = await asyncio.to_thread(self._convert, name, source, object_info, object_info_cache.version)
+            else:
+                template = WorkflowTemplate(name, source)
+            self._templates[name] = template
+        else:
+            self.hits += 1
+        self._templates.move_to_end(name)
+        while len(self._templates) > config.WORKFLOW_CACHE_SIZE:
+            self._templates.popitem(last=False)
+        return template
+
+    def _convert(self, name: str, source: Dict[str, Any], object_info: Dict[str, Any], version: Optional[str]) -> WorkflowTemplate:
+        try:
+            nodes = convert_ui_workflow(source, object_info)
+        except (WorkflowConversionError, KeyError, IndexError, TypeError) as e:
+            raise UIFormatError(f"{name} could not be converted from UI format: {e}")
+        return WorkflowTemplate(name, source, nodes, version)
+
+workflow_templates = WorkflowTemplates()